@@ -0,0 +1,114 @@
+"""Admission Control für die GLiNER-Inferenz des Secure PolarisDX AI-Chat Gateways.
+
+NER läuft in einem eigenen, fest dimensionierten Executor statt im
+ungebundenen Default-Executor. Vor der Annahme wird geprüft:
+- Warteschlange voll (`NER_MAX_QUEUE` zusätzlich zu den Workern belegt), oder
+- die geschätzte Wartezeit (Position × mittlere Inferenzdauer) überschreitet
+  die Deadline (`NER_DEADLINE_SECONDS`); gilt nur, wenn kein Worker frei ist.
+In beiden Fällen wird sofort `NEROverloadedError` geworfen, statt alle
+Anfragen gemeinsam langsamer werden zu lassen. Jobs, die trotzdem länger als
+die Deadline in der Queue lagen, werden beim Start übersprungen.
+"""
+import math
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+from app.core.config import settings
+from app.core.metrics import counter, gauge, histogram
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+NER_SHED = counter("ner_shed_total", "Abgewiesene NER-Anfragen je Grund (queue_full, deadline).", ["reason"])
+NER_QUEUE_WAIT_SECONDS = histogram("ner_queue_wait_seconds", "Wartezeit von NER-Jobs bis zum Start im Executor.")
+NER_DEGRADED = counter("ner_degraded_total", "Anfragen, die bei Überlast Regex-only anonymisiert und eskaliert wurden.")
+NER_INFLIGHT = gauge("ner_inflight", "Angenommene NER-Jobs (laufend + wartend).")
+
+# Gewicht neuer Messwerte für die mittlere Inferenzdauer (EWMA).
+_EWMA_ALPHA = 0.2
+
+
+class NEROverloadedError(Exception):
+    """NER-Kapazität erschöpft; `retry_after` in Sekunden für den Client."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"NER overloaded ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+        # Vom Scanner gesetzt: Text nach der Regex-Phase (für den degradierten Pfad).
+        self.regex_only_text: Optional[str] = None
+
+
+class NERAdmission:
+    """Dedizierter NER-Executor mit begrenzter Warteschlange und Deadline."""
+
+    def __init__(
+        self,
+        workers: int = settings.ner_workers,
+        max_queue: int = settings.ner_max_queue,
+        deadline_seconds: float = settings.ner_deadline_seconds,
+        initial_service_seconds: float = 0.1,
+    ):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.deadline_seconds = deadline_seconds
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ner")
+        # Zähler wird nur im Event-Loop verändert, daher ohne Lock.
+        self.inflight = 0
+        self.avg_service_seconds = initial_service_seconds
+        NER_INFLIGHT.set_function(lambda: self.inflight)
+
+    def estimated_wait(self) -> float:
+        """Geschätzte Wartezeit eines jetzt angenommenen Jobs bis zum Start."""
+        ahead = self.inflight - self.workers + 1
+        if ahead <= 0:
+            return 0.0
+        return math.ceil(ahead / self.workers) * self.avg_service_seconds
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.estimated_wait()))
+
+    def _shed(self, reason: str) -> NEROverloadedError:
+        NER_SHED.inc(reason=reason)
+        logger.warning(f"NER request shed ({reason}), inflight={self.inflight}")
+        return NEROverloadedError(reason, self.retry_after())
+
+    async def run(self, func: Callable[[], T]) -> T:
+        """Führt `func` im NER-Executor aus oder wirft `NEROverloadedError`."""
+        if self.inflight >= self.workers + self.max_queue:
+            raise self._shed("queue_full")
+        # Ein freier Worker startet sofort: nur Jobs, die warten müssten, gegen die
+        # Deadline prüfen (sonst sperrt eine zu hohe Schätzung den Executor dauerhaft,
+        # denn sie sinkt nur durch ausgeführte Jobs).
+        if self.inflight >= self.workers and self.estimated_wait() + self.avg_service_seconds > self.deadline_seconds:
+            raise self._shed("deadline")
+
+        submitted = time.monotonic()
+
+        def job():
+            started = time.monotonic()
+            waited = started - submitted
+            NER_QUEUE_WAIT_SECONDS.observe(waited)
+            # Zu lange gewartet: Arbeit überspringen, der Worker ist sofort wieder frei.
+            if waited > self.deadline_seconds:
+                return None, True, 0.0
+            return func(), False, time.monotonic() - started
+
+        self.inflight += 1
+        try:
+            result, expired, service = await asyncio.wrap_future(self.executor.submit(job))
+        finally:
+            self.inflight -= 1
+        if expired:
+            raise self._shed("deadline")
+        # Ausreißer auf die Deadline begrenzen, damit die Schätzung schnell wieder sinkt.
+        service = min(service, self.deadline_seconds)
+        self.avg_service_seconds += _EWMA_ALPHA * (service - self.avg_service_seconds)
+        return result
+
+    def shutdown(self, wait: bool = True) -> None:
+        self.executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,306 @@
+"""Inkrementell gepflegte Kennzahlen für das Admin-Panel (`/admin/stats`).
+
+Statt bei jeder Abfrage `chat_messages` zu gruppieren, verdichtet ein
+periodischer Job neue Zeilen ab einem Watermark (letzte verarbeitete ID) in
+die Tabelle `stats_rollup`:
+- Nachrichten je Rolle (`messages_user`, `messages_assistant`, ...),
+- neue Sessions (`sessions`, nach `chat_sessions.created_at`; Keyset-Watermark
+  mit kurzer Verzögerung, damit noch offene Transaktionen nicht übersprungen werden),
+- Eskalationen (`escalations`, Tabelle `escalations`, geschrieben beim
+  Umschalten auf HUMAN, unabhängig von der Teams-Zustellung),
+jeweils pro Stunde, pro Tag und gesamt (UTC). Zähler und Watermark werden in
+derselben Transaktion geschrieben; jede Zeile zählt genau einmal, auch wenn
+mehrere Worker den Job parallel ausführen (optimistische Sperre auf den
+Watermark). Gelöschte Nachrichten (Retention) bleiben in den Kennzahlen.
+
+CLI (z.B. Neuaufbau nach Änderung der Zählregeln):
+    python -m app.core.analytics [--rebuild]
+"""
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import datetime
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.core.config import settings
+from app.core.db_sqla import SessionLocal, ChatMessage, ChatSession, Escalation, JobState, StatsRollup, init_db
+from app.core.jobs import load_job_state
+from app.core.metrics import counter
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_ROWS = counter("analytics_rolled_up_rows_total", "In die Kennzahlen übernommene Zeilen je Quelle.", ["source"])
+
+# Job-State-Schlüssel mit den Watermarks je Quelltabelle.
+ANALYTICS_STATE = "analytics"
+# Sessions werden erst gezählt, wenn ihr created_at so weit zurückliegt: Writer
+# vergeben created_at vor dem Commit, spätere Commits dürfen nicht hinter den Watermark fallen.
+SESSION_SETTLE_SECONDS = 30
+
+def _buckets(stamp: datetime.datetime) -> List[Tuple[str, str]]:
+    return [
+        ("hour", stamp.strftime("%Y-%m-%dT%H:00")),
+        ("day", stamp.strftime("%Y-%m-%d")),
+        ("total", "all"),
+    ]
+
+
+class AnalyticsRollupJob:
+    """Überträgt neue Nachrichten und Eskalationen in `stats_rollup`."""
+
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        batch_size: int = settings.analytics_batch_size,
+        interval: float = settings.analytics_interval_seconds,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = max(1, batch_size)
+        self.interval = interval
+        self.last_run: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    # -- Verdichtung (je Batch eine Transaktion) --
+
+    def _count_messages(self, db, watermark: int, counts: Counter) -> List:
+        rows = db.execute(
+            select(ChatMessage.id, ChatMessage.session_id, ChatMessage.role, ChatMessage.timestamp)
+            .where(ChatMessage.id > watermark)
+            .order_by(ChatMessage.id)
+            .limit(self.batch_size)
+        ).all()
+        for row in rows:
+            for granularity, bucket in _buckets(row.timestamp):
+                counts[(granularity, bucket, f"messages_{row.role}")] += 1
+        return rows
+
+    def _count_sessions(self, db, watermark: Optional[List[str]], until: datetime.datetime, counts: Counter) -> List:
+        """Neue Sessions nach (created_at, id); gelöschte Nachrichten spielen keine Rolle."""
+        query = select(ChatSession.id, ChatSession.created_at).where(ChatSession.created_at <= until)
+        if watermark:
+            created_at, session_id = datetime.datetime.fromisoformat(watermark[0]), watermark[1]
+            query = query.where(
+                or_(
+                    ChatSession.created_at > created_at,
+                    and_(ChatSession.created_at == created_at, ChatSession.id > session_id),
+                )
+            )
+        rows = db.execute(query.order_by(ChatSession.created_at, ChatSession.id).limit(self.batch_size)).all()
+        for row in rows:
+            for granularity, bucket in _buckets(row.created_at):
+                counts[(granularity, bucket, "sessions")] += 1
+        return rows
+
+    def _count_escalations(self, db, watermark: int, counts: Counter) -> List:
+        rows = db.execute(
+            select(Escalation.id, Escalation.created_at)
+            .where(Escalation.id > watermark)
+            .order_by(Escalation.id)
+            .limit(self.batch_size)
+        ).all()
+        for row in rows:
+            for granularity, bucket in _buckets(row.created_at):
+                counts[(granularity, bucket, "escalations")] += 1
+        return rows
+
+    def _apply(self, db, counts: Counter) -> None:
+        for (granularity, bucket, metric), amount in counts.items():
+            row = db.get(StatsRollup, (granularity, bucket, metric))
+            if row is None:
+                db.add(StatsRollup(granularity=granularity, bucket=bucket, metric=metric, value=amount))
+            else:
+                row.value += amount
+
+    def _save_watermarks(self, db, previous: Optional[str], state: Dict[str, Any]) -> bool:
+        """Schreibt den Watermark nur, wenn ihn kein anderer Worker inzwischen verschoben hat."""
+        value = json.dumps(state)
+        if previous is None:
+            db.execute(insert(JobState).values(name=ANALYTICS_STATE, value=value, updated_at=datetime.datetime.utcnow()))
+            return True
+        result = db.execute(
+            update(JobState)
+            .where(JobState.name == ANALYTICS_STATE, JobState.value == previous)
+            .values(value=value, updated_at=datetime.datetime.utcnow())
+        )
+        return result.rowcount == 1
+
+    def rollup_batch(self) -> int:
+        """Verdichtet höchstens `batch_size` Zeilen je Quelle; liefert die Anzahl."""
+        db = self.session_factory()
+        try:
+            entry = db.get(JobState, ANALYTICS_STATE)
+            previous = entry.value if entry is not None else None
+            state = json.loads(previous) if previous else {}
+            settled = datetime.datetime.utcnow() - datetime.timedelta(seconds=SESSION_SETTLE_SECONDS)
+            counts: Counter = Counter()
+            messages = self._count_messages(db, state.get("messages", 0), counts)
+            sessions = self._count_sessions(db, state.get("sessions"), settled, counts)
+            escalations = self._count_escalations(db, state.get("escalations", 0), counts)
+            if not messages and not sessions and not escalations:
+                return 0
+
+            if messages:
+                state["messages"] = messages[-1].id
+            if sessions:
+                state["sessions"] = [sessions[-1].created_at.isoformat(), sessions[-1].id]
+            if escalations:
+                state["escalations"] = escalations[-1].id
+            state["updated_at"] = datetime.datetime.utcnow().isoformat()
+            self._apply(db, counts)
+            if not self._save_watermarks(db, previous, state):
+                db.rollback()
+                return 0
+            db.commit()
+        except IntegrityError:
+            # Erster Lauf zweier Worker gleichzeitig: der andere war schneller.
+            db.rollback()
+            return 0
+        finally:
+            db.close()
+        ANALYTICS_ROWS.inc(len(messages), source="chat_messages")
+        ANALYTICS_ROWS.inc(len(sessions), source="chat_sessions")
+        ANALYTICS_ROWS.inc(len(escalations), source="escalations")
+        return len(messages) + len(sessions) + len(escalations)
+
+    def run_sync(self) -> Dict[str, Any]:
+        """Verdichtet alle neuen Zeilen (bis nichts mehr nachkommt)."""
+        with self._lock:
+            started = time.monotonic()
+            processed = 0
+            while True:
+                batch = self.rollup_batch()
+                processed += batch
+                if batch == 0:
+                    break
+            self.last_run = {
+                "finished_at": datetime.datetime.utcnow().isoformat(),
+                "duration_seconds": round(time.monotonic() - started, 3),
+                "processed": processed,
+            }
+            return self.last_run
+
+    def rebuild(self) -> Dict[str, Any]:
+        """Verwirft alle Kennzahlen und verdichtet den vorhandenen Bestand neu."""
+        with self._lock:
+            db = self.session_factory()
+            try:
+                db.execute(delete(StatsRollup))
+                db.execute(delete(JobState).where(JobState.name == ANALYTICS_STATE))
+                db.commit()
+            finally:
+                db.close()
+        return self.run_sync()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    # -- Hintergrund-Job --
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(None, self.run_sync)
+            except Exception as e:
+                logger.error(f"Analytics rollup failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Startet den periodischen Job als Task im laufenden Event-Loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def _ratio(numerator: int, denominator: int) -> Optional[float]:
+    return round(numerator / denominator, 3) if denominator else None
+
+
+def _summarize(metrics: Dict[str, int]) -> Dict[str, Any]:
+    messages = {key[len("messages_"):]: value for key, value in metrics.items() if key.startswith("messages_")}
+    total_messages = sum(messages.values())
+    sessions = metrics.get("sessions", 0)
+    escalations = metrics.get("escalations", 0)
+    return {
+        "messages": total_messages,
+        "messages_by_role": messages,
+        "sessions": sessions,
+        "escalations": escalations,
+        "escalation_rate": _ratio(escalations, sessions),
+        "avg_conversation_length": _ratio(total_messages, sessions),
+    }
+
+
+def load_stats(db, days: int = 30, top_hours: int = 5, now: Optional[datetime.datetime] = None) -> Dict[str, Any]:
+    """Kennzahlen der letzten `days` Tage aus `stats_rollup`.
+
+    Liest höchstens `days * 24` Stunden- und `days` Tageszeilen je Kennzahl,
+    unabhängig von der Größe des Verlaufs.
+    """
+    now = now or datetime.datetime.utcnow()
+    first_day = (now - datetime.timedelta(days=days - 1)).strftime("%Y-%m-%d")
+
+    rows = db.execute(
+        select(StatsRollup.granularity, StatsRollup.bucket, StatsRollup.metric, StatsRollup.value).where(
+            or_(
+                StatsRollup.granularity == "total",
+                and_(StatsRollup.granularity.in_(["day", "hour"]), StatsRollup.bucket >= first_day),
+            )
+        )
+    ).all()
+
+    totals: Dict[str, int] = {}
+    per_day: Dict[str, Dict[str, int]] = {}
+    window: Counter = Counter()
+    hours: Counter = Counter()
+    for granularity, bucket, metric, value in rows:
+        if granularity == "total":
+            totals[metric] = value
+        elif granularity == "day":
+            per_day.setdefault(bucket, {})[metric] = value
+            window[metric] += value
+        elif metric.startswith("messages_"):
+            hours[int(bucket[11:13])] += value
+
+    return {
+        "days": days,
+        "totals": _summarize(totals),
+        "window": _summarize(window),
+        "daily": [{"date": day, **_summarize(per_day[day])} for day in sorted(per_day)],
+        "busiest_hours_utc": [{"hour": hour, "messages": count} for hour, count in hours.most_common(top_hours)],
+        "updated_at": load_job_state(db, ANALYTICS_STATE).get("updated_at"),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Verdichtet neue Chat-Nachrichten in die Kennzahlen für /admin/stats.")
+    parser.add_argument("--rebuild", action="store_true", help="Kennzahlen verwerfen und aus dem Bestand neu aufbauen")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    init_db()
+    job = AnalyticsRollupJob()
+    print(json.dumps(job.rebuild() if args.rebuild else job.run_sync(), ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
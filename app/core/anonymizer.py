@@ -0,0 +1,331 @@
+"""Bulk-Anonymisierung des TrainingsHub-Bestands für Trainingsexporte.
+
+`chat_messages.content` enthält den Originaltext. Dieser Job liest die
+Nachrichten in Chunks (Keyset-Pagination über die ID), anonymisiert sie in
+einem Prozess-Pool (Regex + GLiNER im Batch) und schreibt das Ergebnis nach
+`chat_messages.anonymized_content` oder in eine JSONL-Datei.
+
+- Platzhalter sind nicht umkehrbar (`<PERSON>`, `<EMAIL>`, ...): für
+  Trainingsdaten wird nichts im Vault abgelegt.
+- Jeder Worker-Prozess lädt GLiNER einmal im Initializer; nur der
+  Hauptprozess liest und schreibt die DB (ein Writer für SQLite).
+- Ergebnisse werden in ID-Reihenfolge geschrieben. Der Checkpoint (höchste
+  geschriebene ID, bei Dateiausgabe zusätzlich der Byte-Offset) liegt in
+  `job_state`; ein erneuter Start setzt dort fort und verarbeitet auch neu
+  hinzugekommene Nachrichten.
+
+CLI:
+    python -m app.core.anonymizer --workers 4 --chunk-size 256
+    python -m app.core.anonymizer --target file --output anonymized.jsonl
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, update
+
+from app.core.config import settings
+from app.core.db_sqla import SessionLocal, ChatMessage, init_db
+from app.core.jobs import load_job_state, reset_job_state, save_job_state
+from app.core.metrics import counter
+from app.core.scanner import (
+    EMAIL_PATTERN,
+    NER_LABELS,
+    NER_MODEL_NAME,
+    NER_SCORE_THRESHOLD,
+    PHONE_PATTERN,
+    _gliner_class,
+    replace_entities,
+)
+
+logger = logging.getLogger(__name__)
+
+ANONYMIZED_MESSAGES = counter("anonymized_messages_total", "Vom Bulk-Job anonymisierte Nachrichten.")
+
+Row = Tuple[int, str]
+
+# -- Worker-Prozess --
+
+# GLiNER-Modell des Worker-Prozesses (None: nur Regex).
+_worker_model = None
+
+
+def _load_model():
+    return _gliner_class().from_pretrained(NER_MODEL_NAME)
+
+
+def init_worker(use_ner: bool, torch_threads: int = 1) -> None:
+    """Initializer des Prozess-Pools: lädt das Modell einmal pro Prozess."""
+    global _worker_model
+    if not use_ner:
+        _worker_model = None
+        return
+    # Ohne Begrenzung startet jeder Prozess torch-Threads für alle Kerne.
+    import torch
+    torch.set_num_threads(max(1, torch_threads))
+    _worker_model = _load_model()
+
+
+def _placeholder(original: str, label: str) -> str:
+    return f"<{label.upper()}>"
+
+
+def anonymize_texts(texts: Sequence[str], model=None, batch_size: int = 16) -> List[str]:
+    """Regex-Phase für alle Texte, danach GLiNER in Batches ähnlicher Länge
+    (weniger Padding). Leere Texte gehen nicht ans Modell."""
+    cleaned = [PHONE_PATTERN.sub("<PHONE>", EMAIL_PATTERN.sub("<EMAIL>", text or "")) for text in texts]
+    if model is None:
+        return cleaned
+
+    order = sorted((i for i, text in enumerate(cleaned) if text.strip()), key=lambda i: len(cleaned[i]))
+    for start in range(0, len(order), batch_size):
+        indices = order[start:start + batch_size]
+        batch = [cleaned[i] for i in indices]
+        predictions = model.batch_predict_entities(batch, NER_LABELS, threshold=NER_SCORE_THRESHOLD)
+        for i, text, entities in zip(indices, batch, predictions):
+            cleaned[i] = replace_entities(text, entities, _placeholder)
+    return cleaned
+
+
+def anonymize_chunk(rows: List[Row], batch_size: int = 16) -> List[Row]:
+    """Anonymisiert einen Chunk (id, content) im Worker-Prozess."""
+    texts = anonymize_texts([content for _, content in rows], _worker_model, batch_size)
+    return [(message_id, text) for (message_id, _), text in zip(rows, texts)]
+
+
+# -- Job (Hauptprozess) --
+
+
+class AnonymizationJob:
+    """Liest, verteilt und schreibt die Chunks; Fortschritt in `progress`."""
+
+    def __init__(
+        self,
+        target: str = "column",
+        output_path: Optional[str] = None,
+        workers: int = settings.anonymize_workers,
+        chunk_size: int = settings.anonymize_chunk_size,
+        ner_batch_size: int = settings.anonymize_ner_batch_size,
+        use_ner: bool = True,
+        session_factory=SessionLocal,
+    ):
+        if target not in ("column", "file"):
+            raise ValueError(f"Unknown target '{target}'")
+        if target == "file" and not output_path:
+            raise ValueError("File target requires an output path")
+        self.target = target
+        self.output_path = os.path.abspath(output_path) if output_path else None
+        self.workers = max(0, workers)
+        self.chunk_size = max(1, chunk_size)
+        self.ner_batch_size = max(1, ner_batch_size)
+        self.use_ner = use_ner
+        self.session_factory = session_factory
+        self.name = "anonymize:column" if target == "column" else f"anonymize:file:{self.output_path}"
+        self.progress: Dict[str, Any] = {
+            "state": "idle",
+            "target": target,
+            "processed": 0,
+            "total": None,
+            "last_id": 0,
+            "messages_per_second": 0.0,
+            "error": None,
+        }
+        self._stop = threading.Event()
+        self._output = None
+
+    def stop(self) -> None:
+        """Beendet den Job nach dem aktuell geschriebenen Chunk."""
+        self._stop.set()
+
+    @property
+    def running(self) -> bool:
+        return self.progress["state"] == "running"
+
+    # -- DB --
+
+    def _prepare(self, reset: bool) -> Tuple[Dict[str, Any], int, int]:
+        """Lädt den Checkpoint und legt den Watermark (höchste ID beim Start) fest."""
+        db = self.session_factory()
+        try:
+            if reset:
+                reset_job_state(db, self.name)
+                db.commit()
+            checkpoint = load_job_state(db, self.name)
+            after_id = checkpoint.get("last_id", 0)
+            until_id = db.query(func.max(ChatMessage.id)).scalar() or 0
+            total = db.query(func.count(ChatMessage.id)).filter(ChatMessage.id > after_id, ChatMessage.id <= until_id).scalar()
+            return checkpoint, until_id, total
+        finally:
+            db.close()
+
+    def _read_chunks(self, after_id: int, until_id: int) -> Iterator[List[Row]]:
+        while not self._stop.is_set():
+            db = self.session_factory()
+            try:
+                rows = (
+                    db.query(ChatMessage.id, ChatMessage.content)
+                    .filter(ChatMessage.id > after_id, ChatMessage.id <= until_id)
+                    .order_by(ChatMessage.id)
+                    .limit(self.chunk_size)
+                    .all()
+                )
+            finally:
+                db.close()
+            if not rows:
+                return
+            yield [(message_id, content) for message_id, content in rows]
+            after_id = rows[-1][0]
+
+    def _write(self, results: List[Row]) -> None:
+        """Schreibt einen Chunk und den Checkpoint (bei `column` in einer Transaktion)."""
+        checkpoint = {"last_id": results[-1][0], "processed": self.progress["processed"] + len(results)}
+        db = self.session_factory()
+        try:
+            if self.target == "column":
+                db.execute(
+                    update(ChatMessage),
+                    [{"id": message_id, "anonymized_content": text} for message_id, text in results],
+                )
+            else:
+                self._output.write("".join(
+                    json.dumps({"message_id": message_id, "content": text}, ensure_ascii=False) + "\n"
+                    for message_id, text in results
+                ).encode("utf-8"))
+                self._output.flush()
+                os.fsync(self._output.fileno())
+                checkpoint["offset"] = self._output.tell()
+            save_job_state(db, self.name, checkpoint)
+            db.commit()
+        finally:
+            db.close()
+
+        ANONYMIZED_MESSAGES.inc(len(results))
+        self.progress["processed"] = checkpoint["processed"]
+        self.progress["last_id"] = checkpoint["last_id"]
+
+    # -- Ablauf --
+
+    def run(self, reset: bool = False) -> Dict[str, Any]:
+        """Führt den Job bis zum Watermark (oder `stop()`) aus; gibt `progress` zurück."""
+        self._stop.clear()
+        self.progress.update(state="running", error=None)
+        try:
+            checkpoint, until_id, total = self._prepare(reset)
+            self.progress.update(total=total, last_id=checkpoint.get("last_id", 0), processed=checkpoint.get("processed", 0))
+            if self.target == "file":
+                self._open_output(checkpoint.get("offset", 0))
+            logger.info(f"Anonymization ({self.name}) started: {total} message(s) after id {self.progress['last_id']}")
+
+            started = time.monotonic()
+            processed_before = self.progress["processed"]
+            for results in self._results(self._read_chunks(self.progress["last_id"], until_id)):
+                self._write(results)
+                elapsed = time.monotonic() - started
+                done = self.progress["processed"] - processed_before
+                self.progress["messages_per_second"] = round(done / elapsed, 1) if elapsed > 0 else 0.0
+                logger.info(f"Anonymization: {done}/{total} message(s), {self.progress['messages_per_second']} msg/s, last id {self.progress['last_id']}")
+
+            self.progress["state"] = "stopped" if self._stop.is_set() else "finished"
+            logger.info(f"Anonymization {self.progress['state']}: {self.progress['processed']} message(s) in total")
+        except Exception as e:
+            self.progress.update(state="failed", error=str(e))
+            logger.error(f"Anonymization failed: {e}")
+            raise
+        finally:
+            if self._output is not None:
+                self._output.close()
+                self._output = None
+        return self.progress
+
+    def _open_output(self, offset: int) -> None:
+        # Alles hinter dem Checkpoint stammt von einem abgebrochenen Lauf.
+        self._output = open(self.output_path, "r+b" if os.path.exists(self.output_path) else "wb")
+        self._output.truncate(offset)
+        self._output.seek(offset)
+
+    def _results(self, chunks: Iterator[List[Row]]) -> Iterator[List[Row]]:
+        """Anonymisiert Chunks im Prozess-Pool und liefert sie in Lesereihenfolge.
+
+        Pro Worker sind höchstens zwei Chunks unterwegs (begrenzter Speicher,
+        Worker bleiben ausgelastet). `workers=0` rechnet im eigenen Prozess.
+        """
+        if self.workers == 0:
+            init_worker(self.use_ner)
+            for chunk in chunks:
+                yield anonymize_chunk(chunk, self.ner_batch_size)
+            return
+
+        # spawn statt fork: der Gateway-Prozess hat Threads (Logging, Executor).
+        context = multiprocessing.get_context("spawn")
+        torch_threads = max(1, (os.cpu_count() or 1) // self.workers)
+        with ProcessPoolExecutor(self.workers, mp_context=context, initializer=init_worker, initargs=(self.use_ner, torch_threads)) as pool:
+            pending = deque()
+            try:
+                for chunk in chunks:
+                    pending.append(pool.submit(anonymize_chunk, chunk, self.ner_batch_size))
+                    if len(pending) >= 2 * self.workers:
+                        yield pending.popleft().result()
+                    if self._stop.is_set():
+                        break
+                while pending and not self._stop.is_set():
+                    yield pending.popleft().result()
+            finally:
+                for future in pending:
+                    future.cancel()
+
+
+def start_in_background(job: AnonymizationJob, reset: bool = False) -> threading.Thread:
+    """Startet den Job in einem eigenen Thread (Fehler stehen in `job.progress`)."""
+
+    def target() -> None:
+        try:
+            job.run(reset=reset)
+        except Exception:
+            pass
+
+    job.progress["state"] = "running"
+    thread = threading.Thread(target=target, name="anonymizer", daemon=True)
+    thread.start()
+    return thread
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Anonymisiert gespeicherte Chat-Nachrichten für Trainingsexporte.")
+    parser.add_argument("--target", choices=["column", "file"], default="column", help="Spalte anonymized_content oder JSONL-Datei")
+    parser.add_argument("--output", help="Ausgabedatei bei --target file")
+    parser.add_argument("--workers", type=int, default=settings.anonymize_workers, help="Worker-Prozesse (0 = im eigenen Prozess)")
+    parser.add_argument("--chunk-size", type=int, default=settings.anonymize_chunk_size)
+    parser.add_argument("--ner-batch-size", type=int, default=settings.anonymize_ner_batch_size)
+    parser.add_argument("--no-ner", action="store_true", help="Nur Regex (ohne GLiNER)")
+    parser.add_argument("--reset", action="store_true", help="Checkpoint verwerfen und von vorne beginnen")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    init_db()
+    job = AnonymizationJob(
+        target=args.target,
+        output_path=args.output,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        ner_batch_size=args.ner_batch_size,
+        use_ner=not args.no_ner,
+    )
+    try:
+        progress = job.run(reset=args.reset)
+    except KeyboardInterrupt:
+        print(f"Abgebrochen, Checkpoint bei ID {job.progress['last_id']}.", file=sys.stderr)
+        return 130
+    print(json.dumps(progress, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
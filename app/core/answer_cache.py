@@ -0,0 +1,145 @@
+"""Antwort-Cache für wiederkehrende, anonymisierte Erstanfragen.
+
+Viele Kunden stellen dieselben Produkt- und Versandfragen. Da der Prompt vor
+der KI bereits anonymisiert ist, kann die Antwort für identische (normalisierte)
+Erstanfragen aus Redis wiedergegeben werden, statt erneut einen Assistant-Run
+zu starten.
+
+Datenschutz: Prompts oder Antworten mit Vault-Platzhaltern werden nie gecacht,
+da Platzhalter an die PII einer einzelnen Session gebunden sind.
+"""
+import re
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+ANSWER_PREFIX = "answer:"
+ANSWER_INDEX_PREFIX = "answer_index:"
+
+_PLACEHOLDER_PATTERN = re.compile(r"<[A-Z]+_[^>]+>")
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+_REPLAY_CHUNK_PATTERN = re.compile(r"\S+\s*|\s+")
+
+
+@dataclass
+class CachedAnswer:
+    answer: str
+    latency_seconds: float
+    total_tokens: int
+
+
+class AnswerCache:
+    """Redis-basierter Cache (TTL + LRU-Begrenzung über ein Sorted Set als Index).
+
+    Der Namespace enthält Assistant-ID und Wissensbasis-Version: ändert sich
+    eine davon, werden alte Einträge nicht mehr getroffen und laufen per TTL aus.
+    """
+
+    def __init__(
+        self,
+        redis_conn,
+        enabled: bool = settings.answer_cache_enabled,
+        ttl_seconds: int = settings.answer_cache_ttl_seconds,
+        max_entries: int = settings.answer_cache_max_entries,
+        version: Optional[str] = None,
+    ):
+        self.redis = redis_conn
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.version = version or f"{settings.assistant_id}:{settings.knowledge_base_version}"
+        self.metrics: Dict[str, float] = {
+            "hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "saved_latency_seconds": 0.0,
+            "saved_tokens": 0,
+        }
+
+    @property
+    def index_key(self) -> str:
+        return f"{ANSWER_INDEX_PREFIX}{self.version}"
+
+    @staticmethod
+    def normalize(prompt: str) -> str:
+        """Vereinheitlicht Groß-/Kleinschreibung, Whitespace und Satzzeichen am Rand."""
+        return _WHITESPACE_PATTERN.sub(" ", prompt).strip().strip("?!. ").lower()
+
+    @staticmethod
+    def is_cacheable(text: str) -> bool:
+        return bool(text.strip()) and "ESKALATION_NOETIG" not in text and not _PLACEHOLDER_PATTERN.search(text)
+
+    def _key(self, prompt: str) -> str:
+        digest = hashlib.sha256(self.normalize(prompt).encode("utf-8")).hexdigest()
+        return f"{ANSWER_PREFIX}{self.version}:{digest}"
+
+    def get(self, prompt: str) -> Optional[CachedAnswer]:
+        """Liefert eine gecachte Antwort oder None (zählt Hit/Miss)."""
+        if not self.enabled or not self.is_cacheable(prompt):
+            return None
+
+        key = self._key(prompt)
+        raw = self.redis.get(key)
+        if raw is None:
+            self.metrics["misses"] += 1
+            return None
+
+        # LRU: Zugriffszeit im Index aktualisieren.
+        self.redis.zadd(self.index_key, {key: time.time()})
+        data = json.loads(raw)
+        cached = CachedAnswer(data["answer"], data["latency_seconds"], data["total_tokens"])
+        self.metrics["hits"] += 1
+        self.metrics["saved_latency_seconds"] += cached.latency_seconds
+        self.metrics["saved_tokens"] += cached.total_tokens
+        return cached
+
+    def put(self, prompt: str, answer: str, latency_seconds: float, total_tokens: int = 0) -> bool:
+        """Speichert eine Antwort; verdrängt bei Überschreiten von max_entries die ältesten."""
+        if not self.enabled or not self.is_cacheable(prompt) or not self.is_cacheable(answer):
+            return False
+
+        key = self._key(prompt)
+        value = json.dumps({"answer": answer, "latency_seconds": latency_seconds, "total_tokens": total_tokens})
+        pipe = self.redis.pipeline()
+        pipe.setex(key, self.ttl_seconds, value)
+        pipe.zadd(self.index_key, {key: time.time()})
+        pipe.expire(self.index_key, self.ttl_seconds)
+        pipe.zcard(self.index_key)
+        size = pipe.execute()[-1]
+        self.metrics["stores"] += 1
+
+        overflow = size - self.max_entries
+        if overflow > 0:
+            evicted = [member for member, _ in self.redis.zpopmin(self.index_key, overflow)]
+            if evicted:
+                self.redis.delete(*evicted)
+                self.metrics["evictions"] += len(evicted)
+        return True
+
+    def invalidate(self) -> int:
+        """Löscht alle Einträge der aktuellen Version (z.B. nach Update der Wissensbasis)."""
+        keys = self.redis.zrange(self.index_key, 0, -1)
+        if keys:
+            self.redis.delete(*keys)
+        self.redis.delete(self.index_key)
+        return len(keys)
+
+    def hit_rate(self) -> float:
+        total = self.metrics["hits"] + self.metrics["misses"]
+        return self.metrics["hits"] / total if total else 0.0
+
+    @staticmethod
+    async def replay(answer: str, delay_seconds: float = 0.0) -> AsyncIterator[str]:
+        """Gibt eine gecachte Antwort als simulierten Token-Stream (wortweise) aus."""
+        for chunk in _REPLAY_CHUNK_PATTERN.findall(answer):
+            yield chunk
+            await asyncio.sleep(delay_seconds)
@@ -1,35 +1,166 @@
 """Steuert die Kommunikation mit der OpenAI Assistant API inkl.
 Eskalationslogik für das Secure PolarisDX AI-Chat Gateway."""
 import os
+import time
 import asyncio
 import logging
-from typing import Dict, Tuple, List
+import functools
+from collections import OrderedDict, deque
+from typing import Any, Dict, Tuple, List, Optional
 
-from openai import AsyncOpenAI
-from openai import AsyncAssistantEventHandler
 from typing_extensions import override
-import asyncio
 
 from app.core.config import settings
+from app.core.logging_setup import redact
+from app.core.metrics import ERRORS, STAGE_SECONDS, counter, histogram
+from app.core.tracing import span, start_span
 
 # Platzhalter-Assistent; kann über Settings/Env überschrieben werden.
 ASSISTANT_ID = settings.assistant_id
 
-class EventHandler(AsyncAssistantEventHandler):
-    def __init__(self):
-        super().__init__()
-        self.queue = asyncio.Queue()
-        self.full_response = []
+OPENAI_STALLS = counter("openai_stalls_total", "Abgebrochene Runs ohne Token innerhalb des Timeouts je Phase (ttft, inter_token).", ["phase"])
+OPENAI_STALL_RETRIES = counter("openai_stall_retries_total", "Nach einem Stall neu gestartete Runs.")
+OPENAI_STALL_FAILURES = counter("openai_stall_failures_total", "Streams, die trotz Retry mit Fallback/Eskalation enden.")
+
+OPENAI_PROMPT_TOKENS = histogram(
+    "openai_prompt_tokens",
+    "Prompt-Tokens je Run nach Kontext-Policy (none, truncate, rollover).",
+    ["policy"],
+    buckets=(250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000),
+)
+THREAD_ROLLOVERS = counter("openai_thread_rollovers_total", "Sessions, die wegen des Kontext-Budgets einen neuen Thread erhalten haben.")
+
+# Endzustände eines Runs; erst danach nimmt der Thread einen neuen Run an.
+TERMINAL_RUN_STATUSES = {"cancelled", "completed", "failed", "expired", "incomplete"}
+# Mindestanzahl TTFT-Messwerte, bevor das Perzentil den Timeout bestimmt.
+TTFT_MIN_SAMPLES = 20
+
+# Das openai-SDK wird erst beim Erzeugen des Assistants importiert, nicht beim
+# Import des Moduls (Kaltstart für Tests und CLI-Tools).
+AsyncOpenAI = None
+
+
+def _openai_client_class():
+    global AsyncOpenAI
+    if AsyncOpenAI is None:
+        from openai import AsyncOpenAI as client_class
+        AsyncOpenAI = client_class
+    return AsyncOpenAI
+
+
+@functools.lru_cache(maxsize=None)
+def _event_handler_class():
+    from openai import AsyncAssistantEventHandler
+
+    class EventHandler(AsyncAssistantEventHandler):
+        def __init__(self):
+            super().__init__()
+            self.queue = asyncio.Queue()
+            self.full_response = []
+            self.run_id: Optional[str] = None
+            self.usage = None
+            # Vom Shutdown abgebrochen (siehe AIAssistant.cancel_active_runs).
+            self.cancelled = False
+
+        @override
+        async def on_text_delta(self, delta, snapshot):
+            if delta.value:
+                self.full_response.append(delta.value)
+                await self.queue.put(delta.value)
+
+        @override
+        async def on_event(self, event):
+            # Run-ID und Token-Verbrauch für Metriken/Cache festhalten.
+            if event.event == "thread.run.created":
+                self.run_id = event.data.id
+            elif event.event == "thread.run.completed":
+                self.usage = event.data.usage
+
+        @override
+        async def on_end(self):
+            await self.queue.put(None)  # Signal end
+
+    return EventHandler
+
+class SessionThreads:
+    """Thread-ID und Kontext-Nutzung je Session, begrenzt per LRU und TTL.
+
+    Ohne Grenze wüchsen beide mit jeder Session, die der Worker je gesehen hat
+    (die Nutzung hält die letzten Turns als Text). Die Nutzung gehört zum
+    aktuellen Thread: ein neuer Thread (Rollover) beginnt mit leerer Nutzung.
+    Verdrängte oder abgelaufene Sessions beginnen beim nächsten Turn einen
+    neuen Thread.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = settings.thread_cache_max_sessions,
+        ttl_seconds: float = settings.thread_cache_ttl_seconds,
+    ):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        # session_id -> [zuletzt genutzt (monotonic), thread_id, Nutzung oder None]
+        self._entries: "OrderedDict[str, List[Any]]" = OrderedDict()
+        self.evictions = 0
+
+    def _expired(self, entry: List[Any], now: float) -> bool:
+        return self.ttl_seconds > 0 and now - entry[0] > self.ttl_seconds
+
+    def _entry(self, session_id: str) -> Optional[List[Any]]:
+        entry = self._entries.get(session_id)
+        if entry is None:
+            return None
+        now = time.monotonic()
+        if self._expired(entry, now):
+            del self._entries[session_id]
+            return None
+        entry[0] = now
+        self._entries.move_to_end(session_id)
+        return entry
+
+    def get(self, session_id: str, default: Optional[str] = None) -> Optional[str]:
+        entry = self._entry(session_id)
+        return entry[1] if entry is not None else default
+
+    def __getitem__(self, session_id: str) -> str:
+        entry = self._entry(session_id)
+        if entry is None:
+            raise KeyError(session_id)
+        return entry[1]
+
+    def __contains__(self, session_id: str) -> bool:
+        return self._entry(session_id) is not None
+
+    def __setitem__(self, session_id: str, thread_id: str) -> None:
+        entry = self._entry(session_id)
+        if entry is not None and entry[1] == thread_id:
+            return
+        self._entries[session_id] = [time.monotonic(), thread_id, None]
+        self._entries.move_to_end(session_id)
+        self._evict()
+
+    def usage(self, session_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._entry(session_id)
+        return entry[2] if entry is not None else None
+
+    def set_usage(self, session_id: str, usage: Dict[str, Any]) -> None:
+        entry = self._entry(session_id)
+        if entry is not None:
+            entry[2] = usage
+
+    def _evict(self) -> None:
+        # Reihenfolge = letzte Nutzung, abgelaufene Einträge stehen also vorn.
+        now = time.monotonic()
+        while self._entries:
+            oldest = next(iter(self._entries.values()))
+            if len(self._entries) <= max(1, self.max_sessions) and not self._expired(oldest, now):
+                break
+            self._entries.popitem(last=False)
+            self.evictions += 1
 
-    @override
-    async def on_text_delta(self, delta, snapshot):
-        if delta.value:
-            self.full_response.append(delta.value)
-            await self.queue.put(delta.value)
+    def __len__(self) -> int:
+        return len(self._entries)
 
-    @override
-    async def on_end(self):
-        await self.queue.put(None)  # Signal end
 
 class AIAssistant:
     """Sendet bereinigte Nutzerprompts an den Assistant, versieht alle
@@ -37,22 +168,145 @@ class AIAssistant:
 
     def __init__(self) -> None:
         api_key = settings.openai_api_key or os.getenv("OPENAI_API_KEY", "")
-        self.client = AsyncOpenAI(api_key=api_key)
-        # Merkt sich pro Session den zugehörigen Thread der Assistant API.
-        self._threads: Dict[str, str] = {}
+        self.client = _openai_client_class()(api_key=api_key)
+        # Merkt sich pro Session den zugehörigen Thread der Assistant API
+        # samt Kontext-Nutzung (begrenzt, siehe SessionThreads).
+        self._threads = SessionThreads()
         self.assistant_id = ASSISTANT_ID
+        # Laufende Streams: Stream-Task -> (thread_id, EventHandler), für den Shutdown.
+        self._active_runs: Dict[asyncio.Task, Tuple[str, Any]] = {}
+        # Stall-Erkennung: feste Timeouts bzw. TTFT-Perzentil der letzten Runs.
+        self.ttft_timeout_seconds = settings.openai_ttft_timeout_seconds
+        self.ttft_min_timeout_seconds = settings.openai_ttft_min_timeout_seconds
+        self.ttft_percentile = settings.openai_ttft_percentile
+        self.token_timeout_seconds = settings.openai_token_timeout_seconds
+        self.stall_retries = settings.openai_stall_retries
+        self._ttft_samples: deque = deque(maxlen=500)
+        # Kontextgröße je Thread: "none", "truncate" (nur die letzten N Nachrichten
+        # pro Run) oder "rollover" (neuer Thread mit Zusammenfassung ab Budget).
+        self.context_policy = settings.thread_context_policy
+        self.truncate_last_messages = settings.thread_truncate_last_messages
+        self.rollover_max_prompt_tokens = settings.thread_rollover_max_prompt_tokens
+        self.rollover_max_messages = settings.thread_rollover_max_messages
+        self.summary_turns = settings.thread_summary_turns
 
     async def _get_or_create_thread(self, session_id: str) -> str:
         thread_id = self._threads.get(session_id)
+        if thread_id is not None and self._context_budget_exceeded(session_id):
+            thread_id = await self._rollover_thread(session_id)
         if thread_id is None:
-            thread = await self.client.beta.threads.create(
-                metadata={"session_id": session_id, "app": "SecureGateway"}
-            )
+            with STAGE_SECONDS.time(stage="thread_create"), span("assistant.thread_create"):
+                thread = await self.client.beta.threads.create(
+                    metadata={"session_id": session_id, "app": "SecureGateway"}
+                )
             thread_id = thread.id
             self._threads[session_id] = thread_id
         return thread_id
 
-    async def ask_assistant_stream(self, session_id: str, prompt: str):
+    # -- Kontextgröße --
+
+    def _usage(self, session_id: str) -> Dict[str, Any]:
+        """Nachrichten im Thread, Prompt-Tokens des letzten Runs, letzte Turns."""
+        usage = self._threads.usage(session_id)
+        if usage is None:
+            usage = {"messages": 0, "prompt_tokens": 0, "turns": deque(maxlen=max(1, self.summary_turns))}
+            self._threads.set_usage(session_id, usage)
+        return usage
+
+    def _record_turn(self, session_id: str, prompt: str, reply: str, prompt_tokens: Optional[int] = None) -> None:
+        usage = self._usage(session_id)
+        usage["messages"] += 2 if reply else 1
+        usage["turns"].append((prompt, reply))
+        if prompt_tokens is not None:
+            usage["prompt_tokens"] = prompt_tokens
+
+    def _context_budget_exceeded(self, session_id: str) -> bool:
+        if self.context_policy != "rollover":
+            return False
+        usage = self._threads.usage(session_id)
+        if usage is None:
+            return False
+        return (
+            (self.rollover_max_messages > 0 and usage["messages"] >= self.rollover_max_messages)
+            or (self.rollover_max_prompt_tokens > 0 and usage["prompt_tokens"] >= self.rollover_max_prompt_tokens)
+        )
+
+    def build_summary(self, session_id: str, max_chars: int = 300) -> str:
+        """Kompakte Zusammenfassung der letzten Turns für einen neuen Thread.
+
+        Die Turns stammen aus dem Thread und sind damit bereits anonymisiert
+        (Platzhalter statt PII); lange Beiträge werden gekürzt.
+        """
+        def shorten(text: str) -> str:
+            text = " ".join(text.split())
+            return text if len(text) <= max_chars else text[:max_chars].rstrip() + " …"
+
+        lines = ["Zusammenfassung des bisherigen Gesprächs (letzte Beiträge, gekürzt):"]
+        for prompt, reply in self._usage(session_id)["turns"]:
+            lines.append(f"- Nutzer: {shorten(prompt)}")
+            if reply:
+                lines.append(f"- Assistent: {shorten(reply)}")
+        return "\n".join(lines)
+
+    async def _rollover_thread(self, session_id: str) -> Optional[str]:
+        """Ersetzt den Thread der Session durch einen neuen, der nur die
+        Zusammenfassung enthält. Bei Fehlern bleibt der alte Thread bestehen."""
+        summary = self.build_summary(session_id)
+        try:
+            with STAGE_SECONDS.time(stage="thread_create"), span("assistant.thread_rollover"):
+                thread = await self.client.beta.threads.create(
+                    messages=[{"role": "assistant", "content": summary}],
+                    metadata={"session_id": session_id, "app": "SecureGateway"},
+                )
+        except Exception as e:
+            logging.error(f"Thread rollover failed for session {session_id}: {e}")
+            return self._threads.get(session_id)
+        THREAD_ROLLOVERS.inc()
+        logging.info(f"Thread rollover for session {session_id}: {self._threads.get(session_id)} -> {thread.id}")
+        # Neuer Thread, neue Nutzung: die alten Turns stecken in der Zusammenfassung.
+        self._threads[session_id] = thread.id
+        usage = self._usage(session_id)
+        usage["messages"] = 1
+        usage["prompt_tokens"] = 0
+        usage["turns"].clear()
+        return thread.id
+
+    def _run_options(self) -> Dict[str, Any]:
+        if self.context_policy == "truncate" and self.truncate_last_messages > 0:
+            return {"truncation_strategy": {"type": "last_messages", "last_messages": self.truncate_last_messages}}
+        return {}
+
+    def has_thread(self, session_id: str) -> bool:
+        """True, wenn für die Session bereits ein Thread existiert (d.h. kein Erst-Turn)."""
+        return session_id in self._threads
+
+    async def seed_thread(self, session_id: str, prompt: str, reply: str) -> None:
+        """Legt einen außerhalb eines Runs beantworteten Turn (z.B. Cache-Treffer)
+        im Thread ab, damit Folgefragen den Kontext kennen."""
+        messages = [
+            {"role": "user", "content": prompt},
+            {"role": "assistant", "content": reply},
+        ]
+        try:
+            thread_id = self._threads.get(session_id)
+            if thread_id is None:
+                thread = await self.client.beta.threads.create(
+                    messages=messages,
+                    metadata={"session_id": session_id, "app": "SecureGateway"},
+                )
+                self._threads[session_id] = thread.id
+            else:
+                for message in messages:
+                    await self.client.beta.threads.messages.create(
+                        thread_id=thread_id,
+                        metadata={"session_id": session_id, "app": "SecureGateway"},
+                        **message,
+                    )
+            self._record_turn(session_id, prompt, reply)
+        except Exception as e:
+            logging.error(f"Failed to seed thread for session {session_id}: {e}")
+
+    async def ask_assistant_stream(self, session_id: str, prompt: str, run_info: Optional[Dict[str, Any]] = None):
         """Streaming-Version von ask_assistant. Yieldet Text-Deltas.
         Rückgabe via Generator: tokens.
         Gibt am Ende (nach dem Generator) zurück, ob Eskalation nötig ist?
@@ -62,55 +316,105 @@ class AIAssistant:
         oder am Ende. Da wir hier einen Generator zurückgeben, kann der Aufrufer
         nicht einfach einen Return-Wert abfangen.
         Wir müssen dem Aufrufer eine Möglichkeit geben, das Full-Response-Resultat zu prüfen.
+
+        `run_info` (optional) wird nach Ende des Streams mit `run_id` und
+        Token-Verbrauch (`prompt_tokens`, `completion_tokens`, `total_tokens`) befüllt.
         """
         thread_id = await self._get_or_create_thread(session_id)
 
         # Nachricht in den Thread legen
-        logging.info(f"OpenAI Request [Session {session_id}]: {prompt}")
-        await self.client.beta.threads.messages.create(
-            thread_id=thread_id,
-            role="user",
-            content=prompt,
-            metadata={"session_id": session_id, "app": "SecureGateway"},
-        )
-
-        handler = EventHandler()
-
-        # Start stream in background task to allow yielding from queue
-        async def stream_task():
-            try:
-                async with self.client.beta.threads.runs.stream(
-                    thread_id=thread_id,
-                    assistant_id=self.assistant_id,
-                    event_handler=handler,
-                    metadata={"session_id": session_id, "app": "SecureGateway"},
-                ) as stream:
-                    await stream.until_done()
-            except Exception as e:
-                logging.error(f"Stream failed for session {session_id}: {e}")
-            finally:
-                # Signal end of stream even on error to unblock consumer
-                await handler.queue.put(None)
+        logging.info("OpenAI Request [Session %s]: %s", session_id, redact(prompt))
+        with STAGE_SECONDS.time(stage="openai_message_create"), span("assistant.message_create"):
+            await self.client.beta.threads.messages.create(
+                thread_id=thread_id,
+                role="user",
+                content=prompt,
+                metadata={"session_id": session_id, "app": "SecureGateway"},
+            )
 
-        # Wir starten den Stream-Task nicht als Fire-and-Forget, sondern
-        # wir müssen warten, aber gleichzeitig Queue konsumieren.
-        # create_task schedule it.
-        task = asyncio.create_task(stream_task())
+        # Run-Span wird explizit beendet: er reicht über die yields dieses Generators.
+        run_span = start_span("assistant.run", thread_id=thread_id)
 
         full_text = ""
+        run_started = time.perf_counter()
+        stalled: Optional[str] = None
+        attempts = 1 + max(0, self.stall_retries)
 
-        while True:
-            token = await handler.queue.get()
-            if token is None:
-                break
-            full_text += token
-            yield token
+        for attempt in range(attempts):
+            handler = _event_handler_class()()
+            task = self._start_run(session_id, thread_id, handler, run_span)
+            attempt_started = time.perf_counter()
+            stalled = None
 
-        await task
+            try:
+                while True:
+                    timeout = self.token_timeout_seconds if full_text else self.ttft_timeout()
+                    try:
+                        token = await asyncio.wait_for(handler.queue.get(), timeout=timeout)
+                    except asyncio.TimeoutError:
+                        stalled = "inter_token" if full_text else "ttft"
+                        break
+                    if token is None:
+                        break
+                    if not full_text:
+                        self._ttft_samples.append(time.perf_counter() - attempt_started)
+                        ttft = time.perf_counter() - run_started
+                        STAGE_SECONDS.observe(ttft, stage="openai_ttft")
+                        if run_span is not None:
+                            run_span.set_attribute("openai.ttft_seconds", ttft)
+                    full_text += token
+                    yield token
+
+                if stalled is None:
+                    # Wartet auch auf einen per cancel_active_runs abgebrochenen Task, ohne zu werfen.
+                    await asyncio.wait({task})
+            finally:
+                self._active_runs.pop(task, None)
+                if not task.done():
+                    # Stall oder Konsument abgebrochen (Client getrennt, Shutdown):
+                    # Run nicht verwaist weiterlaufen lassen.
+                    task.cancel()
+                    await self._cancel_run(thread_id, handler.run_id)
+
+            if stalled is None:
+                break
+            OPENAI_STALLS.inc(phase=stalled)
+            logging.warning(f"OpenAI run {handler.run_id} stalled ({stalled}) for session {session_id}, attempt {attempt + 1}/{attempts}")
+            # Neuer Run nur, solange der Client noch nichts erhalten hat.
+            if full_text or handler.cancelled or attempt + 1 >= attempts:
+                break
+            OPENAI_STALL_RETRIES.inc()
+            await self._wait_run_finished(thread_id, handler.run_id)
+
+        if stalled is not None:
+            OPENAI_STALL_FAILURES.inc()
+            if run_span is not None:
+                run_span.set_attribute("openai.stalled", stalled)
+
+        if run_span is not None:
+            if handler.run_id:
+                run_span.set_attribute("openai.run_id", handler.run_id)
+            if handler.usage is not None:
+                run_span.set_attribute("openai.total_tokens", handler.usage.total_tokens)
+            run_span.end()
+
+        prompt_tokens = handler.usage.prompt_tokens if handler.usage is not None else None
+        if prompt_tokens is not None:
+            OPENAI_PROMPT_TOKENS.observe(prompt_tokens, policy=self.context_policy)
+        self._record_turn(session_id, prompt, full_text, prompt_tokens)
+
+        if run_info is not None:
+            run_info["run_id"] = handler.run_id
+            run_info["cancelled"] = handler.cancelled
+            run_info["stalled"] = stalled
+            if handler.usage is not None:
+                run_info["prompt_tokens"] = handler.usage.prompt_tokens
+                run_info["completion_tokens"] = handler.usage.completion_tokens
+                run_info["total_tokens"] = handler.usage.total_tokens
 
         # Nach Ende des Streams prüfen wir auf Eskalation
         if "ESKALATION_NOETIG" in full_text:
-             logging.info(f"Escalation triggered by AI response: {full_text}")
+             logging.info("Escalation triggered by AI response: %s", redact(full_text))
              # Hier können wir eine Exception werfen oder einen speziellen Token yielden?
              # Oder wir nutzen einen Callback / Shared State.
              # Da der Router Zugriff auf `app.state.notifier` hat, wäre es gut, wenn
@@ -128,6 +432,86 @@ class AIAssistant:
         # Wir können das full_text Ergebnis im Handler speichern, falls nötig.
         # Aber der Router verarbeitet den Stream.
 
+    def _start_run(self, session_id: str, thread_id: str, handler, run_span):
+        """Startet den gestreamten Run als Task; Tokens landen in `handler.queue`."""
+
+        async def stream_task():
+            try:
+                async with self.client.beta.threads.runs.stream(
+                    thread_id=thread_id,
+                    assistant_id=self.assistant_id,
+                    event_handler=handler,
+                    metadata={"session_id": session_id, "app": "SecureGateway"},
+                    **self._run_options(),
+                ) as stream:
+                    await stream.until_done()
+            except Exception as e:
+                ERRORS.inc(stage="openai_stream")
+                if run_span is not None:
+                    run_span.record_error(e)
+                logging.error(f"Stream failed for session {session_id}: {e}")
+            finally:
+                # Signal end of stream even on error to unblock consumer
+                await handler.queue.put(None)
+
+        task = asyncio.create_task(stream_task())
+        self._active_runs[task] = (thread_id, handler)
+        return task
+
+    def ttft_timeout(self) -> float:
+        """Timeout bis zum ersten Token: fest, oder (mit `OPENAI_TTFT_PERCENTILE`)
+        das Perzentil der letzten Runs, begrenzt auf [min, max]."""
+        if not self.ttft_percentile or len(self._ttft_samples) < TTFT_MIN_SAMPLES:
+            return self.ttft_timeout_seconds
+        ordered = sorted(self._ttft_samples)
+        threshold = ordered[min(len(ordered) - 1, int(len(ordered) * self.ttft_percentile / 100))]
+        return min(self.ttft_timeout_seconds, max(self.ttft_min_timeout_seconds, threshold))
+
+    async def _wait_run_finished(self, thread_id: str, run_id: Optional[str], timeout: float = 5.0) -> None:
+        """Wartet, bis ein stornierter Run beendet ist; vorher lehnt der Thread neue Runs ab."""
+        if run_id is None:
+            return
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                run = await self.client.beta.threads.runs.retrieve(run_id=run_id, thread_id=thread_id)
+            except Exception as e:
+                logging.warning(f"Failed to retrieve run {run_id}: {e}")
+                return
+            if run.status in TERMINAL_RUN_STATUSES:
+                return
+            await asyncio.sleep(0.2)
+
+    async def _cancel_run(self, thread_id: str, run_id: Optional[str]) -> None:
+        if run_id is None:
+            return
+        try:
+            await self.client.beta.threads.runs.cancel(run_id=run_id, thread_id=thread_id)
+        except Exception as e:
+            logging.warning(f"Failed to cancel run {run_id}: {e}")
+
+    @property
+    def active_runs(self) -> int:
+        return len(self._active_runs)
+
+    async def cancel_active_runs(self) -> int:
+        """Bricht alle laufenden Streams ab (Shutdown-Deadline überschritten).
+
+        Die Runs werden bei OpenAI storniert; die Konsumenten erhalten ein
+        reguläres Stream-Ende (`run_info["cancelled"]`) und können die
+        Teilantwort noch speichern.
+        """
+        runs = list(self._active_runs.items())
+        for task, (_, handler) in runs:
+            handler.cancelled = True
+            task.cancel()
+        await asyncio.gather(*(self._cancel_run(thread_id, handler.run_id) for _, (thread_id, handler) in runs))
+        return len(runs)
+
+    async def close(self) -> None:
+        """Schließt den HTTP-Pool des OpenAI-Clients."""
+        await self.client.close()
+
     async def ask_assistant(self, session_id: str, prompt: str) -> Tuple[str, bool]:
         """Sendet den Prompt an den Assistant und prüft, ob eskaliert werden muss.
 
@@ -150,7 +534,7 @@ class AIAssistant:
             self._threads[session_id] = thread_id
 
         # Nachricht in den Thread legen
-        logging.info(f"OpenAI Request [Session {session_id}]: {prompt}")
+        logging.info("OpenAI Request [Session %s]: %s", session_id, redact(prompt))
         await self.client.beta.threads.messages.create(
             thread_id=thread_id,
             role="user",
@@ -184,11 +568,11 @@ class AIAssistant:
             return "", True
 
         content = latest_message.content[0].text.value
-        logging.info(f"OpenAI Response [Session {session_id}]: {content}")
+        logging.info("OpenAI Response [Session %s]: %s", session_id, redact(content))
 
         # Eskalationssignal prüfen
         if "ESKALATION_NOETIG" in content:
-            logging.info(f"Escalation triggered by AI response: {content}")
+            logging.info("Escalation triggered by AI response: %s", redact(content))
             return "", True
 
         return content, False
@@ -14,6 +14,112 @@ class Settings(BaseSettings):
     assistant_id: str = Field("asst_YnzqT0bP0ag3mQ4O0v99HJiq", alias="ASSISTANT_ID")  # Im OpenAI-Dashboard generieren.
     teams_webhook_url: str = Field("", alias="TEAMS_WEBHOOK_URL")
     service_port: int = 1985
+    database_url: str = "sqlite:///./training_hub.db"  # TrainingsHub-DB (z.B. Benchmarks: temporäre Datei)
+
+    # Stall-Erkennung für OpenAI-Streams: Run abbrechen und einmal neu starten,
+    # sonst Fallback-Hinweis ("message") oder Übergabe an einen Mitarbeiter ("escalate").
+    openai_ttft_timeout_seconds: float = 20.0  # Obergrenze bis zum ersten Token
+    openai_ttft_percentile: float = 0.0  # z.B. 99: Timeout = p99 der letzten TTFTs (0 = fest)
+    openai_ttft_min_timeout_seconds: float = 3.0
+    openai_token_timeout_seconds: float = 15.0  # max. Pause zwischen zwei Tokens
+    openai_stall_retries: int = 1
+    openai_stall_action: str = "message"
+
+    # Kontextgröße der OpenAI-Threads: "none", "truncate" (Run sieht nur die letzten
+    # N Nachrichten) oder "rollover" (neuer Thread mit Zusammenfassung ab Budget).
+    thread_context_policy: str = "none"
+    thread_truncate_last_messages: int = 20
+    thread_rollover_max_prompt_tokens: int = 8000  # Prompt-Tokens des letzten Runs
+    thread_rollover_max_messages: int = 40
+    thread_summary_turns: int = 5
+    # Session -> Thread-Zuordnung im Worker (LRU + TTL); verdrängte Sessions erhalten einen neuen Thread.
+    thread_cache_max_sessions: int = 10000
+    thread_cache_ttl_seconds: float = 24 * 3600
+
+    # Antwort-Cache für anonymisierte Erstanfragen (optional, standardmäßig aus).
+    answer_cache_enabled: bool = False
+    answer_cache_ttl_seconds: int = 24 * 3600
+    answer_cache_max_entries: int = 5000
+    knowledge_base_version: str = "1"  # Erhöhen, wenn die Wissensbasis des Assistants aktualisiert wird.
+
+    # LRU-Cache für GLiNER-Ergebnisse kurzer Nachrichten (Grüße, Standardfragen).
+    ner_cache_max_entries: int = 2048
+    ner_cache_ttl_seconds: float = 3600.0
+    ner_cache_max_text_length: int = 200
+
+    # Admission Control für GLiNER: eigener Executor, begrenzte Queue, Deadline.
+    ner_workers: int = 2
+    ner_max_queue: int = 32
+    ner_deadline_seconds: float = 5.0
+    ner_overload_mode: str = "reject"  # "reject" (503 + Retry-After) oder "degrade" (Regex-only + Eskalation)
+
+    # Bulk-Anonymisierung des Bestands für Trainingsexporte (Prozess-Pool).
+    anonymize_workers: int = 2  # jeder Worker lädt GLiNER (~1 GB RAM)
+    anonymize_chunk_size: int = 256
+    anonymize_ner_batch_size: int = 16
+
+    # Retention der TrainingsHub-DB (0/False = Richtlinie aus), Löschen in kleinen Batches.
+    retention_enabled: bool = False
+    retention_interval_seconds: float = 3600.0
+    retention_max_age_days: int = 0
+    retention_max_messages_per_session: int = 0
+    retention_after_export: bool = False  # Nachrichten nach vollständigem /admin/export löschen
+    retention_batch_size: int = 500
+    retention_batch_pause_seconds: float = 0.05
+    retention_vacuum_pages: int = 256
+
+    # Kennzahlen für /admin/stats: periodische Verdichtung ab Watermark.
+    analytics_enabled: bool = True
+    analytics_interval_seconds: float = 60.0
+    analytics_batch_size: int = 5000
+
+    # Rate-Limit für /chat/message: Token Bucket je Session und je Client-IP (0 = aus).
+    rate_limit_enabled: bool = False
+    rate_limit_session_per_minute: float = 20.0
+    rate_limit_session_burst: int = 10
+    rate_limit_ip_per_minute: float = 120.0
+    rate_limit_ip_burst: int = 60
+    rate_limit_trust_forwarded_for: bool = False  # nur hinter eigenem Reverse Proxy
+    rate_limit_trusted_proxy_hops: int = 1  # Anzahl eigener Proxys, die an X-Forwarded-For anhängen
+
+    # Batch-API für Massen-Eingänge (E-Mails, Formulare), standardmäßig aus.
+    batch_enabled: bool = False
+    batch_max_items: int = 1000
+    batch_concurrency: int = 8  # parallele Assistant-Runs je Batch
+    batch_ner_batch_size: int = 16
+
+    # Lokaler Status-Cache (AI/HUMAN) pro Worker; Invalidierung via Redis Pub/Sub.
+    status_cache_ttl_seconds: float = 2.0
+
+    # Graceful Shutdown: so lange dürfen laufende Antwort-Streams noch fertig werden.
+    shutdown_drain_seconds: float = 20.0
+    shutdown_retry_after_seconds: int = 5
+    shutdown_notify_flush_seconds: float = 5.0
+    shutdown_executor_seconds: float = 10.0  # Deadline für ausstehende DB-Writes
+
+    # Logging: Queue-basiert (I/O im Hintergrund-Thread), JSON, Rotation, Sampling, Redaction.
+    log_file: str = "chat_debug.log"
+    log_max_bytes: int = 10 * 1024 * 1024
+    log_backup_count: int = 5
+    log_format: str = "json"  # "json" oder "text"
+    log_sample_rates: str = ""  # z.B. "httpx=0.05,app.core.scanner=0.1"
+    log_redact_content: bool = True  # Nachrichteninhalte nur als Länge + HMAC loggen
+    log_redact_secret: str = ""  # HMAC-Schlüssel für redact(); leer = zufällig pro Prozess
+
+    # Request-Tracing: Korrelations-ID immer, Span-Export nur für gesampelte Requests.
+    trace_exporter: str = "none"  # "none", "file" (OTLP/JSON-Lines) oder "otlp" (HTTP-Collector)
+    trace_sample_rate: float = 0.01
+    trace_file: str = "traces.jsonl"
+    trace_otlp_endpoint: str = "http://localhost:4318/v1/traces"
+
+    # Teams-Outbox: Zustellung im Hintergrund mit Retries und Rate-Limit.
+    notify_timeout_seconds: float = 10.0
+    notify_max_attempts: int = 8
+    notify_backoff_base_seconds: float = 2.0
+    notify_backoff_max_seconds: float = 300.0
+    notify_max_concurrency: int = 4
+    notify_rate_per_second: float = 2.0  # Teams drosselt Webhooks bei zu vielen Requests.
+    notify_poll_interval_seconds: float = 5.0
 
 
 settings = Settings()
@@ -1,5 +1,8 @@
 """Verbindet das Secure PolarisDX AI-Chat Gateway mit Redis und stellt einen
-synchronen Client für PII-Storage und Retrieval bereit."""
+synchronen Client für PII-Storage und Retrieval bereit.
+
+Der Client wird erst im Lifespan der App erzeugt (kein Verbindungsaufbau beim
+Import) und von allen Services gemeinsam genutzt (`app.state.redis`)."""
 import redis
 
 from app.core.config import settings
@@ -14,6 +17,3 @@ def get_redis_client() -> redis.Redis:
     )
     client.ping()
     return client
-
-
-redis_client = get_redis_client()
@@ -1,10 +1,13 @@
 """Datenbankmodelle für die persistente Speicherung von Chat-Verläufen (TrainingsHub)."""
+import json
 import datetime
 from typing import List, Optional
 
-from sqlalchemy import String, Text, DateTime, ForeignKey, create_engine
+from sqlalchemy import MetaData, String, Text, DateTime, Integer, ForeignKey, Index, create_engine, inspect, text
+from sqlalchemy.schema import CreateTable
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship, sessionmaker
 from app.core.config import settings
+from app.core.search import init_search_index
 
 # Basis-Klasse für SQLAlchemy Modelle
 class Base(DeclarativeBase):
@@ -13,6 +16,8 @@ class Base(DeclarativeBase):
 class ChatSession(Base):
     """Repräsentiert eine Chat-Sitzung."""
     __tablename__ = "chat_sessions"
+    # Neue Sessions für /admin/stats (Keyset auf created_at, id).
+    __table_args__ = (Index("ix_chat_sessions_created_at", "created_at", "id"),)
 
     id: Mapped[str] = mapped_column(String, primary_key=True)  # Wir nutzen die session_id vom Client/System
     created_at: Mapped[datetime.datetime] = mapped_column(DateTime, default=datetime.datetime.utcnow)
@@ -31,11 +36,18 @@ class ChatMessage(Base):
     """Repräsentiert eine einzelne Nachricht innerhalb einer Session."""
     __tablename__ = "chat_messages"
 
+    # Verlauf laden und Retention (Löschen je Session) ohne Full-Scan.
+    # AUTOINCREMENT: IDs gelöschter Nachrichten (Retention) werden nie neu vergeben,
+    # sonst fielen neue Nachrichten unter Export-/Analytics-Watermarks.
+    __table_args__ = (Index("ix_chat_messages_session_id", "session_id", "id"), {"sqlite_autoincrement": True})
+
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     session_id: Mapped[str] = mapped_column(ForeignKey("chat_sessions.id"))
 
     role: Mapped[str] = mapped_column(String(50))  # 'user', 'assistant', 'system'
     content: Mapped[str] = mapped_column(Text)     # Der eigentliche Text (ggf. re-personalisiert für Lesbarkeit)
+    # Anonymisierte Fassung für Trainingsexporte (Bulk-Job `app.core.anonymizer`).
+    anonymized_content: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     timestamp: Mapped[datetime.datetime] = mapped_column(DateTime, default=datetime.datetime.utcnow)
 
     session: Mapped["ChatSession"] = relationship(back_populates="messages")
@@ -44,16 +56,174 @@ class ChatMessage(Base):
         return f"<ChatMessage(role='{self.role}', session_id='{self.session_id}')>"
 
 
+class OutboxEntry(Base):
+    """Persistente Warteschlange für Teams-Benachrichtigungen (Outbox-Pattern).
+
+    Status: PENDING (wartet/Retry), DELIVERED (zugestellt), DEAD (Dead-Letter
+    nach Ausschöpfen aller Versuche).
+    """
+    __tablename__ = "notification_outbox"
+    __table_args__ = (Index("ix_notification_outbox_due", "status", "next_attempt_at"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    session_id: Mapped[str] = mapped_column(String)
+    payload: Mapped[str] = mapped_column(Text)  # JSON der Adaptive Card
+    status: Mapped[str] = mapped_column(String(20), default="PENDING")
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    next_attempt_at: Mapped[datetime.datetime] = mapped_column(DateTime, default=datetime.datetime.utcnow)
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime, default=datetime.datetime.utcnow)
+    delivered_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime, nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<OutboxEntry(id={self.id}, session_id='{self.session_id}', status='{self.status}')>"
+
+
+class Escalation(Base):
+    """Eine ausgelöste Eskalation (Session an einen Mitarbeiter übergeben).
+
+    Quelle für die Kennzahlen in `/admin/stats`, unabhängig davon, ob eine
+    Teams-Benachrichtigung konfiguriert ist oder zugestellt wurde.
+    """
+    __tablename__ = "escalations"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    session_id: Mapped[str] = mapped_column(String)
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime, default=datetime.datetime.utcnow)
+
+    def __repr__(self) -> str:
+        return f"<Escalation(id={self.id}, session_id='{self.session_id}')>"
+
+
+class JobState(Base):
+    """Checkpoint/Fortschritt von Hintergrund-Jobs (Schlüssel -> JSON), z.B. der
+    zuletzt verarbeiteten Nachrichten-ID, damit Jobs nach Abbruch fortsetzen."""
+    __tablename__ = "job_state"
+
+    name: Mapped[str] = mapped_column(String, primary_key=True)
+    value: Mapped[str] = mapped_column(Text, default="{}")
+    updated_at: Mapped[datetime.datetime] = mapped_column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+    def __repr__(self) -> str:
+        return f"<JobState(name='{self.name}', updated_at='{self.updated_at}')>"
+
+
+class StatsRollup(Base):
+    """Vorverdichtete Kennzahlen für `/admin/stats` (Job `app.core.analytics`).
+
+    `granularity` ist "hour", "day" oder "total"; `bucket` der Beginn der
+    Stunde/des Tages (UTC, ISO-Format) bzw. "all".
+    """
+    __tablename__ = "stats_rollup"
+
+    granularity: Mapped[str] = mapped_column(String(10), primary_key=True)
+    bucket: Mapped[str] = mapped_column(String(20), primary_key=True)
+    metric: Mapped[str] = mapped_column(String(50), primary_key=True)  # z.B. messages_user, sessions, escalations
+    value: Mapped[int] = mapped_column(Integer, default=0)
+
+    def __repr__(self) -> str:
+        return f"<StatsRollup({self.granularity} {self.bucket} {self.metric}={self.value})>"
+
+
+# Spalten, die nach dem ersten Release hinzukamen: create_all() legt sie in
+# bestehenden Tabellen nicht an, daher einfache ALTER-Migration beim Start.
+_ADDED_COLUMNS = [
+    ("chat_messages", "anonymized_content", "TEXT"),
+]
+
+
 # SQLite Datenbank Setup
-# Wir nutzen eine lokale Datei `training_hub.db`
-DB_URL = "sqlite:///./training_hub.db"
+# Standard ist die lokale Datei `training_hub.db` (überschreibbar via DATABASE_URL)
+DB_URL = settings.database_url
 
-engine = create_engine(DB_URL, connect_args={"check_same_thread": False})
+# hide_parameters: Fehlermeldungen enthalten sonst die gebundenen Werte (Nachrichtentexte).
+engine = create_engine(DB_URL, connect_args={"check_same_thread": False}, hide_parameters=True)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 def init_db():
-    """Erstellt die Tabellen, falls sie noch nicht existieren."""
-    Base.metadata.create_all(bind=engine)
+    """Erstellt die Tabellen und den Volltext-Index, falls sie noch nicht existieren."""
+    with engine.begin() as conn:
+        if engine.dialect.name == "sqlite":
+            # Freigegebene Seiten schrittweise zurückgeben (Retention-Job). Wirkt nur
+            # bei neuen Dateien; bestehende DBs einmalig per VACUUM umstellen.
+            conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+        Base.metadata.create_all(bind=conn)
+    _add_missing_columns(engine)
+    _enable_message_autoincrement(engine)
+    init_search_index(engine)
+
+def _add_missing_columns(engine):
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table, column, ddl_type in _ADDED_COLUMNS:
+            if column not in {c["name"] for c in inspector.get_columns(table)}:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}"))
+        # Indizes bestehender Tabellen legt create_all() ebenfalls nicht an.
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+
+# Job-Checkpoints, die Nachrichten-IDs enthalten: Job-Name (Präfix bei ":") -> Schlüssel.
+# Andere Werte (Byte-Offsets, Zähler) sind keine IDs und dürfen die Sequenz nicht setzen.
+_MESSAGE_ID_WATERMARKS = {
+    "export": "watermark",          # app.core.retention.EXPORT_STATE
+    "analytics": "messages",        # app.core.analytics.ANALYTICS_STATE
+    "anonymize:": "last_id",        # app.core.anonymizer (je Ziel)
+}
+
+
+def _message_id_watermark_key(name: str) -> Optional[str]:
+    for prefix, key in _MESSAGE_ID_WATERMARKS.items():
+        if name == prefix or (prefix.endswith(":") and name.startswith(prefix)):
+            return key
+    return None
+
+
+def _enable_message_autoincrement(engine):
+    """Baut `chat_messages` aus DBs vor AUTOINCREMENT einmalig neu auf.
+
+    IDs bleiben erhalten (FTS-Index und Watermarks passen weiter). Die
+    Sequenz startet oberhalb der höchsten ID aus Bestand und den ID-Watermarks
+    der Job-Checkpoints (`_MESSAGE_ID_WATERMARKS`), damit auch bereits
+    gelöschte IDs nicht erneut vergeben werden. Trigger
+    des Volltext-Index entfallen mit der alten Tabelle und werden von
+    `init_search_index` neu angelegt.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    table = ChatMessage.__table__
+    with engine.begin() as conn:
+        ddl = conn.execute(
+            text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": table.name}
+        ).scalar()
+        if ddl is None or "AUTOINCREMENT" in ddl.upper():
+            return
+
+        metadata = MetaData()
+        ChatSession.__table__.to_metadata(metadata)
+        rebuild = table.to_metadata(metadata, name=f"{table.name}_rebuild")
+        conn.execute(CreateTable(rebuild))
+        columns = ", ".join(column.name for column in table.columns)
+        conn.execute(text(f"INSERT INTO {rebuild.name} ({columns}) SELECT {columns} FROM {table.name}"))
+        conn.execute(text(f"DROP TABLE {table.name}"))
+        conn.execute(text(f"ALTER TABLE {rebuild.name} RENAME TO {table.name}"))
+        for index in table.indexes:
+            index.create(bind=conn)
+
+        highest = conn.execute(text(f"SELECT COALESCE(MAX(id), 0) FROM {table.name}")).scalar()
+        for name, value in conn.execute(text(f"SELECT name, value FROM {JobState.__tablename__}")):
+            key = _message_id_watermark_key(name)
+            if key is None:
+                continue
+            try:
+                watermark = json.loads(value).get(key)
+            except (ValueError, AttributeError):
+                continue
+            if isinstance(watermark, int) and not isinstance(watermark, bool):
+                highest = max(highest, watermark)
+        conn.execute(text("DELETE FROM sqlite_sequence WHERE name = :name"), {"name": table.name})
+        conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)"), {"name": table.name, "seq": highest})
 
 def get_db():
     """Dependency für FastAPI Routes."""
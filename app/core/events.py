@@ -0,0 +1,107 @@
+"""Session-Events für WebSocket-Clients (Server-Push über alle Worker).
+
+Statuswechsel (AI/HUMAN) veröffentlicht der Vault bereits auf dem Kanal
+`status_changes`; Nachrichten von Mitarbeitern laufen über `session_events`.
+Jeder Worker abonniert beide Kanäle einmal in einem Hintergrund-Thread (wie
+der Status-Listener des Vaults) und reicht Events an die lokal verbundenen
+WebSockets der jeweiligen Session weiter.
+"""
+import json
+import time
+import asyncio
+import logging
+import threading
+from typing import Any, Dict
+
+from app.core.metrics import counter
+from app.core.vault import STATUS_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+# Pub/Sub-Kanal für Events außer Statuswechseln (z.B. Antworten von Mitarbeitern).
+EVENTS_CHANNEL = "session_events"
+# Obergrenze ungelesener Events je Verbindung; ältere Events eines hängenden Clients werden verworfen.
+SUBSCRIBER_QUEUE_SIZE = 100
+
+SESSION_EVENTS_DROPPED = counter("session_events_dropped_total", "Verworfene Events wegen voller Client-Warteschlange.")
+
+
+class SessionEventBus:
+    """Verteilt Session-Events per Redis Pub/Sub an lokale Abonnenten."""
+
+    def __init__(self, redis_conn):
+        self.redis = redis_conn
+        # session_id -> {Queue: Event-Loop der Verbindung}
+        self._subscribers: Dict[str, Dict[asyncio.Queue, asyncio.AbstractEventLoop]] = {}
+        self._lock = threading.Lock()
+        self._listener = None
+
+    def publish(self, session_id: str, event_type: str, **data: Any) -> None:
+        self.redis.publish(EVENTS_CHANNEL, json.dumps({"session_id": session_id, "type": event_type, **data}))
+
+    def subscribe(self, session_id: str) -> asyncio.Queue:
+        """Registriert eine Verbindung; Events landen in der gelieferten Queue."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(session_id, {})[queue] = asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, session_id: str, queue: asyncio.Queue) -> None:
+        with self._lock:
+            queues = self._subscribers.get(session_id)
+            if queues is not None:
+                queues.pop(queue, None)
+                if not queues:
+                    del self._subscribers[session_id]
+
+    @property
+    def connections(self) -> int:
+        with self._lock:
+            return sum(len(queues) for queues in self._subscribers.values())
+
+    def _dispatch(self, session_id: str, event: Dict[str, Any]) -> None:
+        with self._lock:
+            targets = list(self._subscribers.get(session_id, {}).items())
+        for queue, loop in targets:
+            try:
+                loop.call_soon_threadsafe(_deliver, queue, event)
+            except RuntimeError:
+                # Event-Loop der Verbindung ist bereits beendet.
+                self.unsubscribe(session_id, queue)
+
+    def _on_message(self, message) -> None:
+        try:
+            data = json.loads(message["data"])
+            session_id = data.pop("session_id")
+            if message["channel"] == STATUS_CHANNEL:
+                data = {"type": "status", "mode": data["mode"]}
+        except (ValueError, KeyError, TypeError, AttributeError):
+            logger.warning(f"Ignoring malformed session event: {message!r}")
+            return
+        self._dispatch(session_id, data)
+
+    def _on_listener_error(self, exc, pubsub, thread) -> None:
+        # Während eines Verbindungsabbruchs können Events verloren gehen.
+        logger.warning(f"Session event listener error: {exc}")
+        time.sleep(1.0)
+
+    def start_listener(self) -> None:
+        """Abonniert Status- und Session-Events (ein Listener pro Worker)."""
+        if self._listener is not None:
+            return
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{STATUS_CHANNEL: self._on_message, EVENTS_CHANNEL: self._on_message})
+        self._listener = pubsub.run_in_thread(sleep_time=1.0, daemon=True, exception_handler=self._on_listener_error)
+
+    def stop_listener(self) -> None:
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
+
+def _deliver(queue: asyncio.Queue, event: Dict[str, Any]) -> None:
+    if queue.full():
+        SESSION_EVENTS_DROPPED.inc()
+        queue.get_nowait()
+    queue.put_nowait(event)
+
@@ -0,0 +1,30 @@
+"""Checkpoints für Hintergrund-Jobs des TrainingsHub (Tabelle `job_state`).
+
+Jobs speichern ihren Fortschritt (z.B. die zuletzt verarbeitete
+Nachrichten-ID) als JSON unter einem festen Namen. Der Checkpoint wird in der
+Transaktion des Jobs geschrieben (`save_job_state` committet nicht), damit
+Ergebnis und Fortschritt nur gemeinsam sichtbar werden.
+"""
+import json
+from typing import Any, Dict
+
+from sqlalchemy.orm import Session
+
+from app.core.db_sqla import JobState
+
+
+def load_job_state(db: Session, name: str) -> Dict[str, Any]:
+    """Liefert den gespeicherten Zustand oder ein leeres Dict."""
+    entry = db.get(JobState, name)
+    return json.loads(entry.value) if entry is not None else {}
+
+
+def save_job_state(db: Session, name: str, value: Dict[str, Any]) -> None:
+    """Legt den Zustand an bzw. überschreibt ihn (Commit durch den Aufrufer)."""
+    db.merge(JobState(name=name, value=json.dumps(value)))
+
+
+def reset_job_state(db: Session, name: str) -> None:
+    entry = db.get(JobState, name)
+    if entry is not None:
+        db.delete(entry)
@@ -0,0 +1,148 @@
+"""Geordnetes Herunterfahren des Secure PolarisDX AI-Chat Gateways.
+
+Ablauf bei SIGTERM/SIGINT (z.B. Rolling Restart):
+1. Keine neuen Chats mehr annehmen (`/chat/message` antwortet 503 + Retry-After).
+2. Laufende Antwort-Streams bis zur Deadline (`SHUTDOWN_DRAIN_SECONDS`)
+   regulär beenden lassen.
+3. Danach verbleibende OpenAI-Runs stornieren; die Streams enden mit der
+   Teilantwort, die noch gespeichert wird.
+4. Im Lifespan-Shutdown: ausstehende DB-Writes (Executor) und fällige
+   Benachrichtigungen abarbeiten, Redis- und HTTP-Pools schließen.
+
+Der Drain muss schon beim Signal starten: uvicorn ruft den Lifespan-Shutdown
+erst auf, wenn alle Verbindungen geschlossen sind.
+"""
+import signal
+import asyncio
+import logging
+import threading
+from concurrent.futures import Executor
+from typing import Awaitable, Callable, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+HANDLED_SIGNALS = (signal.SIGINT, signal.SIGTERM)
+
+
+class ShutdownCoordinator:
+    """Zählt aktive Streams und steuert Annahme-Stopp und Drain."""
+
+    def __init__(
+        self,
+        cancel_streams: Optional[Callable[[], Awaitable[int]]] = None,
+        drain_seconds: float = settings.shutdown_drain_seconds,
+        cancel_grace_seconds: float = 5.0,
+    ):
+        self.cancel_streams = cancel_streams
+        self.drain_seconds = drain_seconds
+        self.cancel_grace_seconds = cancel_grace_seconds
+        self.accepting = True
+        self.active_streams = 0
+        self._idle: Optional[asyncio.Event] = None
+        self._drain_task: Optional[asyncio.Task] = None
+
+    # -- Streams --
+
+    def _idle_event(self) -> asyncio.Event:
+        if self._idle is None:
+            self._idle = asyncio.Event()
+            if self.active_streams == 0:
+                self._idle.set()
+        return self._idle
+
+    def stream_started(self) -> None:
+        self.active_streams += 1
+        self._idle_event().clear()
+
+    def stream_finished(self) -> None:
+        self.active_streams -= 1
+        if self.active_streams <= 0:
+            self.active_streams = 0
+            self._idle_event().set()
+
+    # -- Shutdown --
+
+    def begin_drain(self) -> None:
+        """Stoppt die Annahme neuer Chats und startet den Drain (idempotent)."""
+        if self._drain_task is not None:
+            return
+        self.accepting = False
+        logger.info(f"Shutdown: draining {self.active_streams} active stream(s), deadline {self.drain_seconds}s")
+        self._drain_task = asyncio.get_running_loop().create_task(self._drain())
+
+    async def drain(self) -> bool:
+        """Startet den Drain falls nötig und wartet auf sein Ende.
+        True, wenn alle Streams ohne Abbruch beendet wurden."""
+        self.begin_drain()
+        return await asyncio.shield(self._drain_task)
+
+    async def _drain(self) -> bool:
+        idle = self._idle_event()
+        try:
+            await asyncio.wait_for(idle.wait(), timeout=self.drain_seconds)
+            return True
+        except asyncio.TimeoutError:
+            pass
+
+        logger.warning(f"Shutdown: drain deadline exceeded, cancelling {self.active_streams} stream(s)")
+        if self.cancel_streams is not None:
+            try:
+                await self.cancel_streams()
+            except Exception as e:
+                logger.error(f"Shutdown: cancelling streams failed: {e}")
+        # Abgebrochene Streams speichern noch ihre Teilantwort.
+        try:
+            await asyncio.wait_for(idle.wait(), timeout=self.cancel_grace_seconds)
+        except asyncio.TimeoutError:
+            logger.error(f"Shutdown: {self.active_streams} stream(s) still open after cancellation")
+        return False
+
+    def install_signal_handlers(self) -> None:
+        """Startet den Drain beim Signal und reicht es an den bisherigen
+        Handler (uvicorn) weiter, der danach keine Verbindungen mehr annimmt."""
+        # Signal-Handler lassen sich nur im Main-Thread setzen (nicht z.B. im TestClient).
+        if threading.current_thread() is not threading.main_thread():
+            return
+        loop = asyncio.get_running_loop()
+        for sig in HANDLED_SIGNALS:
+            previous = signal.getsignal(sig)
+
+            def handler(signum, frame, previous=previous):
+                loop.call_soon_threadsafe(self.begin_drain)
+                if callable(previous):
+                    previous(signum, frame)
+                else:
+                    # SIG_DFL/SIG_IGN: ursprüngliches Verhalten wiederherstellen und auslösen.
+                    # None = Handler aus C gesetzt, nicht wiederherstellbar -> Standardverhalten.
+                    signal.signal(signum, previous if previous is not None else signal.SIG_DFL)
+                    signal.raise_signal(signum)
+
+            signal.signal(sig, handler)
+
+
+async def shutdown_executor(executor: Executor, timeout: float = settings.shutdown_executor_seconds) -> bool:
+    """Wartet auf ausstehende Jobs des Executors, ohne den Event-Loop zu blockieren.
+
+    `shutdown(wait=True)` läuft in einem eigenen Thread (nicht im Executor
+    selbst, der sonst auf sich warten würde). False, wenn die Deadline
+    überschritten wurde; die restlichen Jobs laufen dann im Hintergrund weiter.
+    """
+    loop = asyncio.get_running_loop()
+    done = asyncio.Event()
+
+    def wait() -> None:
+        executor.shutdown(wait=True)
+        try:
+            loop.call_soon_threadsafe(done.set)
+        except RuntimeError:
+            pass  # Loop bereits geschlossen
+
+    threading.Thread(target=wait, name="executor-shutdown", daemon=True).start()
+    try:
+        await asyncio.wait_for(done.wait(), timeout=timeout)
+        return True
+    except asyncio.TimeoutError:
+        logger.error(f"Shutdown: pending executor jobs not finished after {timeout}s")
+        return False
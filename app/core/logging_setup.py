@@ -1,16 +1,169 @@
+import copy
+import json
+import queue
+import atexit
+import random
+import hmac
+import secrets
+import hashlib
 import logging
+import datetime
 import sys
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional
 
-def setup_logging():
-    """Configures logging to write to both console and a file."""
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
-        handlers=[
-            logging.StreamHandler(sys.stdout),
-            logging.FileHandler("chat_debug.log", mode="a", encoding="utf-8"),
-        ],
+from app.core.config import settings
+from app.core.tracing import TraceContextFilter
+
+# Attribute eines LogRecords, die nicht als "extra" ins JSON übernommen werden.
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+# Fallback, wenn LOG_REDACT_SECRET fehlt: Hashes sind dann nur innerhalb eines Prozesses vergleichbar.
+_PROCESS_REDACT_KEY = secrets.token_bytes(32)
+
+# Aktiver Listener; setup_logging() startet höchstens einen.
+_listener: Optional[QueueListener] = None
+
+
+def redact(text: str) -> str:
+    """Ersetzt Nachrichteninhalte im Log durch Länge und HMAC (LOG_REDACT_CONTENT).
+
+    Der HMAC erlaubt es, identische Inhalte über Log-Zeilen hinweg zu
+    korrelieren, ohne Klartext (PII) auf die Platte zu schreiben. Ohne den
+    Schlüssel (LOG_REDACT_SECRET) lassen sich kurze Inhalte wie Namen oder
+    E-Mail-Adressen nicht per Wörterbuch aus dem Log zurückrechnen.
+    """
+    if not settings.log_redact_content:
+        return text
+    key = settings.log_redact_secret.encode("utf-8") or _PROCESS_REDACT_KEY
+    digest = hmac.new(key, text.encode("utf-8"), hashlib.sha256).hexdigest()[:12]
+    return f"<redacted len={len(text)} hmac={digest}>"
+
+
+class JsonFormatter(logging.Formatter):
+    """Strukturierte Log-Records als eine JSON-Zeile pro Eintrag."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _RecordQueueHandler(QueueHandler):
+    """Wie QueueHandler, formatiert den Record aber nicht vor: die Standard-
+    Implementierung würde "LEVEL:logger:" in die Nachricht schreiben. Nur die
+    Argumente und ein Traceback werden aufgelöst (picklebar, threadsicher)."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    """Lässt Hot-Path-Logs (unterhalb WARNING) je Logger nur mit einer Quote durch.
+
+    Konfiguration z.B. `LOG_SAMPLE_RATES="httpx=0.05,app.core.scanner=0.1"`;
+    gilt auch für Kind-Logger. Warnungen und Fehler werden nie verworfen.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        # Längste Präfixe zuerst, damit spezifische Regeln gewinnen.
+        self.rates = sorted(rates.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        for name, rate in self.rates:
+            if record.name == name or record.name.startswith(name + "."):
+                return random.random() < rate
+        return True
+
+
+def parse_sample_rates(raw: str) -> Dict[str, float]:
+    rates = {}
+    for item in raw.split(","):
+        if "=" in item:
+            name, rate = item.split("=", 1)
+            rates[name.strip()] = float(rate)
+    return rates
+
+
+def setup_logging() -> QueueListener:
+    """Configures non-blocking logging: the request path only enqueues records,
+    a background listener thread writes them to console and a rotating file.
+
+    Idempotent: while a listener is running, it is returned unchanged.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    if settings.log_format == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+
+    console_handler = logging.StreamHandler(sys.stdout)
+    file_handler = RotatingFileHandler(
+        settings.log_file,
+        maxBytes=settings.log_max_bytes,
+        backupCount=settings.log_backup_count,
+        encoding="utf-8",
     )
+    for handler in (console_handler, file_handler):
+        handler.setFormatter(formatter)
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    queue_handler = _RecordQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(parse_sample_rates(settings.log_sample_rates)))
+    # trace_id muss im Request-Kontext gesetzt werden, nicht im Listener-Thread.
+    queue_handler.addFilter(TraceContextFilter())
+
+    listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+    listener.start()
+    _listener = listener
+
+    logging.basicConfig(level=logging.INFO, handlers=[queue_handler], force=True)
     # Ensure specific loggers are also propagating or handled
     logging.getLogger("uvicorn").handlers = []  # Avoid double logging if uvicorn sets its own
     logging.getLogger("uvicorn").propagate = True
+    return listener
+
+
+def shutdown_logging() -> None:
+    """Stoppt den Listener (verbleibende Records werden noch geschrieben).
+
+    Danach schreibt der Root-Logger synchron über dieselben Handler, damit
+    Meldungen nach dem Lifespan-Ende nicht verloren gehen.
+    """
+    global _listener
+    listener, _listener = _listener, None
+    if listener is None:
+        return
+    listener.stop()
+    root = logging.getLogger()
+    for handler in [h for h in root.handlers if isinstance(h, _RecordQueueHandler)]:
+        root.removeHandler(handler)
+    for handler in listener.handlers:
+        root.addHandler(handler)
+
+
+# Beim Beenden verbleibende Records noch schreiben.
+atexit.register(shutdown_logging)
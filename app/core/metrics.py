@@ -0,0 +1,330 @@
+"""Leichtgewichtige Prometheus-Metriken für das Secure PolarisDX AI-Chat Gateway.
+
+Bewusst ohne externe Abhängigkeit: Counter, Gauges und Histogramme mit festen
+Label-Namen, Ausgabe im Prometheus-Textformat (`GET /metrics`).
+
+Labels enthalten ausschließlich feste Werte (z.B. Stage-Namen), niemals
+Nachrichteninhalte oder Session-IDs.
+"""
+import abc
+import time
+import bisect
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+LabelValues = Tuple[str, ...]
+
+# Buckets (Sekunden) für Latenzen von Millisekunden (Redis, Regex) bis Minuten (Runs).
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric(abc.ABC):
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    @abc.abstractmethod
+    def samples(self) -> Iterable[Tuple[str, str, float]]:
+        """Liefert (Suffix, formatierte Labels, Wert) je Sample."""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._label_values(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield "", _format_labels(self.labelnames, key), value
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), callback: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._callback = callback
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, callback: Callable[[], float]) -> None:
+        """Wert wird erst beim Scrape über den Callback ermittelt."""
+        self._callback = callback
+
+    def value(self, **labels: str) -> float:
+        if self._callback is not None:
+            return self._callback()
+        return self._values.get(self._label_values(labels), 0)
+
+    def samples(self):
+        if self._callback is not None:
+            try:
+                yield "", "", self._callback()
+            except Exception:
+                return
+            return
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield "", _format_labels(self.labelnames, key), value
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Pro Label-Kombination: [Zähler je Bucket..., +Inf], Summe
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._label_values(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Misst die Dauer des `with`-Blocks (auch bei Exceptions)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: str) -> int:
+        entry = self._values.get(self._label_values(labels))
+        return sum(entry[0]) if entry else 0
+
+    def samples(self):
+        with self._lock:
+            items = [(key, (list(counts), total[0])) for key, (counts, total) in self._values.items()]
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                yield "_bucket", _format_labels(self.labelnames, key, ("le", _format_value(bound))), cumulative
+            yield "_sum", _format_labels(self.labelnames, key), total
+            yield "_count", _format_labels(self.labelnames, key), cumulative
+
+
+class DictCollector(_Metric):
+    """Stellt ein bestehendes Metrik-Dict (z.B. `AnswerCache.metrics`) als
+    Metrik mit einem Label je Schlüssel dar, ohne den Hot-Path zu ändern."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label: str,
+        source: Callable[[], Dict[str, float]],
+        type_name: str = "counter",
+        keys: Optional[Sequence[str]] = None,
+    ):
+        super().__init__(name, documentation, (label,))
+        self.source = source
+        self.type_name = type_name
+        # Nur diese Schlüssel ausgeben (z.B. Ereigniszähler ohne Summen in Sekunden/Tokens).
+        self.keys = tuple(keys) if keys is not None else None
+
+    def samples(self):
+        try:
+            values = dict(self.source())
+        except Exception:
+            return
+        for key, value in values.items():
+            if self.keys is None or key in self.keys:
+                yield "", _format_labels(self.labelnames, (key,)), value
+
+
+class ValueCollector(_Metric):
+    """Einzelwert ohne Labels, der erst beim Scrape gelesen wird (z.B. ein Eintrag
+    aus einem Metrik-Dict, der eine eigene Einheit hat)."""
+
+    def __init__(self, name: str, documentation: str, source: Callable[[], float], type_name: str = "counter"):
+        super().__init__(name, documentation)
+        self.source = source
+        self.type_name = type_name
+
+    def samples(self):
+        try:
+            value = self.source()
+        except Exception:
+            return
+        yield "", "", value
+
+
+class QueueDepthExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor, der wartende (noch nicht gestartete) Jobs selbst zählt."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._queued = 0
+        self._queued_lock = threading.Lock()
+
+    def queue_depth(self) -> int:
+        return self._queued
+
+    def _dequeue(self) -> None:
+        with self._queued_lock:
+            self._queued -= 1
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        started = threading.Event()
+
+        def run():
+            started.set()
+            self._dequeue()
+            return fn(*args, **kwargs)
+
+        with self._queued_lock:
+            self._queued += 1
+        try:
+            future = super().submit(run)
+        except BaseException:
+            self._dequeue()
+            raise
+        # Beim Shutdown stornierte Jobs starten nie und verlassen die Queue hier.
+        future.add_done_callback(lambda f: self._dequeue() if f.cancelled() and not started.is_set() else None)
+        return future
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        # Erneute Registrierung (z.B. App-Neustart im Test) ersetzt den Eintrag.
+        self._metrics[metric.name] = metric
+        return metric
+
+    def unregister(self, name: str) -> None:
+        self._metrics.pop(name, None)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+def expose_dict(
+    name: str,
+    documentation: str,
+    label: str,
+    source: Union[Dict[str, float], Callable[[], Dict[str, float]]],
+    type_name: str = "counter",
+    keys: Optional[Sequence[str]] = None,
+) -> DictCollector:
+    getter = source if callable(source) else (lambda: source)
+    return REGISTRY.register(DictCollector(name, documentation, label, getter, type_name, keys))
+
+
+def expose_value(name: str, documentation: str, source: Callable[[], float], type_name: str = "counter") -> ValueCollector:
+    return REGISTRY.register(ValueCollector(name, documentation, source, type_name))
+
+
+# -- Metriken der Chat-Pipeline --
+
+STAGE_SECONDS = histogram(
+    "chat_stage_duration_seconds",
+    "Dauer einzelner Pipeline-Stufen von /chat/message.",
+    ["stage"],
+)
+TTFB_SECONDS = histogram(
+    "chat_ttfb_seconds",
+    "Zeit vom Eingang der Anfrage bis zum ersten gestreamten Antwort-Chunk.",
+)
+STREAM_SECONDS = histogram(
+    "chat_stream_duration_seconds",
+    "Gesamtdauer des Antwort-Streams.",
+)
+ESCALATIONS = counter("chat_escalations_total", "Anzahl ausgelöster Eskalationen an Teams.")
+HUMAN_MODE_REPLIES = counter("chat_human_mode_replies_total", "Anfragen, die wegen HUMAN-Modus ohne KI beantwortet wurden.")
+ERRORS = counter("chat_errors_total", "Fehler in der Chat-Pipeline je Stufe.", ["stage"])
+INFLIGHT_STREAMS = gauge("chat_inflight_streams", "Aktuell offene Antwort-Streams.")
+WS_CONNECTIONS = gauge("chat_websocket_connections", "Offene WebSocket-Verbindungen (/chat/ws).")
+EXECUTOR_QUEUE_DEPTH = gauge("executor_queue_depth", "Wartende Jobs im ThreadPool des Event-Loops.")
@@ -1,10 +1,13 @@
 """Sendet Eskalationshinweise an MS Teams via Adaptive Card."""
 import copy
-from typing import List
+import asyncio
+from typing import Any, Dict, List, Optional
 
 import httpx
 
 from app.core.config import settings
+from app.core import tracing
+from app.core.outbox import NotificationOutbox
 
 # Basis-Card mit Platzhaltern für Session und Verlauf.
 BASE_ADAPTIVE_CARD = {
@@ -29,22 +32,69 @@ BASE_ADAPTIVE_CARD = {
 }
 
 
+def build_escalation_card(session_id: str, chat_history: List[str]) -> Dict[str, Any]:
+    """Befüllt die Adaptive Card mit Session-ID und Chat-Verlauf."""
+    card_payload = copy.deepcopy(BASE_ADAPTIVE_CARD)
+    joined_history = "\n".join(chat_history)
+    card_payload["attachments"][0]["content"]["body"][1]["text"] = f"Session ID: {session_id}"
+    card_payload["attachments"][0]["content"]["body"][3]["text"] = joined_history
+    return card_payload
+
+
 class TeamsNotifier:
-    """Kapselt die Benachrichtigung an MS Teams bei Eskalationen."""
+    """Kapselt die Benachrichtigung an MS Teams bei Eskalationen.
+
+    Eskalationen werden über die persistente Outbox zugestellt (Retries,
+    Rate-Limit, Dead-Letter); `start()` startet den Hintergrund-Dispatcher.
+    """
 
-    def __init__(self) -> None:
-        self.webhook_url = settings.teams_webhook_url
+    def __init__(self, webhook_url: Optional[str] = None, **outbox_options) -> None:
+        self.webhook_url = settings.teams_webhook_url if webhook_url is None else webhook_url
+        self.timeout = settings.notify_timeout_seconds
+        self._client: Optional[httpx.AsyncClient] = None
+        self.outbox = NotificationOutbox(self.deliver, **outbox_options)
 
     async def notify_escalation(self, session_id: str, chat_history: List[str]) -> None:
-        """Sendet eine Adaptive Card mit Session-ID und Chat-Verlauf an Teams."""
+        """Legt eine Adaptive Card mit Session-ID und Chat-Verlauf in die Outbox."""
         if not self.webhook_url:
             return
 
-        card_payload = copy.deepcopy(BASE_ADAPTIVE_CARD)
-        joined_history = "\n".join(chat_history)
-        card_payload["attachments"][0]["content"]["body"][1]["text"] = f"Session ID: {session_id}"
-        card_payload["attachments"][0]["content"]["body"][3]["text"] = joined_history
+        with tracing.span("notifier.enqueue", history_lines=len(chat_history)):
+            await self.outbox.enqueue(session_id, build_escalation_card(session_id, chat_history))
 
-        async with httpx.AsyncClient() as client:
-            await client.post(self.webhook_url, json=card_payload)
+    async def deliver(self, card_payload: Dict[str, Any]) -> None:
+        """Sendet eine Card an den Webhook; Fehler (inkl. Timeout/HTTP-Status) werden geworfen."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        # Zustellung läuft im Dispatcher außerhalb eines Requests: eigener Trace.
+        root = tracing.get_tracer().start_trace("notifier.deliver")
+        try:
+            response = await self._client.post(self.webhook_url, json=card_payload)
+            root.set_attribute("http.status_code", response.status_code)
+            response.raise_for_status()
+        except Exception as exc:
+            root.record_error(exc)
+            raise
+        finally:
+            root.end()
+
+    def start(self) -> None:
+        """Startet den Outbox-Dispatcher (nur wenn ein Webhook konfiguriert ist)."""
+        if self.webhook_url:
+            self.outbox.start()
+
+    async def flush(self, timeout: float) -> int:
+        """Stellt beim Shutdown fällige Einträge noch zu (höchstens `timeout`
+        Sekunden); nicht zugestellte bleiben in der Outbox für den nächsten Start."""
+        if not self.webhook_url:
+            return 0
+        try:
+            return await asyncio.wait_for(self.outbox.dispatch_due(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return 0
 
+    async def stop(self) -> None:
+        await self.outbox.stop()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
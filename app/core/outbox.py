@@ -0,0 +1,278 @@
+"""Persistente Outbox für Eskalations-Benachrichtigungen.
+
+Benachrichtigungen werden zuerst in der lokalen DB abgelegt und von einem
+Hintergrund-Dispatcher zugestellt: begrenzte Parallelität, Rate-Limit,
+Retries mit exponentiellem Backoff und Dead-Letter nach dem letzten Versuch.
+Ein langsamer oder ausgefallener Webhook blockiert so keinen Chat-Stream, und
+keine Eskalation geht bei einem Neustart verloren. Nach der Zustellung wird
+der Payload (Chat-Verlauf) geleert; Dead-Letter behalten ihn für den Requeue.
+"""
+import json
+import asyncio
+import logging
+import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import func, update
+
+from app.core.config import settings
+from app.core.db_sqla import SessionLocal, OutboxEntry
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = "PENDING"
+STATUS_DELIVERED = "DELIVERED"
+STATUS_DEAD = "DEAD"
+
+# Eine beanspruchte Nachricht ist so lange für andere Dispatcher (z.B. weitere
+# Worker) gesperrt. Stirbt der Worker während der Zustellung, wird sie danach
+# automatisch erneut fällig.
+CLAIM_LEASE_SECONDS = 120
+
+# Zugestellte Einträge behalten keinen Verlauf (Klartext) im Payload; Spalte ist NOT NULL.
+CLEARED_PAYLOAD = "{}"
+
+
+def _utcnow() -> datetime.datetime:
+    return datetime.datetime.utcnow()
+
+
+class RateLimiter:
+    """Einfacher asynchroner Limiter: höchstens `rate` Starts pro Sekunde."""
+
+    def __init__(self, rate_per_second: float):
+        self.interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if not self.interval:
+            return
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class NotificationOutbox:
+    """Speichert Benachrichtigungen in der DB und stellt sie im Hintergrund zu."""
+
+    def __init__(
+        self,
+        deliver: Callable[[Dict[str, Any]], Awaitable[None]],
+        session_factory=SessionLocal,
+        max_attempts: int = settings.notify_max_attempts,
+        backoff_base: float = settings.notify_backoff_base_seconds,
+        backoff_max: float = settings.notify_backoff_max_seconds,
+        max_concurrency: int = settings.notify_max_concurrency,
+        rate_per_second: float = settings.notify_rate_per_second,
+        poll_interval: float = settings.notify_poll_interval_seconds,
+        batch_size: int = 50,
+    ):
+        self.deliver = deliver
+        self.session_factory = session_factory
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_concurrency = max_concurrency
+        self.rate_limiter = RateLimiter(rate_per_second)
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+
+        self.metrics: Dict[str, float] = {
+            "enqueued": 0,
+            "delivered": 0,
+            "failed_attempts": 0,
+            "dead_lettered": 0,
+            "delivery_seconds_total": 0.0,
+        }
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # -- Persistenz (synchron, läuft im ThreadPool) --
+
+    def _enqueue_sync(self, session_id: str, payload: Dict[str, Any]) -> int:
+        db = self.session_factory()
+        try:
+            entry = OutboxEntry(session_id=session_id, payload=json.dumps(payload), next_attempt_at=_utcnow())
+            db.add(entry)
+            db.commit()
+            return entry.id
+        finally:
+            db.close()
+
+    def _claim_due_sync(self) -> List[OutboxEntry]:
+        """Beansprucht fällige Einträge per bedingtem UPDATE (sicher bei mehreren Workern)."""
+        db = self.session_factory()
+        try:
+            now = _utcnow()
+            candidates = (
+                db.query(OutboxEntry.id)
+                .filter(OutboxEntry.status == STATUS_PENDING, OutboxEntry.next_attempt_at <= now)
+                .order_by(OutboxEntry.next_attempt_at)
+                .limit(self.batch_size)
+                .all()
+            )
+            claimed = []
+            lease_until = now + datetime.timedelta(seconds=CLAIM_LEASE_SECONDS)
+            for (entry_id,) in candidates:
+                result = db.execute(
+                    update(OutboxEntry)
+                    .where(
+                        OutboxEntry.id == entry_id,
+                        OutboxEntry.status == STATUS_PENDING,
+                        OutboxEntry.next_attempt_at <= now,
+                    )
+                    .values(next_attempt_at=lease_until, attempts=OutboxEntry.attempts + 1)
+                )
+                if result.rowcount == 1:
+                    claimed.append(entry_id)
+            db.commit()
+            if not claimed:
+                return []
+            entries = db.query(OutboxEntry).filter(OutboxEntry.id.in_(claimed)).all()
+            db.expunge_all()
+            return entries
+        finally:
+            db.close()
+
+    def _mark_delivered_sync(self, entry_id: int) -> None:
+        db = self.session_factory()
+        try:
+            db.execute(
+                update(OutboxEntry)
+                .where(OutboxEntry.id == entry_id)
+                .values(status=STATUS_DELIVERED, delivered_at=_utcnow(), last_error=None, payload=CLEARED_PAYLOAD)
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _mark_failed_sync(self, entry_id: int, attempts: int, error: str) -> bool:
+        """Plant einen Retry ein oder verschiebt in den Dead-Letter. Gibt True bei DEAD zurück."""
+        db = self.session_factory()
+        try:
+            if attempts >= self.max_attempts:
+                values = {"status": STATUS_DEAD, "last_error": error}
+            else:
+                values = {"next_attempt_at": _utcnow() + datetime.timedelta(seconds=self.backoff_delay(attempts)), "last_error": error}
+            db.execute(update(OutboxEntry).where(OutboxEntry.id == entry_id).values(**values))
+            db.commit()
+            return attempts >= self.max_attempts
+        finally:
+            db.close()
+
+    def counts_sync(self) -> Dict[str, int]:
+        """Anzahl Einträge je Status (für Admin-Übersicht und Metriken)."""
+        db = self.session_factory()
+        try:
+            rows = db.query(OutboxEntry.status, func.count(OutboxEntry.id)).group_by(OutboxEntry.status).all()
+            return {status: count for status, count in rows}
+        finally:
+            db.close()
+
+    def dead_letters_sync(self, limit: int = 50) -> List[OutboxEntry]:
+        db = self.session_factory()
+        try:
+            entries = (
+                db.query(OutboxEntry)
+                .filter(OutboxEntry.status == STATUS_DEAD)
+                .order_by(OutboxEntry.id.desc())
+                .limit(limit)
+                .all()
+            )
+            db.expunge_all()
+            return entries
+        finally:
+            db.close()
+
+    def requeue_sync(self, entry_id: int) -> bool:
+        """Stellt einen Dead-Letter erneut zur Zustellung ein."""
+        db = self.session_factory()
+        try:
+            result = db.execute(
+                update(OutboxEntry)
+                .where(OutboxEntry.id == entry_id, OutboxEntry.status == STATUS_DEAD)
+                .values(status=STATUS_PENDING, attempts=0, next_attempt_at=_utcnow())
+            )
+            db.commit()
+            return result.rowcount == 1
+        finally:
+            db.close()
+
+    # -- Zustellung --
+
+    def backoff_delay(self, attempts: int) -> float:
+        return min(self.backoff_max, self.backoff_base * (2 ** (attempts - 1)))
+
+    async def enqueue(self, session_id: str, payload: Dict[str, Any]) -> int:
+        """Legt eine Benachrichtigung persistent ab und weckt den Dispatcher."""
+        loop = asyncio.get_running_loop()
+        entry_id = await loop.run_in_executor(None, self._enqueue_sync, session_id, payload)
+        self.metrics["enqueued"] += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return entry_id
+
+    async def _deliver_entry(self, entry: OutboxEntry, semaphore: asyncio.Semaphore) -> None:
+        loop = asyncio.get_running_loop()
+        async with semaphore:
+            await self.rate_limiter.acquire()
+            started = loop.time()
+            try:
+                await self.deliver(json.loads(entry.payload))
+            except Exception as e:
+                self.metrics["failed_attempts"] += 1
+                dead = await loop.run_in_executor(None, self._mark_failed_sync, entry.id, entry.attempts, str(e))
+                if dead:
+                    self.metrics["dead_lettered"] += 1
+                    logger.error(f"Notification {entry.id} for session {entry.session_id} moved to dead letter: {e}")
+                else:
+                    logger.warning(f"Notification {entry.id} failed (attempt {entry.attempts}): {e}")
+                return
+            self.metrics["delivery_seconds_total"] += loop.time() - started
+            self.metrics["delivered"] += 1
+            await loop.run_in_executor(None, self._mark_delivered_sync, entry.id)
+
+    async def dispatch_due(self) -> int:
+        """Stellt alle aktuell fälligen Einträge zu; gibt die Anzahl bearbeiteter Einträge zurück."""
+        loop = asyncio.get_running_loop()
+        entries = await loop.run_in_executor(None, self._claim_due_sync)
+        if not entries:
+            return 0
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        await asyncio.gather(*(self._deliver_entry(entry, semaphore) for entry in entries))
+        return len(entries)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                processed = await self.dispatch_due()
+            except Exception as e:
+                logger.error(f"Notification dispatcher iteration failed: {e}")
+                processed = 0
+            if processed:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def start(self) -> None:
+        """Startet den Dispatcher als Task im laufenden Event-Loop."""
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
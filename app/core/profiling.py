@@ -0,0 +1,117 @@
+"""On-Demand-Profiling des laufenden Workers (nur bei ENABLE_PROFILING=true).
+
+- CPU: zeitlich begrenztes Sampling aller Thread-Stacks über
+  `sys._current_frames()` aus einem eigenen Thread; Ausgabe als
+  "folded stacks" (flamegraph.pl, speedscope, inferno).
+- Speicher: tracemalloc wird nur für die Dauer der Messung aktiviert,
+  Ergebnis ist der Diff zweier Snapshots (Wachstum je Codezeile).
+
+Ohne Aufruf entstehen keine Kosten: kein Hintergrund-Thread, kein tracemalloc.
+"""
+import sys
+import time
+import asyncio
+import threading
+import tracemalloc
+from collections import Counter
+from typing import Callable, Dict, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Frames dieses Moduls (der Sampler selbst) nicht mitzählen.
+_SELF_FILE = __file__
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})"
+
+
+def sample_stacks(duration: float, interval: float = 0.005) -> Counter:
+    """Sammelt für `duration` Sekunden alle `interval` Sekunden die Stacks
+    aller Threads (außer dem Sampler). Schlüssel: "thread;root;...;leaf"."""
+    own_id = threading.get_ident()
+    samples: Counter = Counter()
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            stack: List[str] = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(names.get(thread_id, f"thread-{thread_id}"))
+            samples[";".join(reversed(stack))] += 1
+        time.sleep(interval)
+    return samples
+
+
+def render_folded(samples: Dict[str, int]) -> str:
+    """Folded-Stack-Format: eine Zeile "frame;frame;... anzahl" pro Stack."""
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(samples.items()))
+
+
+def tracemalloc_diff(duration: float, top: int = 25, nframes: int = 1) -> str:
+    """Misst Speicherwachstum über `duration` Sekunden und liefert die
+    `top` Zeilen mit dem größten Zuwachs als Text."""
+    started_here = not tracemalloc.is_tracing()
+    if started_here:
+        tracemalloc.start(nframes)
+    try:
+        before = tracemalloc.take_snapshot()
+        time.sleep(duration)
+        after = tracemalloc.take_snapshot()
+    finally:
+        if started_here:
+            tracemalloc.stop()
+
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, _SELF_FILE)]
+    stats = after.filter_traces(filters).compare_to(before.filter_traces(filters), "traceback" if nframes > 1 else "lineno")
+    total = sum(stat.size_diff for stat in stats)
+    lines = [f"# tracemalloc diff over {duration:.1f}s, total {total / 1024:+.1f} KiB"]
+    for stat in stats[:top]:
+        lines.append(str(stat))
+        if nframes > 1:
+            lines.extend(f"    {line}" for line in stat.traceback.format())
+    return "\n".join(lines) + "\n"
+
+
+async def run_in_dedicated_thread(func: Callable[..., T], *args) -> T:
+    """Führt `func` in einem eigenen Thread aus, damit der Sampler keinen Slot
+    des (NER-)Executors belegt und der Event-Loop weiterläuft."""
+    loop = asyncio.get_running_loop()
+    future: "asyncio.Future[T]" = loop.create_future()
+
+    def target() -> None:
+        try:
+            result = func(*args)
+        except BaseException as exc:
+            loop.call_soon_threadsafe(_set_exception, future, exc)
+        else:
+            loop.call_soon_threadsafe(_set_result, future, result)
+
+    threading.Thread(target=target, name="profiler", daemon=True).start()
+    return await future
+
+
+def _set_result(future: asyncio.Future, result) -> None:
+    if not future.done():
+        future.set_result(result)
+
+
+def _set_exception(future: asyncio.Future, exc: BaseException) -> None:
+    if not future.done():
+        future.set_exception(exc)
+
+
+# Nur eine Messung gleichzeitig pro Worker.
+profile_lock: Optional[asyncio.Lock] = None
+
+
+def get_profile_lock() -> asyncio.Lock:
+    global profile_lock
+    if profile_lock is None:
+        profile_lock = asyncio.Lock()
+    return profile_lock
@@ -0,0 +1,139 @@
+"""Fair-Share-Rate-Limiting für `/chat/message` (Token Bucket in Redis).
+
+Je Anfrage werden zwei Buckets geprüft: einer pro `session_id` und einer pro
+Client-IP (fängt Clients ab, die ständig neue Session-IDs erzeugen). Ein
+Lua-Skript prüft und belastet beide Buckets atomar in einem Round-Trip, daher
+gelten die Limits über alle Worker hinweg. Die Uhrzeit kommt von Redis
+(`TIME`), nicht vom Worker.
+
+Ist Redis nicht erreichbar, wird die Anfrage durchgelassen (fail open): ein
+Ausfall des Limiters soll den Chat nicht blockieren.
+"""
+import math
+import logging
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import counter
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMITED = counter("rate_limited_total", "Wegen Rate-Limit abgewiesene Anfragen je Bucket (session, ip).", ["scope"])
+RATE_LIMIT_ERRORS = counter("rate_limit_errors_total", "Fehlgeschlagene Limit-Prüfungen (Anfrage wurde durchgelassen).")
+
+# Präfix der Bucket-Keys in Redis.
+RATE_LIMIT_PREFIX = "ratelimit:"
+
+# KEYS: Buckets; ARGV[1]: Kosten, danach je Bucket Rate (Tokens/ms) und Kapazität.
+# Liefert {Index des limitierenden Buckets (0 = erlaubt), Wartezeit in ms}.
+# Nur wenn alle Buckets genug Tokens haben, wird belastet.
+TOKEN_BUCKET_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local cost = tonumber(ARGV[1])
+local levels = {}
+local limited, wait = 0, 0
+for i = 1, #KEYS do
+    local rate = tonumber(ARGV[2 * i])
+    local capacity = tonumber(ARGV[2 * i + 1])
+    local state = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local level = tonumber(state[1]) or capacity
+    local elapsed = math.max(0, now - (tonumber(state[2]) or now))
+    level = math.min(capacity, level + elapsed * rate)
+    levels[i] = level
+    if level < cost then
+        local needed = math.ceil((cost - level) / rate)
+        if needed > wait then
+            limited, wait = i, needed
+        end
+    end
+end
+if limited == 0 then
+    for i = 1, #KEYS do
+        local rate = tonumber(ARGV[2 * i])
+        local capacity = tonumber(ARGV[2 * i + 1])
+        redis.call('HSET', KEYS[i], 'tokens', tostring(levels[i] - cost), 'ts', now)
+        redis.call('PEXPIRE', KEYS[i], math.ceil(capacity / rate))
+    end
+end
+return {limited, wait}
+"""
+
+
+@dataclass
+class RateLimitDecision:
+    allowed: bool
+    retry_after: int = 0  # Sekunden (für den Header `Retry-After`)
+    scope: Optional[str] = None  # limitierender Bucket: "session" oder "ip"
+
+
+class RateLimiter:
+    """Token Buckets pro Session und pro Client-IP (Limits pro Minute, Burst)."""
+
+    def __init__(
+        self,
+        redis_conn,
+        enabled: bool = settings.rate_limit_enabled,
+        session_per_minute: float = settings.rate_limit_session_per_minute,
+        session_burst: int = settings.rate_limit_session_burst,
+        ip_per_minute: float = settings.rate_limit_ip_per_minute,
+        ip_burst: int = settings.rate_limit_ip_burst,
+    ):
+        self.redis = redis_conn
+        self.enabled = enabled
+        # (scope, Tokens pro ms, Kapazität); 0 schaltet den Bucket ab.
+        self.limits = [
+            ("session", session_per_minute / 60000, session_burst),
+            ("ip", ip_per_minute / 60000, ip_burst),
+        ]
+        self._script = redis_conn.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def _buckets(self, session_id: Optional[str], client_ip: Optional[str]) -> List[Tuple[str, str, float, int]]:
+        identities = {"session": session_id, "ip": client_ip}
+        return [
+            (scope, f"{RATE_LIMIT_PREFIX}{scope}:{identities[scope]}", rate, capacity)
+            for scope, rate, capacity in self.limits
+            if identities[scope] and rate > 0 and capacity > 0
+        ]
+
+    def check(self, session_id: Optional[str], client_ip: Optional[str], cost: int = 1) -> RateLimitDecision:
+        """Prüft und belastet die Buckets; ein Redis-Round-Trip."""
+        if not self.enabled:
+            return RateLimitDecision(allowed=True)
+        buckets = self._buckets(session_id, client_ip)
+        if not buckets:
+            return RateLimitDecision(allowed=True)
+
+        args: List[str] = [str(cost)]
+        for _, _, rate, capacity in buckets:
+            args += [repr(rate), str(capacity)]
+        try:
+            limited, wait_ms = self._script(keys=[key for _, key, _, _ in buckets], args=args)
+        except Exception as e:
+            RATE_LIMIT_ERRORS.inc()
+            logger.warning(f"Rate limit check failed, allowing request: {e}")
+            return RateLimitDecision(allowed=True)
+
+        if not limited:
+            return RateLimitDecision(allowed=True)
+        scope = buckets[int(limited) - 1][0]
+        RATE_LIMITED.inc(scope=scope)
+        return RateLimitDecision(allowed=False, retry_after=max(1, math.ceil(int(wait_ms) / 1000)), scope=scope)
+
+
+def client_ip(request) -> Optional[str]:
+    """Client-IP der Anfrage; hinter einem Reverse Proxy aus `X-Forwarded-For`
+    (nur mit `RATE_LIMIT_TRUST_FORWARDED_FOR`, sonst wäre der Header fälschbar).
+
+    Proxys hängen an den Header an, nur die rechten Einträge stammen von eigenen
+    Proxys: Client ist der Eintrag `RATE_LIMIT_TRUSTED_PROXY_HOPS` von rechts.
+    Alles links davon kann der Client selbst gesetzt haben."""
+    if settings.rate_limit_trust_forwarded_for:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            entries = [entry.strip() for entry in forwarded.split(",") if entry.strip()]
+            if entries:
+                hops = max(1, settings.rate_limit_trusted_proxy_hops)
+                return entries[-min(hops, len(entries))]
+    return request.client.host if request.client is not None else None
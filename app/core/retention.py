@@ -0,0 +1,361 @@
+"""Retention und Kompaktierung der TrainingsHub-Datenbank.
+
+Richtlinien (einzeln aktivierbar, 0/False = aus):
+- `RETENTION_MAX_AGE_DAYS`: Sessions ohne Aktivität seit N Tagen werden samt
+  Nachrichten gelöscht, ebenso Teams-Benachrichtigungen (Outbox) älter als N Tage.
+- `RETENTION_MAX_MESSAGES_PER_SESSION`: je Session nur die neuesten N
+  Nachrichten behalten.
+- `RETENTION_AFTER_EXPORT`: Nachrichten bis zum Watermark des letzten
+  vollständigen `/admin/export` löschen.
+
+Gelöscht wird in kleinen Transaktionen (`RETENTION_BATCH_SIZE` Zeilen) mit
+Pause dazwischen, damit die Chat-Writer nie lange auf die SQLite-Sperre
+warten. Nachrichten einer Session werden vor der Session gelöscht
+(Kaskade); mit der Session fallen auch ihre Eskalationen und abgeschlossenen
+Outbox-Einträge (zugestellt/Dead-Letter), deren Payload den Verlauf enthält.
+Anschließend gibt `PRAGMA incremental_vacuum` freie Seiten
+schrittweise an das Dateisystem zurück.
+
+CLI (z.B. per Cron statt Hintergrund-Job):
+    python -m app.core.retention [--vacuum]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import datetime
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import delete, func, select
+
+from app.core.config import settings
+from app.core.db_sqla import SessionLocal, ChatMessage, ChatSession, Escalation, OutboxEntry, engine as default_engine, init_db
+from app.core.jobs import load_job_state, save_job_state
+from app.core.metrics import counter, gauge
+from app.core.outbox import STATUS_DEAD, STATUS_DELIVERED
+
+logger = logging.getLogger(__name__)
+
+RETENTION_PURGED = counter("retention_purged_rows_total", "Vom Retention-Job gelöschte Zeilen je Tabelle.", ["table"])
+DB_FILE_SIZE = gauge("db_file_size_bytes", "Größe der TrainingsHub-Datenbankdatei.")
+DB_FREE_PAGES = gauge("db_freelist_pages", "Freie, noch nicht zurückgegebene Seiten der SQLite-Datei.")
+
+# Job-State-Schlüssel: Watermark des letzten vollständigen Exports und letzter Lauf.
+EXPORT_STATE = "export"
+RETENTION_STATE = "retention"
+
+# Leere Sessions erst nach dieser Zeit löschen (Session wird vor der ersten Nachricht angelegt).
+EMPTY_SESSION_GRACE = datetime.timedelta(hours=1)
+
+
+def _utcnow() -> datetime.datetime:
+    return datetime.datetime.utcnow()
+
+
+def db_file_path(engine=default_engine) -> Optional[str]:
+    database = engine.url.database
+    if engine.dialect.name != "sqlite" or not database or database == ":memory:":
+        return None
+    return database
+
+
+class RetentionJob:
+    """Setzt die Retention-Richtlinien in kleinen Batches durch."""
+
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        engine=default_engine,
+        max_age_days: int = settings.retention_max_age_days,
+        max_messages_per_session: int = settings.retention_max_messages_per_session,
+        after_export: bool = settings.retention_after_export,
+        batch_size: int = settings.retention_batch_size,
+        batch_pause: float = settings.retention_batch_pause_seconds,
+        vacuum_pages: int = settings.retention_vacuum_pages,
+        interval: float = settings.retention_interval_seconds,
+        rollups=None,
+    ):
+        self.session_factory = session_factory
+        self.engine = engine
+        self.max_age_days = max_age_days
+        self.max_messages_per_session = max_messages_per_session
+        self.after_export = after_export
+        self.batch_size = max(1, batch_size)
+        self.batch_pause = batch_pause
+        self.vacuum_pages = max(1, vacuum_pages)
+        self.interval = interval
+        # Kennzahlen-Job (`AnalyticsRollupJob`): läuft vor dem Löschen, damit
+        # gelöschte Nachrichten in /admin/stats erhalten bleiben.
+        self.rollups = rollups
+        self.last_run: Dict[str, Any] = {}
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+        path = db_file_path(engine)
+        if path is not None:
+            DB_FILE_SIZE.set_function(lambda: os.path.getsize(path) if os.path.exists(path) else 0)
+
+    # -- Batches (je eine kurze Transaktion) --
+
+    def _delete_batch(self, select_ids: Callable[[Any], List], model) -> int:
+        """Löscht höchstens `batch_size` Zeilen, deren IDs `select_ids(db)` liefert."""
+        db = self.session_factory()
+        try:
+            ids = select_ids(db)
+            if not ids:
+                return 0
+            db.execute(delete(model).where(model.id.in_(ids)))
+            db.commit()
+        finally:
+            db.close()
+        RETENTION_PURGED.inc(len(ids), table=model.__tablename__)
+        return len(ids)
+
+    def _purge(self, select_ids: Callable[[Any], List], model) -> int:
+        """Wiederholt `_delete_batch` bis nichts mehr passt; pausiert zwischen Batches."""
+        purged = 0
+        while not self._stop.is_set():
+            deleted = self._delete_batch(select_ids, model)
+            purged += deleted
+            if deleted < self.batch_size:
+                break
+            time.sleep(self.batch_pause)
+        return purged
+
+    def _expired_session_ids(self, db) -> List[str]:
+        cutoff = _utcnow() - datetime.timedelta(days=self.max_age_days)
+        last_activity = func.coalesce(func.max(ChatMessage.timestamp), ChatSession.created_at)
+        rows = (
+            db.query(ChatSession.id)
+            .outerjoin(ChatMessage, ChatMessage.session_id == ChatSession.id)
+            .group_by(ChatSession.id)
+            .having(last_activity < cutoff)
+            .limit(self.batch_size)
+            .all()
+        )
+        return [session_id for (session_id,) in rows]
+
+    def _purge_sessions(self, session_ids: List[str]) -> Dict[str, int]:
+        """Löscht Sessions samt Nachrichten, Eskalationen und abgeschlossenen
+        Outbox-Einträgen; abhängige Zeilen zuerst, in Batches. Ausstehende
+        Benachrichtigungen werden noch zugestellt (danach Altersgrenze)."""
+        messages = self._purge(
+            lambda db: db.scalars(
+                select(ChatMessage.id).where(ChatMessage.session_id.in_(session_ids)).limit(self.batch_size)
+            ).all(),
+            ChatMessage,
+        )
+        notifications = self._purge(
+            lambda db: db.scalars(
+                select(OutboxEntry.id)
+                .where(OutboxEntry.session_id.in_(session_ids), OutboxEntry.status.in_((STATUS_DELIVERED, STATUS_DEAD)))
+                .limit(self.batch_size)
+            ).all(),
+            OutboxEntry,
+        )
+        escalations = self._purge(
+            lambda db: db.scalars(
+                select(Escalation.id).where(Escalation.session_id.in_(session_ids)).limit(self.batch_size)
+            ).all(),
+            Escalation,
+        )
+        sessions = 0
+        if not self._stop.is_set():
+            sessions = self._delete_batch(lambda db: session_ids, ChatSession)
+        return {"messages": messages, "sessions": sessions, "notifications": notifications, "escalations": escalations}
+
+    def _purge_session_batches(self, select_ids: Callable[[Any], List[str]]) -> Dict[str, int]:
+        """Löscht Sessions, solange `select_ids(db)` welche liefert."""
+        totals = {"messages": 0, "sessions": 0, "notifications": 0, "escalations": 0}
+        while not self._stop.is_set():
+            db = self.session_factory()
+            try:
+                session_ids = select_ids(db)
+            finally:
+                db.close()
+            if not session_ids:
+                break
+            for key, value in self._purge_sessions(session_ids).items():
+                totals[key] += value
+            time.sleep(self.batch_pause)
+        return totals
+
+    def purge_expired_sessions(self) -> Dict[str, int]:
+        return self._purge_session_batches(self._expired_session_ids)
+
+    def purge_old_notifications(self) -> int:
+        """Löscht Outbox-Einträge (mit Verlauf im Payload) älter als `max_age_days`."""
+        cutoff = _utcnow() - datetime.timedelta(days=self.max_age_days)
+        query = select(OutboxEntry.id).where(OutboxEntry.created_at < cutoff).limit(self.batch_size)
+        return self._purge(lambda db: db.scalars(query).all(), OutboxEntry)
+
+    def purge_session_overflow(self) -> int:
+        """Behält je Session nur die neuesten `max_messages_per_session` Nachrichten."""
+        ranked = select(
+            ChatMessage.id,
+            func.row_number().over(partition_by=ChatMessage.session_id, order_by=ChatMessage.id.desc()).label("position"),
+        ).subquery()
+        query = select(ranked.c.id).where(ranked.c.position > self.max_messages_per_session).limit(self.batch_size)
+        return self._purge(lambda db: db.scalars(query).all(), ChatMessage)
+
+    def purge_exported(self) -> int:
+        """Löscht Nachrichten bis zum Watermark des letzten vollständigen Exports."""
+        db = self.session_factory()
+        try:
+            watermark = load_job_state(db, EXPORT_STATE).get("watermark", 0)
+        finally:
+            db.close()
+        if not watermark:
+            return 0
+        query = select(ChatMessage.id).where(ChatMessage.id <= watermark).limit(self.batch_size)
+        return self._purge(lambda db: db.scalars(query).all(), ChatMessage)
+
+    def purge_empty_sessions(self) -> Dict[str, int]:
+        cutoff = _utcnow() - EMPTY_SESSION_GRACE
+        query = (
+            select(ChatSession.id)
+            .where(ChatSession.created_at < cutoff, ~select(ChatMessage.id).where(ChatMessage.session_id == ChatSession.id).exists())
+            .limit(self.batch_size)
+        )
+        return self._purge_session_batches(lambda db: db.scalars(query).all())
+
+    def incremental_vacuum(self) -> int:
+        """Gibt freie Seiten schrittweise zurück; liefert die Anzahl freigegebener Seiten."""
+        if self.engine.dialect.name != "sqlite":
+            return 0
+        released = 0
+        while not self._stop.is_set():
+            with self.engine.connect() as conn:
+                if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() != 2:
+                    logger.warning("Retention: auto_vacuum is not INCREMENTAL, run 'python -m app.core.retention --vacuum' once")
+                    return released
+                free_pages = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+                if not free_pages:
+                    break
+                step = min(free_pages, self.vacuum_pages)
+                # Jeder sqlite3_step gibt nur eine Seite frei; executescript
+                # führt das PRAGMA vollständig aus.
+                conn.connection.driver_connection.executescript(f"PRAGMA incremental_vacuum({step});")
+            released += step
+            time.sleep(self.batch_pause)
+        return released
+
+    def _update_free_pages(self) -> None:
+        if self.engine.dialect.name == "sqlite":
+            with self.engine.connect() as conn:
+                DB_FREE_PAGES.set(conn.exec_driver_sql("PRAGMA freelist_count").scalar() or 0)
+
+    # -- Ablauf --
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_age_days > 0 or self.max_messages_per_session > 0 or self.after_export
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def run_sync(self) -> Dict[str, Any]:
+        """Ein vollständiger Lauf aller aktiven Richtlinien inkl. Vacuum."""
+        with self._lock:
+            return self._run_policies()
+
+    def _run_policies(self) -> Dict[str, Any]:
+        self._stop.clear()
+        started = time.monotonic()
+        purged = {"messages": 0, "sessions": 0, "notifications": 0, "escalations": 0}
+        if self.rollups is not None and self.enabled:
+            self.rollups.run_sync()
+        if self.max_age_days > 0:
+            for key, value in self.purge_expired_sessions().items():
+                purged[key] += value
+            purged["notifications"] += self.purge_old_notifications()
+        if self.max_messages_per_session > 0:
+            purged["messages"] += self.purge_session_overflow()
+        if self.after_export:
+            purged["messages"] += self.purge_exported()
+        if self.enabled:
+            for key, value in self.purge_empty_sessions().items():
+                purged[key] += value
+        vacuumed = self.incremental_vacuum()
+        self._update_free_pages()
+
+        self.last_run = {
+            "finished_at": _utcnow().isoformat(),
+            "duration_seconds": round(time.monotonic() - started, 3),
+            "purged": purged,
+            "vacuumed_pages": vacuumed,
+        }
+        db = self.session_factory()
+        try:
+            save_job_state(db, RETENTION_STATE, self.last_run)
+            db.commit()
+        finally:
+            db.close()
+        logger.info(f"Retention: purged {purged['messages']} message(s), {purged['sessions']} session(s), vacuumed {vacuumed} page(s)")
+        return self.last_run
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(None, self.run_sync)
+            except Exception as e:
+                logger.error(f"Retention run failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Startet den periodischen Job als Task im laufenden Event-Loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        # Ein laufender Batch wird noch abgeschlossen, danach endet der Lauf.
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def record_export_watermark(watermark: int, session_factory=SessionLocal) -> None:
+    """Merkt sich den Watermark eines vollständig übertragenen Exports."""
+    db = session_factory()
+    try:
+        save_job_state(db, EXPORT_STATE, {"watermark": watermark, "exported_at": _utcnow().isoformat()})
+        db.commit()
+    finally:
+        db.close()
+
+
+def enable_incremental_vacuum(engine=default_engine) -> None:
+    """Stellt eine bestehende SQLite-Datei auf auto_vacuum=INCREMENTAL um.
+    Einmaliges VACUUM: sperrt die DB für die Dauer, daher nur in Wartungsfenstern."""
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.exec_driver_sql("VACUUM")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Setzt die Retention-Richtlinien der TrainingsHub-DB durch.")
+    parser.add_argument("--vacuum", action="store_true", help="Einmalig auf inkrementelles Auto-Vacuum umstellen (VACUUM)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    init_db()
+    if args.vacuum:
+        enable_incremental_vacuum()
+    print(json.dumps(RetentionJob().run_sync(), ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
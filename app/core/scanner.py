@@ -2,47 +2,155 @@
 (Regex + GLiNER) und stellt Originalwerte nach der KI-Antwort wieder her
 (Re-Personalisierung)."""
 import re
-import logging
+import time
 import asyncio
-from typing import List, Dict, Any
-
-from gliner import GLiNER
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-from app.core.vault import PIIVault, vault
+from app.core.admission import NERAdmission, NEROverloadedError
+from app.core.config import settings
+from app.core.logging_setup import redact
+from app.core.metrics import STAGE_SECONDS
+from app.core.tracing import span
+from app.core.vault import PIIVault
 
 logger = logging.getLogger(__name__)
 
+NER_LABELS = ["person", "organization", "city"]
+NER_MODEL_NAME = "urchade/gliner_medium-v2.1"
+# Entities unterhalb dieses Scores werden nicht ersetzt.
+NER_SCORE_THRESHOLD = 0.7
+
+# Regex-Pattern für schnelle Vorfilterung typischer PII (ergänzt GLiNER).
+EMAIL_PATTERN = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+PHONE_PATTERN = re.compile(r"(\+?\d{1,3}[\s\-]?)?(?:\(?\d{2,5}\)?[\s\-]?)?\d[\d\s\-]{5,}\d")
+# Beide in einem Durchlauf: ein zweiter Lauf sähe die Hex-Ziffern der eben
+# gesetzten E-Mail-Platzhalter als Telefonnummer.
+REGEX_PII_PATTERN = re.compile(f"(?P<EMAIL>{EMAIL_PATTERN.pattern})|(?P<PHONE>{PHONE_PATTERN.pattern})")
+
+# GLiNER (inkl. torch) wird erst beim Erzeugen des Scanners importiert, nicht
+# beim Import des Moduls (mehrere Sekunden Kaltstart).
+GLiNER = None
+
+
+def _gliner_class():
+    global GLiNER
+    if GLiNER is None:
+        from gliner import GLiNER as gliner_class
+        GLiNER = gliner_class
+    return GLiNER
+
+
+def replace_entities(text: str, entities: List[Dict[str, Any]], replace: Callable[[str, str], str]) -> str:
+    """Ersetzt GLiNER-Entities (Score >= Schwelle) über `replace(original, label)`.
+
+    Von hinten nach vorne, damit die Offsets der übrigen Entities stabil bleiben.
+    """
+    for entity in sorted(entities, key=lambda e: e.get("start", 0), reverse=True):
+        if entity.get("score", 0) < NER_SCORE_THRESHOLD:
+            continue
+
+        start = entity.get("start")
+        end = entity.get("end")
+        label = entity.get("label", "entity")
+        if start is None or end is None or start < 0 or end > len(text):
+            continue
+
+        text = text[:start] + replace(text[start:end], label) + text[end:]
+    return text
+
+
+class NERCache:
+    """Speicherbegrenzter LRU-Cache für GLiNER-Ergebnisse kurzer Nachrichten.
+
+    Schlüssel ist ein Hash des Textes nach der Regex-Phase, es wird also kein
+    Klartext als Key gehalten. Gecacht werden nur Span-Offsets (start, end,
+    label, score), nie Vault-Platzhalter: `clean()` legt bei jedem Treffer
+    neue Platzhalter an, die Datenschutz-Semantik bleibt unverändert.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = settings.ner_cache_max_entries,
+        ttl_seconds: float = settings.ner_cache_ttl_seconds,
+        max_text_length: int = settings.ner_cache_max_text_length,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_text_length = max_text_length
+        self._entries: "OrderedDict[str, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.metrics: Dict[str, int] = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def _key(self, text: str) -> Optional[str]:
+        if self.max_entries <= 0 or len(text) > self.max_text_length:
+            return None
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get(self, text: str) -> Optional[List[Dict[str, Any]]]:
+        key = self._key(text)
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.metrics["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.metrics["hits"] += 1
+            return [dict(span) for span in entry[1]]
+
+    def put(self, text: str, entities: List[Dict[str, Any]]) -> None:
+        key = self._key(text)
+        if key is None:
+            return
+        spans = [
+            {k: entity.get(k) for k in ("start", "end", "label", "score")}
+            for entity in entities
+        ]
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, spans)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.metrics["evictions"] += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
 
 class PIIScanner:
     """Filtert PII, speichert Originalwerte im Vault und stellt sie nach
     der Modellverarbeitung wieder her."""
 
-    def __init__(self, vault_instance: PIIVault = vault):
+    def __init__(self, vault_instance: PIIVault, ner_cache: Optional[NERCache] = None, admission: Optional[NERAdmission] = None):
         self.vault = vault_instance
+        self.ner_cache = ner_cache if ner_cache is not None else NERCache()
+        # Eigener, begrenzter Executor für GLiNER (Load-Shedding bei Überlast).
+        self.admission = admission if admission is not None else NERAdmission()
+        # Batch-API: eigener Thread, damit Massenverarbeitung die Admission
+        # Control (Wartezeit-Schätzung) des interaktiven Chats nicht verfälscht.
+        self.batch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ner-batch")
         # Modell wird einmalig beim Start geladen (vermeidet Latenz pro Anfrage).
-        self.model = GLiNER.from_pretrained("urchade/gliner_medium-v2.1")
-        # Regex-Pattern für schnelle Vorfilterung typischer PII (ergänzt GLiNER).
-        self.email_pattern = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
-        self.phone_pattern = re.compile(
-            r"(\+?\d{1,3}[\s\-]?)?(?:\(?\d{2,5}\)?[\s\-]?)?\d[\d\s\-]{5,}\d"
-        )
+        self.model = _gliner_class().from_pretrained(NER_MODEL_NAME)
+        self.email_pattern = EMAIL_PATTERN
+        self.phone_pattern = PHONE_PATTERN
+        self.regex_pii_pattern = REGEX_PII_PATTERN
         self.placeholder_pattern = re.compile(r"<[A-Z]+_[^>]+>")
 
     def _clean_regex(self, text: str) -> str:
-        # E-Mails ersetzen
-        def replace_email(match: re.Match) -> str:
+        # E-Mails und Telefonnummern ersetzen
+        def replace(match: re.Match) -> str:
             original = match.group(0)
-            return self.vault.store(original, "EMAIL")
+            return self.vault.store(original, "EMAIL" if match.group("EMAIL") is not None else "PHONE")
 
-        text = self.email_pattern.sub(replace_email, text)
-
-        # Telefonnummern ersetzen
-        def replace_phone(match: re.Match) -> str:
-            original = match.group(0)
-            return self.vault.store(original, "PHONE")
-
-        text = self.phone_pattern.sub(replace_phone, text)
-        return text
+        return self.regex_pii_pattern.sub(replace, text)
 
     async def clean(self, text: str) -> str:
         """Anonymisiert PII, indem erkannte Werte durch Vault-Platzhalter
@@ -52,39 +160,79 @@ class PIIScanner:
         - Regex-Phase (Emails, Telefonnummern) zur schnellen Vorfilterung.
         - GLiNER-Phase (Person/Organisation/Stadt) mit Score-Filter.
         - Platzhalter werden im Vault abgelegt und ersetzen den Textinhalt.
+
+        Bei erschöpfter NER-Kapazität wird `NEROverloadedError` geworfen;
+        `exc.regex_only_text` enthält den nur per Regex anonymisierten Text.
         """
+        with span("pii.clean", text_length=len(text)) as clean_span:
+            text = await self._clean(text)
+            if clean_span is not None:
+                clean_span.set_attribute("placeholders", len(self.placeholder_pattern.findall(text)))
+            return text
+
+    async def _clean(self, text: str) -> str:
         original_text = text
         # Schritt A: Regex-basierte PII vorab entfernen
-        text = self._clean_regex(text)
+        with STAGE_SECONDS.time(stage="pii_regex"), span("pii.regex"):
+            text = self._clean_regex(text)
 
-        # Schritt B: GLiNER-Entities erkennen
-        # CPU-intensive Tasks in ThreadPool auslagern, um Blocking zu verhindern
-        loop = asyncio.get_running_loop()
-        entities: List[Dict[str, Any]] = await loop.run_in_executor(
-            None,
-            lambda: self.model.predict_entities(
-                text, labels=["person", "organization", "city"]
-            )
-        )
+        # Schritt B: GLiNER-Entities erkennen (kurze Texte zuerst aus dem LRU-Cache)
+        entities = self.ner_cache.get(text)
+        if entities is None:
+            # CPU-intensive Tasks im NER-Executor, um Blocking zu verhindern
+            try:
+                with STAGE_SECONDS.time(stage="pii_ner"), span("pii.ner"):
+                    entities: List[Dict[str, Any]] = await self.admission.run(
+                        lambda: self.model.predict_entities(
+                            text, labels=NER_LABELS
+                        )
+                    )
+            except NEROverloadedError as exc:
+                exc.regex_only_text = text
+                raise
+            self.ner_cache.put(text, entities)
 
-        # Schritt C: Platzhalter einsetzen (von hinten nach vorne, um Indizes stabil zu halten)
-        for entity in sorted(entities, key=lambda e: e.get("start", 0), reverse=True):
-            score = entity.get("score", 0)
-            if score < 0.7:
-                continue
+        # Schritt C: Platzhalter einsetzen
+        text = replace_entities(text, entities, self.vault.store)
 
-            start = entity.get("start")
-            end = entity.get("end")
-            label = entity.get("label", "entity")
-            if start is None or end is None or start < 0 or end > len(text):
-                continue
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("PII Clean: Original='%s' -> Anonymized='%s'", redact(original_text), redact(text))
+        return text
 
-            original = text[start:end]
-            placeholder = self.vault.store(original, label)
-            text = text[:start] + placeholder + text[end:]
+    async def clean_batch(self, texts: List[str], batch_size: Optional[int] = None) -> List[str]:
+        """Anonymisiert viele Texte wie `clean`, aber mit gebündelter GLiNER-Inferenz.
 
-        logger.info(f"PII Clean: Original='{original_text}' -> Anonymized='{text}'")
-        return text
+        Texte ohne Cache-Treffer werden nach Länge sortiert (weniger Padding) und
+        in Blöcken von `batch_size` (Default: `BATCH_NER_BATCH_SIZE`) per
+        `batch_predict_entities` erkannt.
+        """
+        batch_size = max(1, batch_size or settings.batch_ner_batch_size)
+        loop = asyncio.get_running_loop()
+        with span("pii.clean_batch", texts=len(texts)):
+            # Regex- und Platzhalter-Phase schreiben je Treffer in Redis: im
+            # Executor, damit der Event-Loop (Chat-Streams) nicht blockiert.
+            with STAGE_SECONDS.time(stage="pii_regex"):
+                regex_texts = await loop.run_in_executor(None, lambda: [self._clean_regex(text) for text in texts])
+
+            entities: List[Optional[List[Dict[str, Any]]]] = [
+                [] if not text.strip() else self.ner_cache.get(text) for text in regex_texts
+            ]
+            missing = sorted((i for i, found in enumerate(entities) if found is None), key=lambda i: len(regex_texts[i]))
+            for start in range(0, len(missing), batch_size):
+                chunk = missing[start:start + batch_size]
+                chunk_texts = [regex_texts[i] for i in chunk]
+                with STAGE_SECONDS.time(stage="pii_ner_batch"), span("pii.ner_batch", texts=len(chunk)):
+                    results = await loop.run_in_executor(
+                        self.batch_executor, lambda: self.model.batch_predict_entities(chunk_texts, NER_LABELS)
+                    )
+                for i, found in zip(chunk, results):
+                    entities[i] = found
+                    self.ner_cache.put(regex_texts[i], found)
+
+            return await loop.run_in_executor(
+                None,
+                lambda: [replace_entities(text, found, self.vault.store) for text, found in zip(regex_texts, entities)],
+            )
 
     def restore(self, text: str) -> str:
         """Re-personalisiert die KI-Antwort, indem Platzhalter über den
@@ -133,7 +281,8 @@ class PIIScanner:
                     # Validieren, ob es ein bekannter PII-Platzhalter ist
                     if self.placeholder_pattern.fullmatch(candidate):
                         # Ersetzen
-                        original = self.vault.get(candidate)
+                        with STAGE_SECONDS.time(stage="restore_lookup"):
+                            original = self.vault.get(candidate)
                         yield original
                     else:
                         # Kein PII-Platzhalter (z.B. <br> oder < 5), original ausgeben
@@ -0,0 +1,142 @@
+"""Volltextsuche über den Chat-Verlauf (TrainingsHub).
+
+Nutzt einen SQLite-FTS5-Index über `chat_messages.content`, der per Trigger
+bei jedem Insert/Update/Delete inkrementell gepflegt wird. Auf anderen
+Datenbanken wird auf eine (langsamere) LIKE-Suche zurückgefallen.
+"""
+import re
+import html
+import logging
+from typing import Any, Dict, List
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "chat_messages_fts"
+
+# External-Content-Tabelle: der Index speichert nur Tokens, der Text bleibt
+# in chat_messages. unicode61 + remove_diacritics für deutsche Umlaute.
+_FTS_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        content,
+        content='chat_messages',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS chat_messages_fts_ai AFTER INSERT ON chat_messages BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS chat_messages_fts_ad AFTER DELETE ON chat_messages BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content) VALUES ('delete', old.id, old.content);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS chat_messages_fts_au AFTER UPDATE OF content ON chat_messages BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO {FTS_TABLE}(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+]
+
+_TERM_PATTERN = re.compile(r"\w+\*?", re.UNICODE)
+
+# FTS5 markiert Treffer mit Zeichen aus der Private Use Area; erst nach dem
+# HTML-Escaping des Nachrichtentexts werden daraus <mark>-Tags.
+_MARK_OPEN = "\ue000"
+_MARK_CLOSE = "\ue001"
+
+
+def init_search_index(engine: Engine) -> None:
+    """Legt den FTS5-Index samt Triggern an (idempotent).
+
+    Existiert der Index noch nicht, wird er einmalig aus dem Bestand befüllt.
+    """
+    if engine.dialect.name != "sqlite":
+        logger.info("Full-text index skipped: dialect '%s' uses LIKE fallback.", engine.dialect.name)
+        return
+
+    with engine.begin() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": FTS_TABLE},
+        ).first()
+        for statement in _FTS_DDL:
+            conn.execute(text(statement))
+        if not exists:
+            conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+
+def build_match_query(query: str) -> str:
+    """Wandelt eine Nutzereingabe in eine sichere FTS5-MATCH-Query um.
+
+    Jeder Begriff wird gequotet (keine FTS-Syntax-Fehler durch Sonderzeichen),
+    ein abschließendes `*` bleibt als Präfixsuche erhalten. Alle Begriffe
+    müssen vorkommen (implizites AND).
+    """
+    terms = []
+    for term in _TERM_PATTERN.findall(query):
+        if term.endswith("*"):
+            terms.append(f'"{term[:-1]}"*')
+        else:
+            terms.append(f'"{term}"')
+    return " ".join(terms)
+
+
+def search_messages(db: Session, query: str, skip: int = 0, limit: int = 20) -> List[Dict[str, Any]]:
+    """Sucht Nachrichten, sortiert nach Relevanz (BM25), mit Snippet-Highlighting."""
+    match_query = build_match_query(query)
+    if not match_query:
+        return []
+
+    if db.get_bind().dialect.name != "sqlite":
+        return _search_like(db, query, skip, limit)
+
+    rows = db.execute(
+        text(
+            f"""
+            SELECT m.id, m.session_id, m.role, m.timestamp,
+                   snippet({FTS_TABLE}, 0, :mark_open, :mark_close, '…', 16) AS snippet,
+                   bm25({FTS_TABLE}) AS rank
+            FROM {FTS_TABLE}
+            JOIN chat_messages AS m ON m.id = {FTS_TABLE}.rowid
+            WHERE {FTS_TABLE} MATCH :match
+            ORDER BY rank
+            LIMIT :limit OFFSET :skip
+            """
+        ),
+        {"match": match_query, "limit": limit, "skip": skip, "mark_open": _MARK_OPEN, "mark_close": _MARK_CLOSE},
+    ).mappings()
+    return [_with_safe_snippet(row) for row in rows]
+
+
+def _with_safe_snippet(row) -> Dict[str, Any]:
+    """Escaped den Nachrichtentext im Snippet; einziges Markup sind die <mark>-Tags."""
+    hit = dict(row)
+    snippet = html.escape(hit["snippet"] or "")
+    hit["snippet"] = snippet.replace(_MARK_OPEN, "<mark>").replace(_MARK_CLOSE, "</mark>")
+    return hit
+
+
+def _search_like(db: Session, query: str, skip: int, limit: int) -> List[Dict[str, Any]]:
+    # Fallback ohne Index/Ranking: neueste Treffer zuerst, Snippet = Inhaltsanfang.
+    rows = db.execute(
+        text(
+            """
+            SELECT id, session_id, role, timestamp, substr(content, 1, 200) AS snippet, 0.0 AS rank
+            FROM chat_messages
+            WHERE lower(content) LIKE :pattern
+            ORDER BY id DESC
+            LIMIT :limit OFFSET :skip
+            """
+        ),
+        {"pattern": f"%{query.lower()}%", "limit": limit, "skip": skip},
+    ).mappings()
+    return [_with_safe_snippet(row) for row in rows]
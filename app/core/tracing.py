@@ -0,0 +1,369 @@
+"""Request-Tracing mit Korrelations-IDs für das Secure PolarisDX AI-Chat Gateway.
+
+- Pro HTTP-Request wird ein Trace-Kontext erzeugt (bzw. aus einem W3C
+  `traceparent`-Header übernommen). Die Trace-ID steht in jedem Log-Record
+  (`trace_id`) und im Response-Header `X-Request-ID`.
+- Spans (Scanner, Vault, Assistant inkl. Run-ID, DB, Notifier) werden nur
+  für gesampelte Requests aufgezeichnet (`TRACE_SAMPLE_RATE`); ungesampelte
+  Requests kosten lediglich einen ContextVar-Lookup pro Span.
+- Export im OTLP/JSON-Format, gebündelt in einem Hintergrund-Thread: als
+  JSON-Lines-Datei oder per HTTP an einen lokalen Collector (`/v1/traces`).
+"""
+import abc
+import os
+import json
+import time
+import queue
+import random
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "secure-chat-gateway"
+
+# OTLP Status-Codes
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+
+class Span:
+    """Ein Zeitabschnitt innerhalb eines Traces (OTLP-kompatible Felder)."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_span_id", "sampled", "start_ns", "end_ns", "attributes", "status", "_tracer")
+
+    def __init__(self, tracer: "Tracer", name: str, trace_id: str, parent_span_id: Optional[str], sampled: bool, attributes: Optional[Dict[str, Any]] = None):
+        self._tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_span_id = parent_span_id
+        self.sampled = sampled
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.status = STATUS_UNSET
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if self.sampled:
+            self.attributes[key] = value
+
+    def record_error(self, exc: BaseException) -> None:
+        if self.sampled:
+            self.status = STATUS_ERROR
+            self.attributes["error.type"] = type(exc).__name__
+
+    def end(self) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            if self.sampled:
+                self._tracer.exporter.export(self)
+
+    @property
+    def duration_seconds(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+            "status": {"code": self.status},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        return span
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def current_trace_id() -> Optional[str]:
+    span = _current_span.get()
+    return span.trace_id if span is not None else None
+
+
+class SpanExporter(abc.ABC):
+    """Sammelt beendete Spans und exportiert sie gebündelt im Hintergrund.
+
+    Die Queue ist begrenzt: ist sie voll, werden Spans verworfen (gezählt in
+    `dropped`), statt den Request-Pfad zu blockieren. Unterklassen legen mit
+    `write` fest, wohin ein OTLP/JSON-Batch geht.
+    """
+
+    def __init__(self, max_queue: int = 10000, batch_size: int = 256, flush_interval: float = 2.0):
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=max_queue)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._thread: Optional[threading.Thread] = None
+
+    def export(self, span: Span) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+            self._thread.start()
+
+    def shutdown(self) -> None:
+        """Exportiert verbleibende Spans und beendet den Hintergrund-Thread."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def _run(self) -> None:
+        batch: List[Span] = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                span = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                span = False
+            if span is None:
+                self._flush(batch)
+                return
+            if span:
+                batch.append(span)
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._flush(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+    def _flush(self, batch: List[Span]) -> None:
+        if not batch:
+            return
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", SERVICE_NAME)]},
+                "scopeSpans": [{"scope": {"name": "app"}, "spans": [span.to_otlp() for span in batch]}],
+            }]
+        }
+        try:
+            self.write(payload)
+        except Exception as e:
+            logger.warning(f"Span export failed ({len(batch)} spans dropped): {e}")
+
+    @abc.abstractmethod
+    def write(self, payload: Dict[str, Any]) -> None:
+        """Schreibt einen OTLP/JSON-Request (`resourceSpans`); läuft im Export-Thread."""
+
+
+class FileSpanExporter(SpanExporter):
+    """Schreibt einen OTLP/JSON-Request pro Batch als Zeile in eine Datei."""
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+
+    def write(self, payload: Dict[str, Any]) -> None:
+        with open(self.path, "a", encoding="utf-8") as handle:
+            handle.write(json.dumps(payload) + "\n")
+
+
+class OTLPHttpSpanExporter(SpanExporter):
+    """Sendet Batches an einen OTLP/HTTP-Collector (JSON-Encoding)."""
+
+    def __init__(self, endpoint: str, **kwargs):
+        super().__init__(**kwargs)
+        self.endpoint = endpoint
+        self._client = httpx.Client(timeout=5.0)
+
+    def write(self, payload: Dict[str, Any]) -> None:
+        self._client.post(self.endpoint, json=payload).raise_for_status()
+
+
+class NoopSpanExporter(SpanExporter):
+    def export(self, span: Span) -> None:
+        pass
+
+    def write(self, payload: Dict[str, Any]) -> None:
+        pass
+
+
+class Tracer:
+    def __init__(self, exporter: Optional[SpanExporter] = None, sample_rate: float = 0.0):
+        self.exporter = exporter or NoopSpanExporter()
+        self.sample_rate = sample_rate if not isinstance(self.exporter, NoopSpanExporter) else 0.0
+
+    def start_trace(self, name: str, traceparent: Optional[str] = None, **attributes: Any) -> Span:
+        """Erzeugt den Root-Span eines Requests (Sampling-Entscheidung fällt hier)."""
+        parent = _parse_traceparent(traceparent) if traceparent else None
+        if parent is not None:
+            trace_id, parent_span_id, parent_sampled = parent
+            sampled = parent_sampled and self.sample_rate > 0
+        else:
+            trace_id, parent_span_id = os.urandom(16).hex(), None
+            sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        return Span(self, name, trace_id, parent_span_id, sampled, attributes if sampled else None)
+
+    def start_span(self, name: str, **attributes: Any) -> Optional[Span]:
+        """Startet einen Kind-Span, ohne ihn zum aktuellen Kontext zu machen
+        (für async Generatoren, die über yields hinweg laufen). None, wenn
+        nicht gesampelt."""
+        parent = _current_span.get()
+        if parent is None or not parent.sampled:
+            return None
+        return Span(self, name, parent.trace_id, parent.span_id, True, attributes)
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+        """Kind-Span als Kontextmanager; ohne gesampelten Eltern-Span ein No-Op."""
+        child = self.start_span(name, **attributes)
+        if child is None:
+            yield None
+            return
+        token = _current_span.set(child)
+        try:
+            yield child
+        except BaseException as exc:
+            child.record_error(exc)
+            raise
+        finally:
+            _current_span.reset(token)
+            child.end()
+
+    @contextmanager
+    def activate(self, span: Span) -> Iterator[Span]:
+        token = _current_span.set(span)
+        try:
+            yield span
+        finally:
+            _current_span.reset(token)
+
+
+def _parse_traceparent(header: str):
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        sampled = bool(int(parts[3], 16) & 1)
+    except ValueError:
+        return None
+    return parts[1], parts[2], sampled
+
+
+def create_tracer() -> Tracer:
+    """Baut den Tracer aus den Settings (TRACE_EXPORTER: none, file, otlp)."""
+    if settings.trace_exporter == "file":
+        exporter: SpanExporter = FileSpanExporter(settings.trace_file)
+    elif settings.trace_exporter == "otlp":
+        exporter = OTLPHttpSpanExporter(settings.trace_otlp_endpoint)
+    else:
+        exporter = NoopSpanExporter()
+    exporter.start()
+    return Tracer(exporter, settings.trace_sample_rate)
+
+
+# Prozessweiter Tracer; wird beim Start der App aus den Settings konfiguriert.
+tracer = Tracer()
+
+
+def configure(new_tracer: Tracer) -> None:
+    global tracer
+    tracer.exporter.shutdown()
+    tracer = new_tracer
+
+
+def get_tracer() -> Tracer:
+    return tracer
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Kind-Span am prozessweiten Tracer (Kurzform für Modul-Code)."""
+    with tracer.span(name, **attributes) as child:
+        yield child
+
+
+def start_span(name: str, **attributes: Any) -> Optional[Span]:
+    return tracer.start_span(name, **attributes)
+
+
+class TraceContextFilter(logging.Filter):
+    """Ergänzt Log-Records um `trace_id` (im Request-Kontext, vor dem Enqueue)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        span = _current_span.get()
+        if span is not None:
+            record.trace_id = span.trace_id
+        return True
+
+
+class TracingMiddleware:
+    """ASGI-Middleware: Root-Span pro HTTP-Request, `X-Request-ID` im Response.
+
+    Als reine ASGI-Middleware umschließt sie auch das Streaming des Bodys
+    und Background-Tasks, der Trace-Kontext gilt also bis zum Ende.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        traceparent = headers.get(b"traceparent")
+        root = tracer.start_trace(
+            f"{scope['method']} {scope['path']}",
+            traceparent=traceparent.decode("latin-1") if traceparent else None,
+            **{"http.method": scope["method"], "http.target": scope["path"]},
+        )
+        request_id = root.trace_id.encode("ascii")
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-request-id", request_id)]
+                root.set_attribute("http.status_code", message["status"])
+                if message["status"] >= 500:
+                    root.status = STATUS_ERROR
+            await send(message)
+
+        token = _current_span.set(root)
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        except BaseException as exc:
+            root.record_error(exc)
+            raise
+        finally:
+            _current_span.reset(token)
+            root.end()
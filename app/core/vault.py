@@ -1,20 +1,37 @@
 """Kapselt den PII-Vault des Secure PolarisDX AI-Chat Gateways und legt sensible
 Daten temporär in Redis ab (TTL: 1h für PII, 24h für Statuswechsel)."""
+import json
+import time
+import logging
+from typing import Dict, Iterable, Tuple
 from uuid import uuid4
 
-from app.core.database import redis_client as default_redis_client
+from app.core.config import settings
+from app.core.database import get_redis_client
+from app.core.tracing import span
+
+logger = logging.getLogger(__name__)
 
 # Präfix für Status-Keys im Vault.
 STATUS_PREFIX = "status:"
+# Pub/Sub-Kanal, über den Statuswechsel an alle Worker verteilt werden.
+STATUS_CHANNEL = "status_changes"
+# Obergrenze für lokal gecachte Status-Einträge pro Worker.
+STATUS_CACHE_MAX_ENTRIES = 10000
 
 
 class PIIVault:
     """Verantwortlich für das Speichern und Wiederherstellen von PII.
     Nutzt Redis als kurzlebigen Speicher, um Platzhalter aufzulösen."""
 
-    def __init__(self, redis_conn=None, ttl_seconds: int = 3600):
-        self.redis = redis_conn or default_redis_client
+    def __init__(self, redis_conn=None, ttl_seconds: int = 3600, status_cache_ttl: float = settings.status_cache_ttl_seconds):
+        # Ohne übergebenen Client wird erst hier (nicht beim Import) verbunden.
+        self.redis = redis_conn if redis_conn is not None else get_redis_client()
         self.ttl_seconds = ttl_seconds
+        # Lokaler Status-Cache: session_id -> (mode, Ablaufzeitpunkt monotonic).
+        self.status_cache_ttl = status_cache_ttl
+        self._status_cache: Dict[str, Tuple[str, float]] = {}
+        self._status_listener = None
 
     def store(self, text: str, entity_type: str) -> str:
         """Speichert den Originalwert unter einem Platzhalter in Redis.
@@ -32,17 +49,95 @@ class PIIVault:
         return value if value is not None else placeholder
 
     def set_status(self, session_id: str, mode: str) -> None:
-        """Setzt den Chat-Modus (AI/HUMAN) mit verlängerter TTL in Redis."""
+        """Setzt den Chat-Modus (AI/HUMAN) mit verlängerter TTL in Redis.
+
+        Der Wechsel wird per Pub/Sub veröffentlicht, damit alle Worker ihren
+        lokalen Status-Cache sofort invalidieren.
+        """
         key = f"{STATUS_PREFIX}{session_id}"
-        # 24h TTL, damit menschliche Bearbeitung ausreichend Zeit hat.
-        self.redis.setex(key, 24 * 3600, mode)
+        with span("vault.set_status", mode=mode):
+            # 24h TTL, damit menschliche Bearbeitung ausreichend Zeit hat.
+            self.redis.setex(key, 24 * 3600, mode)
+            self._cache_status(session_id, mode)
+            self.redis.publish(STATUS_CHANNEL, json.dumps({"session_id": session_id, "mode": mode}))
 
     def get_status(self, session_id: str) -> str:
-        """Liest den Chat-Modus aus Redis; Standard ist AI."""
-        key = f"{STATUS_PREFIX}{session_id}"
-        status = self.redis.get(key)
-        return status if status is not None else "AI"
+        """Liest den Chat-Modus (lokaler Cache, sonst Redis); Standard ist AI."""
+        with span("vault.get_status") as status_span:
+            cached = self._status_cache.get(session_id)
+            if cached is not None and cached[1] > time.monotonic():
+                if status_span is not None:
+                    status_span.set_attribute("cache_hit", True)
+                return cached[0]
+
+            key = f"{STATUS_PREFIX}{session_id}"
+            status = self.redis.get(key)
+            mode = status if status is not None else "AI"
+            self._cache_status(session_id, mode)
+            return mode
+
+    def get_statuses(self, session_ids: Iterable[str]) -> Dict[str, str]:
+        """Wie `get_status` für viele Sessions (Batch-API): Cache-Fehlschläge
+        werden mit einem einzigen MGET aus Redis gelesen."""
+        session_ids = list(dict.fromkeys(session_ids))
+        with span("vault.get_statuses", sessions=len(session_ids)):
+            now = time.monotonic()
+            modes: Dict[str, str] = {}
+            missing = []
+            for session_id in session_ids:
+                cached = self._status_cache.get(session_id)
+                if cached is not None and cached[1] > now:
+                    modes[session_id] = cached[0]
+                else:
+                    missing.append(session_id)
+            if missing:
+                values = self.redis.mget([f"{STATUS_PREFIX}{session_id}" for session_id in missing])
+                for session_id, status in zip(missing, values):
+                    modes[session_id] = status if status is not None else "AI"
+                    self._cache_status(session_id, modes[session_id])
+            return modes
+
+    def _cache_status(self, session_id: str, mode: str) -> None:
+        if self.status_cache_ttl <= 0:
+            return
+        if len(self._status_cache) >= STATUS_CACHE_MAX_ENTRIES:
+            self._evict_status_cache()
+        self._status_cache[session_id] = (mode, time.monotonic() + self.status_cache_ttl)
+
+    def _evict_status_cache(self) -> None:
+        now = time.monotonic()
+        for session_id, (_, expires_at) in list(self._status_cache.items()):
+            if expires_at <= now:
+                self._status_cache.pop(session_id, None)
+        # Falls alles noch gültig ist: älteste Einträge (Einfügereihenfolge) verwerfen.
+        while len(self._status_cache) >= STATUS_CACHE_MAX_ENTRIES:
+            self._status_cache.pop(next(iter(self._status_cache)), None)
+
+    def _on_status_message(self, message) -> None:
+        try:
+            session_id = json.loads(message["data"])["session_id"]
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"Ignoring malformed status message: {message!r}")
+            return
+        self._status_cache.pop(session_id, None)
 
+    def _on_listener_error(self, exc, pubsub, thread) -> None:
+        # Während eines Verbindungsabbruchs können Invalidierungen verloren gehen.
+        logger.warning(f"Status listener error, clearing local status cache: {exc}")
+        self._status_cache.clear()
+        time.sleep(1.0)
 
-vault = PIIVault()
+    def start_status_listener(self) -> None:
+        """Abonniert Statuswechsel in einem Hintergrund-Thread (ein Listener pro Worker)."""
+        if self._status_listener is not None:
+            return
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{STATUS_CHANNEL: self._on_status_message})
+        self._status_listener = pubsub.run_in_thread(
+            sleep_time=1.0, daemon=True, exception_handler=self._on_listener_error
+        )
 
+    def stop_status_listener(self) -> None:
+        if self._status_listener is not None:
+            self._status_listener.stop()
+            self._status_listener = None
@@ -1,15 +1,25 @@
 """FastAPI-Einstiegspunkt für das Secure PolarisDX AI-Chat Gateway."""
+import asyncio
 import logging
 import os
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse
 
+from app.core.answer_cache import AnswerCache
 from app.core.assistant import AIAssistant
-from app.core.config import Settings
 from app.core.database import get_redis_client
-from app.core.logging_setup import setup_logging
+from app.core.lifecycle import ShutdownCoordinator, shutdown_executor
+from app.core.retention import RetentionJob
+from app.core.analytics import AnalyticsRollupJob
+from app.core.ratelimit import RateLimiter
+from app.core.events import SessionEventBus
+from app.core.logging_setup import setup_logging, shutdown_logging
+from app.core import metrics
+from app.core import tracing
+from app.core.config import settings
 from app.core.notifier import TeamsNotifier
 from app.core.scanner import PIIScanner
 from app.core.vault import PIIVault
@@ -17,52 +27,44 @@ from app.core.db_sqla import init_db
 
 from app.routers import chat as chat_router
 from app.routers import admin as admin_router
+from app.routers import batch as batch_router
 
 
-# Initialisierung der App
-app = FastAPI(
-    title="Secure PolarisDX AI-Chat Gateway",
-    version="1.0.0",
-    description="Middleware for PII filtering and AI orchestration.",
-)
-
-# Setup Logging (File + Console)
-setup_logging()
-logging.getLogger("httpx").setLevel(logging.INFO)
-logging.getLogger("openai").setLevel(logging.INFO)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialisiert alle Services beim Start und stoppt sie beim Beenden.
 
-# Mount static files for the test frontend
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
-
-@app.get("/test-chat", include_in_schema=False)
-async def get_test_chat():
-    return FileResponse("app/static/chat.html")
-
-# Admin Frontend Route (nur aktiv wenn Backend aktiv)
-if os.getenv("ENABLE_ADMIN_BACKEND", "false").lower() == "true":
-    @app.get("/admin-panel", include_in_schema=False)
-    async def get_admin_panel():
-        return FileResponse("app/static/admin.html")
-
-
-@app.on_event("startup")
-def startup_event() -> None:
-    """Initialisiert alle Services beim Start der Anwendung.
+    Verbindungen und schwere Abhängigkeiten (Redis, GLiNER/torch, openai)
+    entstehen erst hier, nicht beim Import der Module.
 
     - Initialisiert SQLite Datenbank.
-    - Prüft die Redis-Verbindung (Ping).
+    - Verbindet Redis (Ping), ein gemeinsamer Client für alle Services.
     - Lädt das GLiNER-Modell.
     """
-    # Settings laden
-    settings = Settings()
+    # Setup Logging (Console + rotierende Datei über Hintergrund-Thread)
+    setup_logging()
+    logging.getLogger("httpx").setLevel(logging.INFO)
+    logging.getLogger("openai").setLevel(logging.INFO)
+
+    # Expliziter Default-Executor, der wartende Jobs für die Queue-Tiefe-Metrik zählt.
+    executor = metrics.QueueDepthExecutor(thread_name_prefix="gateway")
+    asyncio.get_running_loop().set_default_executor(executor)
+    metrics.EXECUTOR_QUEUE_DEPTH.set_function(executor.queue_depth)
+
+    # Tracing (TRACE_EXPORTER, TRACE_SAMPLE_RATE)
+    tracing.configure(tracing.create_tracer())
 
     # DB Initialisieren
     init_db()
 
     # Core Services initialisieren und im App State speichern
-    # Redis Client
-    redis_client = get_redis_client()
-    app.state.vault = PIIVault(redis_client)
+    # Redis Client (einziger Client der App)
+    app.state.redis = get_redis_client()
+    app.state.vault = PIIVault(app.state.redis)
+    app.state.vault.start_status_listener()
+    # Server-Push für WebSocket-Clients (Statuswechsel, Antworten von Mitarbeitern)
+    app.state.events = SessionEventBus(app.state.redis)
+    app.state.events.start_listener()
 
     # PII Scanner (hängt vom Vault ab)
     app.state.scanner = PIIScanner(app.state.vault)
@@ -70,8 +72,46 @@ def startup_event() -> None:
     # AI Assistant (hängt von OpenAI Key ab)
     app.state.assistant = AIAssistant()
 
-    # Notifier (hängt von Webhook URL ab)
+    # Rate-Limit je Session/Client-IP (optional, RATE_LIMIT_ENABLED)
+    app.state.rate_limiter = RateLimiter(app.state.redis)
+
+    # Antwort-Cache (optional, ANSWER_CACHE_ENABLED)
+    app.state.answer_cache = AnswerCache(app.state.redis)
+
+    # Notifier (hängt von Webhook URL ab) inkl. Outbox-Dispatcher im Hintergrund
     app.state.notifier = TeamsNotifier()
+    app.state.notifier.start()
+
+    # Kennzahlen für /admin/stats (ANALYTICS_ENABLED), inkrementell ab Watermark
+    app.state.analytics = AnalyticsRollupJob()
+    if settings.analytics_enabled:
+        app.state.analytics.start()
+
+    # Retention/Kompaktierung der TrainingsHub-DB (optional, RETENTION_ENABLED)
+    app.state.retention = RetentionJob(rollups=app.state.analytics)
+    if settings.retention_enabled and app.state.retention.enabled:
+        app.state.retention.start()
+
+    # Graceful Shutdown: Drain beginnt bereits beim SIGTERM (vor dem Lifespan-Shutdown)
+    app.state.lifecycle = ShutdownCoordinator(cancel_streams=app.state.assistant.cancel_active_runs)
+    app.state.lifecycle.install_signal_handlers()
+
+    # Bestehende Zähler der Services unter /metrics bereitstellen
+    answer_cache_metrics = app.state.answer_cache.metrics
+    metrics.expose_dict(
+        "answer_cache_events_total", "Antwort-Cache: Hits, Misses, Stores, Evictions.", "event", answer_cache_metrics,
+        keys=("hits", "misses", "stores", "evictions"),
+    )
+    metrics.expose_value("answer_cache_saved_tokens_total", "Durch Cache-Hits eingesparte OpenAI-Tokens.", lambda: answer_cache_metrics["saved_tokens"])
+    metrics.expose_value("answer_cache_saved_latency_seconds_total", "Durch Cache-Hits eingesparte Antwortzeit.", lambda: answer_cache_metrics["saved_latency_seconds"])
+    metrics.expose_dict("ner_cache_events_total", "NER-Cache: Hits, Misses, Evictions.", "event", app.state.scanner.ner_cache.metrics)
+    outbox_metrics = app.state.notifier.outbox.metrics
+    metrics.expose_dict(
+        "notification_outbox_events_total", "Teams-Outbox: Zustellungen, Fehlversuche, Dead-Letter.", "event", outbox_metrics,
+        keys=("enqueued", "delivered", "failed_attempts", "dead_lettered"),
+    )
+    metrics.expose_value("notification_outbox_delivery_seconds_total", "Summierte Dauer der Webhook-Zustellungen.", lambda: outbox_metrics["delivery_seconds_total"])
+    metrics.expose_dict("notification_outbox_entries", "Teams-Outbox: Einträge je Status.", "status", app.state.notifier.outbox.counts_sync, type_name="gauge")
 
     print("🚀 Secure PolarisDX AI-Chat Gateway ist initialisiert.")
     if os.getenv("ENABLE_ADMIN_BACKEND", "false").lower() == "true":
@@ -79,7 +119,66 @@ def startup_event() -> None:
     else:
         print("ℹ️ Admin Backend ist DEAKTIVIERT (Setze ENABLE_ADMIN_BACKEND=true zum Aktivieren).")
 
+    yield
+
+    # 1. Keine neuen Chats, laufende Streams bis zur Deadline beenden, Rest stornieren
+    await app.state.lifecycle.drain()
+    # 2. Fällige Benachrichtigungen zustellen; der Rest bleibt in der Outbox
+    await app.state.notifier.flush(settings.shutdown_notify_flush_seconds)
+    await app.state.notifier.stop()
+    await app.state.retention.stop()
+    await app.state.analytics.stop()
+    # 3. Ausstehende DB-Writes (z.B. Teilantworten abgebrochener Streams) abschließen
+    await shutdown_executor(executor)
+    # 4. Hintergrund-Dienste stoppen, Redis- und HTTP-Pools schließen
+    app.state.vault.stop_status_listener()
+    app.state.events.stop_listener()
+    # Bulk-Anonymisierung hält nach dem laufenden Chunk an (Checkpoint bleibt gültig)
+    anonymize_job = getattr(app.state, "anonymize_job", None)
+    if anonymize_job is not None:
+        anonymize_job.stop()
+    app.state.scanner.admission.shutdown(wait=False)
+    app.state.scanner.batch_executor.shutdown(wait=False, cancel_futures=True)
+    await app.state.assistant.close()
+    app.state.redis.close()
+    # Verbleibende Spans exportieren
+    tracing.configure(tracing.Tracer())
+    print("👋 Secure PolarisDX AI-Chat Gateway wurde geordnet beendet.")
+    # Listener stoppen (nächster Lifespan startet einen neuen)
+    shutdown_logging()
+
+
+# Initialisierung der App
+app = FastAPI(
+    title="Secure PolarisDX AI-Chat Gateway",
+    version="1.0.0",
+    description="Middleware for PII filtering and AI orchestration.",
+    lifespan=lifespan,
+)
+
+# Root-Span und X-Request-ID pro Request (umschließt auch Streaming und Background-Tasks)
+app.add_middleware(tracing.TracingMiddleware)
+
+# Mount static files for the test frontend
+app.mount("/static", StaticFiles(directory="app/static"), name="static")
+
+@app.get("/test-chat", include_in_schema=False)
+async def get_test_chat():
+    return FileResponse("app/static/chat.html")
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Prometheus-Metriken (Latenzen je Stufe, TTFB, Eskalationen, Caches, Outbox)."""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+# Admin Frontend Route (nur aktiv wenn Backend aktiv)
+if os.getenv("ENABLE_ADMIN_BACKEND", "false").lower() == "true":
+    @app.get("/admin-panel", include_in_schema=False)
+    async def get_admin_panel():
+        return FileResponse("app/static/admin.html")
+
 
 # Router registrieren
 app.include_router(chat_router.router)
 app.include_router(admin_router.router)
+app.include_router(batch_router.router)
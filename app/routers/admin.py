@@ -2,21 +2,36 @@
 import os
 import csv
 import io
+import json
+import zlib
 import datetime
-from typing import List, Optional
+from typing import List, Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from sqlalchemy import func, null
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 
-from app.core.db_sqla import get_db, ChatSession, ChatMessage
+from app.core.analytics import load_stats
+from app.core.anonymizer import AnonymizationJob, start_in_background
+from app.core.jobs import load_job_state
+from app.core.retention import DB_FILE_SIZE, EXPORT_STATE, RETENTION_STATE, record_export_watermark
+from app.core.db_sqla import get_db, SessionLocal, ChatSession, ChatMessage
+from app.core.search import search_messages
 
 # Environment Variable prüfen, ob Admin Backend aktiv ist
 ADMIN_ENABLED = os.getenv("ENABLE_ADMIN_BACKEND", "false").lower() == "true"
+# Profiling-Endpunkte werden nur registriert, wenn explizit aktiviert.
+PROFILING_ENABLED = ADMIN_ENABLED and os.getenv("ENABLE_PROFILING", "false").lower() == "true"
+# Obergrenze für die Dauer einer Profiling-Messung (Sekunden).
+PROFILE_MAX_SECONDS = 60
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
+# Anzahl Zeilen pro DB-Fetch bzw. pro gesendetem Export-Chunk.
+EXPORT_CHUNK_SIZE = 1000
+
 # Pydantic Modelle für Responses
 class MessageRead(BaseModel):
     id: int
@@ -42,6 +57,34 @@ class SessionDetail(SessionRead):
 class NoteUpdate(BaseModel):
     notes: str
 
+class StatusUpdate(BaseModel):
+    mode: Literal["AI", "HUMAN"]
+
+class OperatorReply(BaseModel):
+    message: str
+
+class StatusRead(BaseModel):
+    session_id: str
+    mode: str
+
+class DeadLetterRead(BaseModel):
+    id: int
+    session_id: str
+    attempts: int
+    last_error: Optional[str] = None
+    created_at: datetime.datetime
+
+    class Config:
+        from_attributes = True
+
+class SearchHit(BaseModel):
+    message_id: int
+    session_id: str
+    role: str
+    timestamp: datetime.datetime
+    snippet: str
+    rank: float
+
 
 @router.get("/sessions", response_model=List[SessionRead])
 def list_sessions(skip: int = 0, limit: int = 20, db: Session = Depends(get_db)):
@@ -78,37 +121,400 @@ def update_session_note(session_id: str, note_data: NoteUpdate, db: Session = De
     db.refresh(session)
     return session
 
+@router.get("/sessions/{session_id}/status", response_model=StatusRead)
+def get_session_status(session_id: str, request: Request):
+    """Liefert den aktuellen Chat-Modus (AI/HUMAN) einer Session."""
+    if not ADMIN_ENABLED:
+        raise HTTPException(status_code=403, detail="Admin backend disabled")
+
+    return StatusRead(session_id=session_id, mode=request.app.state.vault.get_status(session_id))
+
+@router.post("/sessions/{session_id}/status", response_model=StatusRead)
+def update_session_status(session_id: str, status_data: StatusUpdate, request: Request):
+    """Setzt den Chat-Modus, z.B. Rückgabe an die KI (`AI`) nach menschlicher Bearbeitung.
+
+    Der Wechsel wird per Pub/Sub an alle Worker verteilt.
+    """
+    if not ADMIN_ENABLED:
+        raise HTTPException(status_code=403, detail="Admin backend disabled")
+
+    request.app.state.vault.set_status(session_id, status_data.mode)
+    return StatusRead(session_id=session_id, mode=status_data.mode)
+
+@router.post("/sessions/{session_id}/reply", response_model=MessageRead)
+def reply_to_session(session_id: str, reply: OperatorReply, request: Request, db: Session = Depends(get_db)):
+    """Antwort eines Mitarbeiters (HUMAN-Modus): wird gespeichert und per
+    Pub/Sub an die WebSocket-Verbindung der Session gepusht (beliebiger Worker)."""
+    if not ADMIN_ENABLED:
+        raise HTTPException(status_code=403, detail="Admin backend disabled")
+
+    session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    message = ChatMessage(session_id=session_id, role="operator", content=reply.message)
+    db.add(message)
+    db.commit()
+    db.refresh(message)
+    request.app.state.events.publish(session_id, "operator_message", text=reply.message, message_id=message.id)
+    return message
+
+@router.get("/answer-cache")
+def answer_cache_status(request: Request):
+    """Zeigt Hit-Rate, eingesparte Latenz und Tokens des Antwort-Caches."""
+    if not ADMIN_ENABLED:
+        raise HTTPException(status_code=403, detail="Admin backend disabled")
+
+    answer_cache = request.app.state.answer_cache
+    return {
+        "enabled": answer_cache.enabled,
+        "version": answer_cache.version,
+        "hit_rate": answer_cache.hit_rate(),
+        "metrics": answer_cache.metrics,
+    }
+
+@router.post("/answer-cache/invalidate")
+def invalidate_answer_cache(request: Request):
+    """Leert den Antwort-Cache der aktuellen Assistant-/Wissensbasis-Version."""
+    if not ADMIN_ENABLED:
+        raise HTTPException(status_code=403, detail="Admin backend disabled")
+
+    return {"invalidated": request.app.state.answer_cache.invalidate()}
+
+@router.get("/notifications")
+def notification_status(request: Request):
+    """Zeigt Zustellmetriken und Füllstand der Teams-Outbox."""
+    if not ADMIN_ENABLED:
+        raise HTTPException(status_code=403, detail="Admin backend disabled")
+
+    outbox = request.app.state.notifier.outbox
+    return {"counts": outbox.counts_sync(), "metrics": outbox.metrics}
+
+@router.get("/notifications/dead", response_model=List[DeadLetterRead])
+def list_dead_letters(request: Request, limit: int = Query(50, ge=1, le=500)):
+    """Listet Benachrichtigungen, die nach allen Retries nicht zugestellt wurden."""
+    if not ADMIN_ENABLED:
+        raise HTTPException(status_code=403, detail="Admin backend disabled")
+
+    return request.app.state.notifier.outbox.dead_letters_sync(limit)
+
+@router.post("/notifications/{entry_id}/retry")
+def retry_dead_letter(entry_id: int, request: Request):
+    """Stellt einen Dead-Letter erneut zur Zustellung ein."""
+    if not ADMIN_ENABLED:
+        raise HTTPException(status_code=403, detail="Admin backend disabled")
+
+    if not request.app.state.notifier.outbox.requeue_sync(entry_id):
+        raise HTTPException(status_code=404, detail="Dead letter not found")
+    return {"requeued": entry_id}
+
+@router.get("/search", response_model=List[SearchHit])
+def search_chat_history(
+    q: str = Query(..., min_length=1),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    """Volltextsuche über alle Nachrichten (Ranking nach Relevanz, Treffer als <mark>-Snippet)."""
+    if not ADMIN_ENABLED:
+        raise HTTPException(status_code=403, detail="Admin backend disabled")
+
+    hits = search_messages(db, q, skip=skip, limit=limit)
+    return [
+        SearchHit(
+            message_id=hit["id"],
+            session_id=hit["session_id"],
+            role=hit["role"],
+            timestamp=hit["timestamp"],
+            snippet=hit["snippet"],
+            rank=hit["rank"],
+        )
+        for hit in hits
+    ]
+
+@router.post("/anonymize")
+def start_anonymization(request: Request, reset: bool = False):
+    """Startet die Bulk-Anonymisierung nach `anonymized_content` im Hintergrund.
+
+    Setzt ab dem letzten Checkpoint fort; `reset=true` beginnt von vorne.
+    """
+    if not ADMIN_ENABLED:
+        raise HTTPException(status_code=403, detail="Admin backend disabled")
+
+    job = getattr(request.app.state, "anonymize_job", None)
+    if job is not None and job.running:
+        raise HTTPException(status_code=409, detail="Anonymization already running")
+    job = AnonymizationJob()
+    request.app.state.anonymize_job = job
+    start_in_background(job, reset=reset)
+    return job.progress
+
+@router.get("/anonymize")
+def anonymization_status(request: Request):
+    """Fortschritt (verarbeitet, Nachrichten/Sekunde, letzte ID) des Bulk-Jobs."""
+    if not ADMIN_ENABLED:
+        raise HTTPException(status_code=403, detail="Admin backend disabled")
+
+    job = getattr(request.app.state, "anonymize_job", None)
+    if job is None:
+        raise HTTPException(status_code=404, detail="No anonymization job started")
+    return job.progress
+
+@router.post("/anonymize/stop")
+def stop_anonymization(request: Request):
+    """Hält den Bulk-Job nach dem laufenden Chunk an."""
+    if not ADMIN_ENABLED:
+        raise HTTPException(status_code=403, detail="Admin backend disabled")
+
+    job = getattr(request.app.state, "anonymize_job", None)
+    if job is None or not job.running:
+        raise HTTPException(status_code=404, detail="No anonymization job running")
+    job.stop()
+    return job.progress
+
+@router.get("/retention")
+def retention_status(request: Request, db: Session = Depends(get_db)):
+    """Aktive Retention-Richtlinien, letzter Lauf und Größe der DB-Datei."""
+    if not ADMIN_ENABLED:
+        raise HTTPException(status_code=403, detail="Admin backend disabled")
+
+    job = request.app.state.retention
+    return {
+        "enabled": job.enabled,
+        "running": job.running,
+        "policies": {
+            "max_age_days": job.max_age_days,
+            "max_messages_per_session": job.max_messages_per_session,
+            "after_export": job.after_export,
+        },
+        "last_run": job.last_run or load_job_state(db, RETENTION_STATE),
+        "last_export": load_job_state(db, EXPORT_STATE),
+        "db_file_size_bytes": DB_FILE_SIZE.value(),
+    }
+
+@router.post("/retention/run")
+def run_retention(request: Request):
+    """Setzt die Retention-Richtlinien sofort durch (blockiert bis zum Ende des Laufs)."""
+    if not ADMIN_ENABLED:
+        raise HTTPException(status_code=403, detail="Admin backend disabled")
+
+    job = request.app.state.retention
+    if not job.enabled:
+        raise HTTPException(status_code=409, detail="No retention policy configured")
+    if job.running:
+        raise HTTPException(status_code=409, detail="Retention already running")
+    return job.run_sync()
+
+@router.get("/stats")
+def chat_stats(
+    days: int = Query(30, ge=1, le=366),
+    top_hours: int = Query(5, ge=1, le=24),
+    db: Session = Depends(get_db),
+):
+    """Kennzahlen für Dashboards (Nachrichten/Tag, Eskalationsrate, Gesprächslänge,
+    Stoßzeiten) aus den vorverdichteten Rollups, unabhängig von der Verlaufsgröße."""
+    if not ADMIN_ENABLED:
+        raise HTTPException(status_code=403, detail="Admin backend disabled")
+    return load_stats(db, days=days, top_hours=top_hours)
+
+@router.post("/stats/refresh")
+def refresh_stats(request: Request):
+    """Verdichtet neue Nachrichten sofort statt beim nächsten Intervall."""
+    if not ADMIN_ENABLED:
+        raise HTTPException(status_code=403, detail="Admin backend disabled")
+
+    job = request.app.state.analytics
+    if job.running:
+        raise HTTPException(status_code=409, detail="Analytics rollup already running")
+    return job.run_sync()
+
+if PROFILING_ENABLED:
+    from app.core import profiling
+
+    @router.get("/profile/cpu", response_class=PlainTextResponse)
+    async def profile_cpu(
+        seconds: float = Query(10.0, gt=0, le=PROFILE_MAX_SECONDS),
+        interval_ms: float = Query(5.0, ge=1, le=1000),
+    ):
+        """Sampling-Profil aller Threads dieses Workers als Folded Stacks
+        (z.B. `flamegraph.pl profile.folded > profile.svg` oder speedscope)."""
+        lock = profiling.get_profile_lock()
+        if lock.locked():
+            raise HTTPException(status_code=409, detail="Profiling already running")
+        async with lock:
+            samples = await profiling.run_in_dedicated_thread(profiling.sample_stacks, seconds, interval_ms / 1000)
+        return PlainTextResponse(
+            profiling.render_folded(samples),
+            headers={"Content-Disposition": "attachment; filename=profile.folded"},
+        )
+
+    @router.get("/profile/memory", response_class=PlainTextResponse)
+    async def profile_memory(
+        seconds: float = Query(10.0, gt=0, le=PROFILE_MAX_SECONDS),
+        top: int = Query(25, ge=1, le=500),
+        frames: int = Query(1, ge=1, le=50),
+    ):
+        """tracemalloc-Diff über das Messfenster (Speicherwachstum je Codezeile)."""
+        lock = profiling.get_profile_lock()
+        if lock.locked():
+            raise HTTPException(status_code=409, detail="Profiling already running")
+        async with lock:
+            report = await profiling.run_in_dedicated_thread(profiling.tracemalloc_diff, seconds, top, frames)
+        return PlainTextResponse(report)
+
 @router.get("/export")
-def export_data(db: Session = Depends(get_db)):
-    """Exportiert alle Sessions und Nachrichten als CSV."""
-    if not ADMIN_ENABLED:
-        raise HTTPException(status_code=403, detail="Admin backend disabled")
-
-    # CSV Generator
-    def iter_csv():
-        output = io.StringIO()
-        writer = csv.writer(output)
-
-        # Header
-        writer.writerow(["session_id", "session_created_at", "session_notes", "message_role", "message_time", "message_content"])
-        yield output.getvalue()
-        output.seek(0)
-        output.truncate(0)
-
-        # Daten query (könnte bei sehr vielen Daten Memory Probleme machen, hier für 'small' ok)
-        sessions = db.query(ChatSession).all()
-        for s in sessions:
-            for m in s.messages:
-                writer.writerow([
-                    s.id,
-                    s.created_at.isoformat(),
-                    s.notes or "",
-                    m.role,
-                    m.timestamp.isoformat(),
-                    m.content
-                ])
-                yield output.getvalue()
-                output.seek(0)
-                output.truncate(0)
-
-    return StreamingResponse(iter_csv(), media_type="text/csv", headers={"Content-Disposition": "attachment; filename=training_data.csv"})
+def export_data(
+    format: str = Query("csv", pattern="^(csv|jsonl)$"),
+    compress: bool = False,
+    since: Optional[datetime.datetime] = None,
+    until: Optional[datetime.datetime] = None,
+    after_id: Optional[int] = None,
+    anonymized: bool = False,
+):
+    """Exportiert Sessions und Nachrichten als CSV oder JSONL (Streaming).
+
+    - Eine einzige JOIN-Query, serverseitig in Chunks (`yield_per`) gelesen:
+      konstanter Speicherbedarf unabhängig von der Datenmenge.
+    - `since`/`until` filtern nach Nachrichten-Zeitstempel.
+    - `after_id` erlaubt inkrementelle Exporte ab einem Watermark. Der neue
+      Watermark (höchste exportierte Nachrichten-ID) steht im Header
+      `X-Export-Watermark`.
+    - `compress=true` liefert den Export on-the-fly gzip-komprimiert.
+    - `anonymized=true` exportiert `anonymized_content` (Bulk-Job
+      `/admin/anonymize`) statt des Originaltexts, ohne Session-Notizen;
+      noch nicht anonymisierte Nachrichten werden ausgelassen.
+    """
+    if not ADMIN_ENABLED:
+        raise HTTPException(status_code=403, detail="Admin backend disabled")
+
+    filters = []
+    if since is not None:
+        filters.append(ChatMessage.timestamp >= since)
+    if until is not None:
+        filters.append(ChatMessage.timestamp < until)
+    if after_id is not None:
+        filters.append(ChatMessage.id > after_id)
+    if anonymized:
+        filters.append(ChatMessage.anonymized_content.isnot(None))
+
+    # Watermark vorab festlegen: begrenzt den Export auf einen konsistenten
+    # Stand, auch wenn während des Streamings neue Nachrichten eintreffen.
+    db = SessionLocal()
+    try:
+        watermark = db.query(func.max(ChatMessage.id)).filter(*filters).scalar()
+    finally:
+        db.close()
+    if watermark is None:
+        watermark = after_id or 0
+    filters.append(ChatMessage.id <= watermark)
+
+    # Nur ein vollständiger Export bis zum Watermark erlaubt die Retention
+    # `RETENTION_AFTER_EXPORT`; gefilterte Exporte lassen Nachrichten aus.
+    complete = since is None and until is None and not anonymized
+    rows = _iter_export_rows(filters, anonymized)
+    chunks = _iter_jsonl(rows) if format == "jsonl" else _iter_csv(rows)
+
+    extension = "jsonl" if format == "jsonl" else "csv"
+    media_type = "application/x-ndjson" if format == "jsonl" else "text/csv"
+    headers = {"X-Export-Watermark": str(watermark)}
+    if compress:
+        chunks = _iter_gzip(chunks)
+        extension += ".gz"
+        media_type = "application/gzip"
+    headers["Content-Disposition"] = f"attachment; filename=training_data.{extension}"
+    if complete:
+        chunks = _iter_then_record(chunks, watermark)
+
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
+
+
+def _iter_export_rows(filters, anonymized=False):
+    """Liest Nachrichten inkl. Session-Daten per JOIN in festen Chunks.
+
+    Eigene DB-Session, da der Generator erst nach dem Request-Handler
+    (im Threadpool des StreamingResponse) konsumiert wird.
+    """
+    db = SessionLocal()
+    try:
+        query = (
+            db.query(
+                ChatSession.id,
+                ChatSession.created_at,
+                # Notizen sind Freitext und werden nicht anonymisiert.
+                null().label("notes") if anonymized else ChatSession.notes,
+                ChatMessage.id,
+                ChatMessage.role,
+                ChatMessage.timestamp,
+                ChatMessage.anonymized_content if anonymized else ChatMessage.content,
+            )
+            .join(ChatMessage, ChatMessage.session_id == ChatSession.id)
+            .filter(*filters)
+            .order_by(ChatMessage.id)
+            .execution_options(yield_per=EXPORT_CHUNK_SIZE)
+        )
+        for row in query:
+            yield row
+    finally:
+        db.close()
+
+
+def _iter_then_record(chunks, watermark):
+    yield from chunks
+    # Erst nach dem letzten Chunk; bricht der Client ab, wird nichts vermerkt.
+    record_export_watermark(watermark, SessionLocal)
+
+
+def _iter_csv(rows):
+    output = io.StringIO()
+    writer = csv.writer(output)
+
+    # Header
+    writer.writerow(["session_id", "session_created_at", "session_notes", "message_id", "message_role", "message_time", "message_content"])
+
+    for count, (session_id, created_at, notes, message_id, role, timestamp, content) in enumerate(rows, start=1):
+        writer.writerow([
+            session_id,
+            created_at.isoformat(),
+            notes or "",
+            message_id,
+            role,
+            timestamp.isoformat(),
+            content,
+        ])
+        # Mehrere Zeilen bündeln, um nicht pro Nachricht einen Chunk zu senden.
+        if count % EXPORT_CHUNK_SIZE == 0:
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate(0)
+
+    yield output.getvalue()
+
+
+def _iter_jsonl(rows):
+    lines = []
+    for session_id, created_at, notes, message_id, role, timestamp, content in rows:
+        lines.append(json.dumps({
+            "session_id": session_id,
+            "session_created_at": created_at.isoformat(),
+            "session_notes": notes,
+            "message_id": message_id,
+            "role": role,
+            "timestamp": timestamp.isoformat(),
+            "content": content,
+        }, ensure_ascii=False))
+        if len(lines) >= EXPORT_CHUNK_SIZE:
+            yield "\n".join(lines) + "\n"
+            lines = []
+
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def _iter_gzip(chunks):
+    # wbits=31 erzeugt ein gzip-kompatibles Format (Header + Trailer).
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
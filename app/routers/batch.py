@@ -0,0 +1,185 @@
+"""Batch-API für nicht-interaktive Eingänge (Kunden-E-Mails, Support-Formulare).
+
+Statt eines HTTP-Streams pro Nachricht nimmt `POST /chat/batch` viele
+`UserMessage`s auf einmal an:
+1) Alle Nachrichten werden in einer Transaktion gespeichert.
+2) Sessions im HUMAN-Modus werden übersprungen (Mitarbeiter übernimmt).
+3) PII-Filterung mit gebündelter GLiNER-Inferenz (`PIIScanner.clean_batch`).
+4) Assistant-Runs mit begrenzter Parallelität (`BATCH_CONCURRENCY`); Nachrichten
+   derselben Session laufen nacheinander (ein aktiver Run pro Thread).
+5) Antworten werden re-personalisiert, gespeichert und pro Eintrag mit Status
+   zurückgegeben; Fehler einzelner Einträge brechen den Batch nicht ab.
+"""
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Literal, Optional
+
+from fastapi import APIRouter, HTTPException, Request, status
+from pydantic import BaseModel
+
+from app.core.config import settings
+from app.core.db_sqla import SessionLocal, ChatSession, ChatMessage
+from app.core.metrics import ERRORS, ESCALATIONS, STAGE_SECONDS, counter, histogram
+from app.core.models import UserMessage
+from app.core.tracing import span
+from app.routers.chat import notify_escalation_task, save_bot_message_sync
+
+router = APIRouter(prefix="/chat", tags=["Batch"])
+logger = logging.getLogger(__name__)
+
+BATCH_ITEMS = counter("chat_batch_items_total", "Verarbeitete Batch-Einträge je Ergebnis.", ["status"])
+BATCH_SECONDS = histogram("chat_batch_seconds", "Gesamtdauer eines Batch-Requests.", buckets=(1, 5, 15, 30, 60, 120, 300, 600))
+
+ItemStatus = Literal["ok", "escalated", "human_mode", "error"]
+
+
+class BatchRequest(BaseModel):
+    items: List[UserMessage]
+
+
+class BatchItemResult(BaseModel):
+    index: int
+    session_id: str
+    status: ItemStatus
+    response: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BatchResponse(BaseModel):
+    results: List[BatchItemResult]
+    counts: Dict[str, int]
+
+
+def save_user_messages_sync(items: List[UserMessage]) -> None:
+    """Speichert alle Eingänge (inkl. fehlender Sessions) in einer Transaktion."""
+    db = SessionLocal()
+    try:
+        session_ids = {item.session_id for item in items}
+        existing = {row.id for row in db.query(ChatSession.id).filter(ChatSession.id.in_(session_ids))}
+        db.add_all([ChatSession(id=session_id) for session_id in session_ids - existing])
+        db.add_all([ChatMessage(session_id=item.session_id, role="user", content=item.message) for item in items])
+        db.commit()
+    finally:
+        db.close()
+
+
+async def _answer(state, index: int, session_id: str, anonymized_prompt: str) -> BatchItemResult:
+    """Ein Assistant-Run ohne Streaming zum Client; liefert Antwort und Status."""
+    run_info = {}
+    chunks = [chunk async for chunk in state.assistant.ask_assistant_stream(session_id, anonymized_prompt, run_info=run_info)]
+    raw_text = "".join(chunks)
+    escalate = "ESKALATION_NOETIG" in raw_text
+    loop = asyncio.get_running_loop()
+    response = (await loop.run_in_executor(None, state.scanner.restore, raw_text.replace("ESKALATION_NOETIG", ""))).strip()
+
+    await loop.run_in_executor(None, save_bot_message_sync, session_id, response)
+    if run_info.get("cancelled") or run_info.get("stalled") is not None:
+        # Teilantwort (Shutdown bzw. OpenAI-Stall): gespeichert, aber als Fehler gemeldet.
+        reason = "cancelled" if run_info.get("cancelled") else "stalled"
+        return BatchItemResult(index=index, session_id=session_id, status="error", response=response, error=f"Assistant run {reason}.")
+    if escalate:
+        ESCALATIONS.inc()
+        await loop.run_in_executor(None, state.vault.set_status, session_id, "HUMAN")
+        await notify_escalation_task(state.notifier, session_id, anonymized_prompt)
+    return BatchItemResult(index=index, session_id=session_id, status="escalated" if escalate else "ok", response=response)
+
+
+async def process_batch(state, items: List[UserMessage], concurrency: int) -> List[BatchItemResult]:
+    results: List[Optional[BatchItemResult]] = [None] * len(items)
+
+    # 1) Persistenz vor der Verarbeitung (gleiche Reihenfolge wie im Chat).
+    loop = asyncio.get_running_loop()
+    try:
+        with STAGE_SECONDS.time(stage="db_save_user"), span("db.save_user_messages", items=len(items)):
+            await loop.run_in_executor(None, save_user_messages_sync, items)
+    except Exception as e:
+        ERRORS.inc(stage="db_save")
+        logger.error(f"Failed to save {len(items)} batch message(s): {type(e).__name__}")
+
+    # 2) HUMAN-Modus: kein KI-Aufruf, Mitarbeiter sieht die Nachricht im Verlauf.
+    # Ein Redis-Roundtrip für alle Sessions, im Executor statt auf dem Event-Loop.
+    with STAGE_SECONDS.time(stage="status_check"):
+        modes = await loop.run_in_executor(None, state.vault.get_statuses, [item.session_id for item in items])
+    pending = []
+    for index, item in enumerate(items):
+        if modes.get(item.session_id) == "HUMAN":
+            results[index] = BatchItemResult(index=index, session_id=item.session_id, status="human_mode")
+        else:
+            pending.append(index)
+
+    # 3) PII-Filterung gebündelt; schlägt sie fehl, betrifft es alle offenen Einträge.
+    try:
+        anonymized = await state.scanner.clean_batch([items[i].message for i in pending])
+    except Exception as e:
+        logger.error(f"Batch PII filtering failed for {len(pending)} item(s): {e}")
+        for index in pending:
+            results[index] = BatchItemResult(index=index, session_id=items[index].session_id, status="error", error="Filter service failed.")
+        return results
+    prompts = dict(zip(pending, anonymized))
+
+    # 4) Runs je Session nacheinander, Sessions parallel (höchstens `concurrency`).
+    by_session: "OrderedDict[str, List[int]]" = OrderedDict()
+    for index in pending:
+        by_session.setdefault(items[index].session_id, []).append(index)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run_session(session_id: str, indices: List[int]) -> None:
+        async with semaphore:
+            for index in indices:
+                try:
+                    result = await _answer(state, index, session_id, prompts[index])
+                except Exception as e:
+                    logger.error(f"Batch item {index} failed for session {session_id}: {e}")
+                    result = BatchItemResult(index=index, session_id=session_id, status="error", error=str(e) or type(e).__name__)
+                results[index] = result
+                if result.status == "escalated":
+                    # Weitere Nachrichten der Session bearbeitet ein Mitarbeiter.
+                    for rest in indices[indices.index(index) + 1:]:
+                        results[rest] = BatchItemResult(index=rest, session_id=session_id, status="human_mode")
+                    return
+
+    await asyncio.gather(*(run_session(session_id, indices) for session_id, indices in by_session.items()))
+    return results
+
+
+@router.post("/batch", response_model=BatchResponse)
+async def handle_batch(batch: BatchRequest, request: Request):
+    """Verarbeitet viele Nachrichten ohne Token-Streaming (z.B. E-Mail-Import).
+
+    Antwortet erst, wenn alle Einträge verarbeitet sind; Ergebnis und Status
+    (`ok`, `escalated`, `human_mode`, `error`) pro Eintrag in Eingangsreihenfolge.
+    """
+    if not settings.batch_enabled:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Batch API disabled")
+    if len(batch.items) > settings.batch_max_items:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.batch_max_items} items per batch.",
+        )
+
+    lifecycle = getattr(request.app.state, "lifecycle", None)
+    if lifecycle is not None and not lifecycle.accepting:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Service is shutting down.",
+            headers={"Retry-After": str(settings.shutdown_retry_after_seconds), "Connection": "close"},
+        )
+
+    started = time.perf_counter()
+    # Beim Shutdown wartet der Drain auch auf laufende Batches.
+    if lifecycle is not None:
+        lifecycle.stream_started()
+    try:
+        results = await process_batch(request.app.state, batch.items, settings.batch_concurrency)
+    finally:
+        if lifecycle is not None:
+            lifecycle.stream_finished()
+        BATCH_SECONDS.observe(time.perf_counter() - started)
+
+    counts: Dict[str, int] = {}
+    for result in results:
+        counts[result.status] = counts.get(result.status, 0) + 1
+        BATCH_ITEMS.inc(status=result.status)
+    return BatchResponse(results=results, counts=counts)
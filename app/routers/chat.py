@@ -1,15 +1,37 @@
 """Chat-Router stellt den Hauptendpunkt des Secure PolarisDX AI-Chat Gateways bereit."""
-from fastapi import APIRouter, HTTPException, Request, status, BackgroundTasks
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, HTTPException, Request, status, BackgroundTasks, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
+import time
 import asyncio
 import logging
+from contextlib import aclosing
+from dataclasses import dataclass
+from typing import List, Optional
 
+from app.core.admission import NER_DEGRADED, NEROverloadedError
+from app.core.answer_cache import CachedAnswer
+from app.core.config import settings
+from app.core.metrics import (
+    ERRORS,
+    ESCALATIONS,
+    HUMAN_MODE_REPLIES,
+    INFLIGHT_STREAMS,
+    WS_CONNECTIONS,
+    STAGE_SECONDS,
+    STREAM_SECONDS,
+    TTFB_SECONDS,
+)
 from app.core.models import BotResponse, UserMessage
-from app.core.db_sqla import SessionLocal, ChatSession, ChatMessage
+from app.core.ratelimit import client_ip
+from app.core.tracing import current_span, span
+from app.core.db_sqla import SessionLocal, ChatSession, ChatMessage, Escalation
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
 logger = logging.getLogger(__name__)
 
+# Abschluss des Streams, wenn OpenAI auch nach einem Retry nicht antwortet.
+STALL_FALLBACK_MESSAGE = "\n\n⚠️ Die Antwort konnte gerade nicht vollständig erstellt werden. Bitte versuchen Sie es in Kürze erneut."
+
 def save_user_message_sync(session_id: str, message_text: str):
     """Speichert die User-Nachricht synchron in einem Thread."""
     db = SessionLocal()
@@ -25,7 +47,7 @@ def save_user_message_sync(session_id: str, message_text: str):
         db.add(msg)
         db.commit()
     except Exception as e:
-        logger.error(f"Failed to save user message for session {session_id}: {e}")
+        logger.error(f"Failed to save user message for session {session_id}: {type(e).__name__}")
     finally:
         db.close()
 
@@ -44,56 +66,189 @@ def save_bot_message_sync(session_id: str, message_text: str):
         db.add(msg)
         db.commit()
     except Exception as e:
-        logger.error(f"Failed to save bot message for session {session_id}: {e}")
+        logger.error(f"Failed to save bot message for session {session_id}: {type(e).__name__}")
     finally:
         db.close()
 
+def load_chat_history_sync(session_id: str) -> List[str]:
+    """Lädt den vollständigen Verlauf einer Session chronologisch aus der lokalen DB."""
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(ChatMessage.role, ChatMessage.content)
+            .filter(ChatMessage.session_id == session_id)
+            .order_by(ChatMessage.id)
+            .all()
+        )
+        return [f"{role.capitalize()}: {content}" for role, content in rows]
+    except Exception as e:
+        logger.error(f"Failed to load chat history for session {session_id}: {type(e).__name__}")
+        return []
+    finally:
+        db.close()
 
-@router.post("/message", response_model=BotResponse)
-async def handle_message(message: UserMessage, request: Request):
-    """Haupt-Endpunkt zur Verarbeitung von Kundenanfragen.
+def record_escalation_sync(session_id: str) -> None:
+    """Hält die Eskalation für die Kennzahlen fest (`/admin/stats`)."""
+    db = SessionLocal()
+    try:
+        db.add(Escalation(session_id=session_id))
+        db.commit()
+    except Exception as e:
+        logger.error(f"Failed to record escalation for session {session_id}: {type(e).__name__}")
+    finally:
+        db.close()
 
-    Pipeline:
-    1) Status-Check (Human Mode) via Vault-Status.
-    2) PII-Filterung/Anonymisierung (Regex + GLiNER) über Scanner.
-    3) KI-Aufruf (OpenAI Assistant) mit anonymisiertem Prompt (Streaming).
-    4) Entscheidung: Re-Personalisierung der Antwort (Streaming) oder Eskalation an Teams.
-    """
-    vault = request.app.state.vault
-    scanner = request.app.state.scanner
-    assistant = request.app.state.assistant
-    notifier = request.app.state.notifier
-    session_id = message.session_id
+async def notify_escalation_task(notifier, session_id: str, fallback_prompt: str):
+    """Hält die Eskalation fest und benachrichtigt Teams nach dem Statuswechsel
+    (läuft nach Ende des Streams)."""
+    loop = asyncio.get_running_loop()
+    with span("db.record_escalation"):
+        await loop.run_in_executor(None, record_escalation_sync, session_id)
+    try:
+        with span("db.load_chat_history"):
+            full_history = await loop.run_in_executor(None, load_chat_history_sync, session_id)
+        if not full_history:
+            full_history = [f"Kundenfrage (anonymisiert): {fallback_prompt}"]
+        await notifier.notify_escalation(session_id, chat_history=full_history)
+    except Exception as e:
+        logger.error(f"Failed to notify escalation for session {session_id}: {e}")
+
+
+def escalate_degraded(vault, notifier, session_id: str, regex_only_prompt: str, background_tasks: BackgroundTasks) -> BotResponse:
+    """Degradierter Pfad bei NER-Überlast: Ohne vollständige Anonymisierung
+    geht nichts an OpenAI; die Session wird direkt an einen Mitarbeiter übergeben."""
+    NER_DEGRADED.inc()
+    ESCALATIONS.inc()
+    with STAGE_SECONDS.time(stage="escalation"):
+        vault.set_status(session_id, "HUMAN")
+    background_tasks.add_task(notify_escalation_task, notifier, session_id, regex_only_prompt)
+    return BotResponse(
+        session_id=session_id,
+        response="Ein Mitarbeiter wird in Kürze übernehmen. Bitte warten Sie auf eine Antwort.",
+        status="ESCALATION_NEEDED",
+    )
+
+
+@dataclass
+class PreparedTurn:
+    """Ergebnis von `prepare_turn`: entweder eine direkte Antwort (`reply`, z.B.
+    HUMAN-Modus) oder der anonymisierte Prompt für den KI-Turn."""
+    reply: Optional[BotResponse] = None
+    anonymized_prompt: str = ""
+    first_turn: bool = False
+    cached_answer: Optional[CachedAnswer] = None
+
+
+async def prepare_turn(
+    state,
+    session_id: str,
+    text: str,
+    client_host: Optional[str],
+    background_tasks: BackgroundTasks,
+    root_span=None,
+) -> PreparedTurn:
+    """Gemeinsamer Teil vor dem KI-Aufruf für HTTP und WebSocket: Shutdown-Check,
+    Rate-Limit, User-Nachricht speichern, Status-Check, PII-Scan (ggf. degradiert)
+    und Antwort-Cache. Ablehnungen kommen als `HTTPException`."""
+    vault = state.vault
+    assistant = state.assistant
+    answer_cache = state.answer_cache
+
+    # Während des Shutdowns keine neuen Chats annehmen (Client versucht es bei einem anderen Worker).
+    lifecycle = getattr(state, "lifecycle", None)
+    if lifecycle is not None and not lifecycle.accepting:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Service is shutting down.",
+            headers={"Retry-After": str(settings.shutdown_retry_after_seconds), "Connection": "close"},
+        )
+
+    # Fair-Share: Limit je Session und Client-IP, vor DB-Write und NER.
+    rate_limiter = getattr(state, "rate_limiter", None)
+    if rate_limiter is not None:
+        with STAGE_SECONDS.time(stage="rate_limit"):
+            decision = rate_limiter.check(session_id, client_host)
+        if not decision.allowed:
+            if root_span is not None:
+                root_span.set_attribute("chat.rate_limited", decision.scope)
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests, please slow down.",
+                headers={"Retry-After": str(decision.retry_after)},
+            )
 
     # -- DB LOGGING START --
     # User-Nachricht SOFORT speichern (via ThreadPool), damit die Reihenfolge stimmt.
     # BackgroundTasks würden erst NACH dem Response laufen, was zu Timestamp-Inversion führt.
     try:
         loop = asyncio.get_running_loop()
-        await loop.run_in_executor(None, save_user_message_sync, session_id, message.message)
+        with STAGE_SECONDS.time(stage="db_save_user"), span("db.save_user_message"):
+            await loop.run_in_executor(None, save_user_message_sync, session_id, text)
     except Exception as e:
+        ERRORS.inc(stage="db_save")
         logger.error(f"Failed to async save user message: {e}")
     # -- DB LOGGING END --
 
     # 1. Human Mode Check
-    if vault.get_status(session_id) == "HUMAN":
-        return BotResponse(
-            session_id=session_id,
-            response="Ein menschlicher Mitarbeiter hat die Konversation übernommen. Bitte warten Sie auf eine Antwort.",
-            status="HUMAN_MODE",
+    with STAGE_SECONDS.time(stage="status_check"):
+        mode = vault.get_status(session_id)
+    if mode == "HUMAN":
+        HUMAN_MODE_REPLIES.inc()
+        return PreparedTurn(
+            reply=BotResponse(
+                session_id=session_id,
+                response="Ein menschlicher Mitarbeiter hat die Konversation übernommen. Bitte warten Sie auf eine Antwort.",
+                status="HUMAN_MODE",
+            )
         )
 
     # 2. PII Filterung (Anonymisierung: DSGVO-Schritt)
     try:
-        anonymized_prompt = await scanner.clean(message.message)
+        anonymized_prompt = await state.scanner.clean(text)
+    except NEROverloadedError as exc:
+        if settings.ner_overload_mode == "degrade" and exc.regex_only_text is not None:
+            return PreparedTurn(reply=escalate_degraded(vault, state.notifier, session_id, exc.regex_only_text, background_tasks))
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Filter service overloaded, please retry.",
+            headers={"Retry-After": str(exc.retry_after)},
+        ) from exc
     except Exception as exc:  # pragma: no cover - defensive path
         # Fehler im Filter -> 500
+        ERRORS.inc(stage="filter")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Filter service failed.",
         ) from exc
 
-    # 3. & 4. AI Call & Restore (Streaming)
+    # Antwort-Cache nur für den ersten Turn einer Session (ohne Thread-Kontext).
+    first_turn = answer_cache.enabled and not assistant.has_thread(session_id)
+    with STAGE_SECONDS.time(stage="answer_cache"):
+        cached_answer = answer_cache.get(anonymized_prompt) if first_turn else None
+    if root_span is not None:
+        root_span.set_attribute("chat.answer_cache_hit", cached_answer is not None)
+    return PreparedTurn(anonymized_prompt=anonymized_prompt, first_turn=first_turn, cached_answer=cached_answer)
+
+
+async def assistant_turn_stream(
+    state,
+    session_id: str,
+    anonymized_prompt: str,
+    first_turn: bool,
+    cached_answer,
+    background_tasks: BackgroundTasks,
+    root_span=None,
+    turn_info=None,
+):
+    """Antwort eines Turns: KI-Stream (bzw. Cache) -> PII-Restore -> DB, inkl.
+    Eskalations-Check. Gemeinsamer Pfad für HTTP-Streaming und WebSocket;
+    Aufgaben nach dem Stream (Teams, Thread-Seeding) landen in `background_tasks`,
+    das Ergebnis (`escalated`) optional in `turn_info`."""
+    vault = state.vault
+    scanner = state.scanner
+    assistant = state.assistant
+    notifier = state.notifier
+    answer_cache = state.answer_cache
 
     # Eskalations-Erkennung "Out-of-band" via Accumulator
     full_text_accumulator = []
@@ -101,20 +256,29 @@ async def handle_message(message: UserMessage, request: Request):
     # Sammelt den finalen, re-personalisierten Text für die DB
     full_restored_accumulator = []
 
-    async def stream_generator():
-        # Hole den AI Stream (Yields Tokens)
-        ai_stream = assistant.ask_assistant_stream(session_id, anonymized_prompt)
+    # Run-ID und Token-Verbrauch des Assistant-Runs
+    run_info = {}
 
-        # Leite AI Stream durch PII Restorer (Yields Restored Tokens)
-        # Und sammle rohen Text für Eskalations-Check
+    started = time.monotonic()
+    # Hole den AI Stream (Yields Tokens) bzw. spiele die gecachte Antwort ab
+    if cached_answer is not None:
+        ai_stream = answer_cache.replay(cached_answer.answer)
+        # Turn im Thread nachtragen, damit Folgefragen den Kontext haben.
+        background_tasks.add_task(assistant.seed_thread, session_id, anonymized_prompt, cached_answer.answer)
+    else:
+        ai_stream = assistant.ask_assistant_stream(session_id, anonymized_prompt, run_info=run_info)
 
-        async def tee_generator(original_gen):
-            async for chunk in original_gen:
-                full_text_accumulator.append(chunk)
-                yield chunk
+    # Leite AI Stream durch PII Restorer (Yields Restored Tokens)
+    # Und sammle rohen Text für Eskalations-Check
 
-        # PII Restore Stream
-        # Filter "ESKALATION_NOETIG" logic within the stream
+    async def tee_generator(original_gen):
+        async for chunk in original_gen:
+            full_text_accumulator.append(chunk)
+            yield chunk
+
+    # PII Restore Stream
+    # Filter "ESKALATION_NOETIG" logic within the stream
+    try:
         async for clean_chunk in scanner.restore_stream(tee_generator(ai_stream)):
             # Remove/Hide internal escalation token if it leaks into the stream
             if "ESKALATION_NOETIG" in clean_chunk:
@@ -123,32 +287,245 @@ async def handle_message(message: UserMessage, request: Request):
             if clean_chunk:
                 full_restored_accumulator.append(clean_chunk)
                 yield clean_chunk
+    except (asyncio.CancelledError, GeneratorExit):
+        # Stream abgebrochen (Client getrennt, Shutdown): bisher gesendete
+        # Teilantwort trotzdem speichern, ohne hier noch zu warten.
+        if full_restored_accumulator:
+            asyncio.get_running_loop().run_in_executor(
+                None, save_bot_message_sync, session_id, "".join(full_restored_accumulator)
+            )
+        raise
 
-        # Nachdem der Stream fertig ist, prüfen wir auf Eskalation
-        full_text = "".join(full_text_accumulator)
+    # Nachdem der Stream fertig ist, prüfen wir auf Eskalation
+    full_text = "".join(full_text_accumulator)
+    run_cancelled = run_info.get("cancelled", False)
+    run_stalled = run_info.get("stalled") is not None
 
-        # -- DB LOGGING START --
-        # Bot-Antwort speichern.
-        final_bot_text = "".join(full_restored_accumulator)
+    if first_turn and cached_answer is None and not run_cancelled and not run_stalled:
         try:
-             loop = asyncio.get_running_loop()
-             await loop.run_in_executor(None, save_bot_message_sync, session_id, final_bot_text)
+            answer_cache.put(
+                anonymized_prompt,
+                full_text,
+                latency_seconds=time.monotonic() - started,
+                total_tokens=run_info.get("total_tokens", 0),
+            )
         except Exception as e:
-             logger.error(f"Failed to async save bot response: {e}")
-        # -- DB LOGGING END --
-
-        if "ESKALATION_NOETIG" in full_text:
-             # Eskalation auslösen
-             full_history = await assistant.get_thread_history(session_id)
-             if not full_history:
-                full_history = [f"Kundenfrage (anonymisiert): {anonymized_prompt}"]
-
-             await notifier.notify_escalation(
-                session_id, chat_history=full_history
-             )
+            logger.error(f"Failed to store answer in cache: {e}")
+
+    # -- DB LOGGING START --
+    # Bot-Antwort speichern.
+    final_bot_text = "".join(full_restored_accumulator)
+    try:
+         loop = asyncio.get_running_loop()
+         with STAGE_SECONDS.time(stage="db_save_bot"), span("db.save_bot_message"):
+             await loop.run_in_executor(None, save_bot_message_sync, session_id, final_bot_text)
+    except Exception as e:
+         ERRORS.inc(stage="db_save")
+         logger.error(f"Failed to async save bot response: {e}")
+    # -- DB LOGGING END --
+
+    if run_cancelled:
+        # Run wurde beim Shutdown nach Ablauf der Drain-Deadline storniert.
+        yield "\n\n⚠️ Die Antwort wurde wegen einer Wartung unterbrochen. Bitte senden Sie Ihre Nachricht erneut."
+
+    escalate = "ESKALATION_NOETIG" in full_text
+    if run_stalled:
+        # OpenAI lieferte auch nach einem Retry keine (vollständige) Antwort.
+        if settings.openai_stall_action == "escalate":
+            escalate = True
+        else:
+            yield STALL_FALLBACK_MESSAGE
+
+    if turn_info is not None:
+        turn_info["escalated"] = escalate
+
+    if escalate:
+         # Eskalation auslösen: Status sofort umschalten, Teams-Benachrichtigung
+         # (Verlauf aus der lokalen DB) erst nach Ende des Streams.
+         ESCALATIONS.inc()
+         if root_span is not None:
+             root_span.set_attribute("chat.escalated", True)
+         with STAGE_SECONDS.time(stage="escalation"):
              vault.set_status(session_id, "HUMAN")
+         background_tasks.add_task(
+            notify_escalation_task, notifier, session_id, anonymized_prompt
+         )
+
+         # Inform the user in the stream
+         yield "\n\n⚠️ Ein Mitarbeiter wird in Kürze übernehmen (Eskalation ausgelöst)."
 
-             # Inform the user in the stream
-             yield "\n\n⚠️ Ein Mitarbeiter wird in Kürze übernehmen (Eskalation ausgelöst)."
 
-    return StreamingResponse(stream_generator(), media_type="text/plain")
+async def instrumented_turn_stream(
+    state,
+    session_id: str,
+    prepared: PreparedTurn,
+    background_tasks: BackgroundTasks,
+    started: float,
+    root_span=None,
+    turn_info=None,
+):
+    """`assistant_turn_stream` mit TTFB, Gesamtdauer und offenen Streams für /metrics."""
+    lifecycle = getattr(state, "lifecycle", None)
+    INFLIGHT_STREAMS.inc()
+    if lifecycle is not None:
+        lifecycle.stream_started()
+    first_chunk = True
+    stream = assistant_turn_stream(
+        state,
+        session_id,
+        prepared.anonymized_prompt,
+        prepared.first_turn,
+        prepared.cached_answer,
+        background_tasks,
+        root_span,
+        turn_info,
+    )
+    try:
+        async with aclosing(stream):
+            async for chunk in stream:
+                if first_chunk:
+                    TTFB_SECONDS.observe(time.perf_counter() - started)
+                    first_chunk = False
+                yield chunk
+    except Exception:
+        ERRORS.inc(stage="stream")
+        raise
+    finally:
+        STREAM_SECONDS.observe(time.perf_counter() - started)
+        INFLIGHT_STREAMS.dec()
+        if lifecycle is not None:
+            lifecycle.stream_finished()
+
+
+@router.post("/message", response_model=BotResponse)
+async def handle_message(message: UserMessage, request: Request):
+    """Haupt-Endpunkt zur Verarbeitung von Kundenanfragen.
+
+    Pipeline:
+    1) Status-Check (Human Mode) via Vault-Status.
+    2) PII-Filterung/Anonymisierung (Regex + GLiNER) über Scanner.
+    3) KI-Aufruf (OpenAI Assistant) mit anonymisiertem Prompt (Streaming).
+    4) Entscheidung: Re-Personalisierung der Antwort (Streaming) oder Eskalation an Teams.
+    """
+    session_id = message.session_id
+    request_started = time.perf_counter()
+    root_span = current_span()
+    if root_span is not None:
+        root_span.set_attribute("chat.session_id", session_id)
+
+    # Tasks werden von Starlette nach der Antwort bzw. dem letzten Stream-Chunk ausgeführt.
+    background_tasks = BackgroundTasks()
+    prepared = await prepare_turn(
+        request.app.state, session_id, message.message, client_ip(request), background_tasks, root_span
+    )
+    if prepared.reply is not None:
+        return JSONResponse(prepared.reply.model_dump(), background=background_tasks)
+
+    # 3. & 4. AI Call & Restore (Streaming)
+    stream = instrumented_turn_stream(
+        request.app.state, session_id, prepared, background_tasks, request_started, root_span
+    )
+    return StreamingResponse(stream, media_type="text/plain", background=background_tasks)
+
+
+@router.websocket("/ws/{session_id}")
+async def chat_websocket(websocket: WebSocket, session_id: str):
+    """Chat über eine dauerhafte WebSocket-Verbindung pro Session.
+
+    Client -> Server: `{"message": "..."}` pro Turn.
+    Server -> Client (JSON):
+    - `{"type": "status", "mode": "AI"|"HUMAN"}` beim Verbindungsaufbau und bei jedem Statuswechsel,
+    - `{"type": "token", "text": "..."}` für die Antwort (gleicher Scan-/Restore-Pfad wie `/chat/message`),
+    - `{"type": "done", "status": "AI"|"HUMAN_MODE"|"ESCALATION_NEEDED"}` am Ende eines Turns,
+    - `{"type": "operator_message", "text": "..."}` für Antworten von Mitarbeitern,
+    - `{"type": "error", "code": 429|503|..., "detail": "...", "retry_after": n}`.
+    Im HUMAN-Modus werden Nachrichten nur gespeichert; der Client wartet auf Push-Events statt zu pollen.
+    """
+    state = websocket.app.state
+    await websocket.accept()
+    send_lock = asyncio.Lock()
+
+    async def send(event):
+        async with send_lock:
+            await websocket.send_json(event)
+
+    events = getattr(state, "events", None)
+    queue = events.subscribe(session_id) if events is not None else None
+
+    async def push_events():
+        while True:
+            await send(await queue.get())
+
+    pusher = asyncio.create_task(push_events()) if queue is not None else None
+    WS_CONNECTIONS.inc()
+    try:
+        await send({"type": "status", "mode": state.vault.get_status(session_id)})
+        while True:
+            try:
+                data = await websocket.receive_json()
+            except (ValueError, KeyError):
+                # Kein JSON bzw. Binär-Frame: Turn ablehnen, Verbindung bleibt offen.
+                data = None
+            text = data.get("message") if isinstance(data, dict) else None
+            if not isinstance(text, str) or not text.strip():
+                await send({"type": "error", "code": 400, "detail": "Expected {\"message\": \"...\"}."})
+                continue
+            await _websocket_turn(state, websocket, send, session_id, text)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        WS_CONNECTIONS.dec()
+        if pusher is not None:
+            pusher.cancel()
+        if queue is not None:
+            events.unsubscribe(session_id, queue)
+
+
+async def _websocket_turn(state, websocket: WebSocket, send, session_id: str, text: str) -> None:
+    """Ein Turn über den WebSocket; Fehler gehen als Event an den Client, die
+    Verbindung bleibt offen (außer beim Shutdown)."""
+    background_tasks = BackgroundTasks()
+    turn_started = time.perf_counter()
+    try:
+        prepared = await prepare_turn(state, session_id, text, client_ip(websocket), background_tasks)
+    except HTTPException as exc:
+        headers = exc.headers or {}
+        event = {"type": "error", "code": exc.status_code, "detail": exc.detail}
+        if "Retry-After" in headers:
+            event["retry_after"] = int(headers["Retry-After"])
+        await send(event)
+        if headers.get("Connection") == "close":
+            # 1012 = Service Restart: Client verbindet sich mit einem anderen Worker.
+            await websocket.close(code=1012)
+            raise WebSocketDisconnect(code=1012)
+        return
+    except Exception:
+        ERRORS.inc(stage="prepare")
+        logger.exception(f"Failed to prepare websocket turn for session {session_id}")
+        await send({"type": "error", "code": 500, "detail": "Internal error, please retry."})
+        return
+
+    if prepared.reply is not None:
+        if prepared.reply.status != "HUMAN_MODE":
+            await send({"type": "token", "text": prepared.reply.response})
+        await send({"type": "done", "status": prepared.reply.status})
+        await background_tasks()
+        return
+
+    turn_info = {}
+    stream = instrumented_turn_stream(state, session_id, prepared, background_tasks, turn_started, turn_info=turn_info)
+    try:
+        async with aclosing(stream):
+            async for chunk in stream:
+                await send({"type": "token", "text": chunk})
+    except WebSocketDisconnect:
+        raise
+    except Exception:
+        # Abgebrochene Antwort: Client kann die Nachricht erneut senden.
+        logger.exception(f"Assistant stream failed for session {session_id}")
+        await send({"type": "error", "code": 500, "detail": "Assistant stream failed, please retry."})
+        return
+
+    # Nach einer Eskalation folgt zusätzlich das Status-Event (HUMAN) per Push.
+    await send({"type": "done", "status": "ESCALATION_NEEDED" if turn_info.get("escalated") else "AI"})
+    await background_tasks()
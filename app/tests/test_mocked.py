@@ -6,9 +6,10 @@ mock_database = MagicMock()
 mock_database.redis_client = MagicMock()
 sys.modules["app.core.database"] = mock_database
 
+import asyncio
 import logging
 import pytest
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 
 # Now import the modules that depend on app.core.database
 from app.core.scanner import PIIScanner
@@ -42,9 +43,10 @@ def mock_vault(mock_redis):
 
 # Test PII Scanner Logging
 def test_pii_scanner_logging(mock_vault, caplog):
-    scanner = PIIScanner(mock_vault)
-    # The scanner uses self.model which loads GLiNER. This might be slow/downloading.
-    # We should mock the GLiNER model too to speed up tests and avoid network.
+    # The scanner loads GLiNER in __init__. This might be slow/downloading.
+    # We mock the GLiNER model to speed up tests and avoid network.
+    with patch("app.core.scanner.GLiNER"):
+        scanner = PIIScanner(mock_vault)
     scanner.model = MagicMock()
     # Mock entities return
     scanner.model.predict_entities.return_value = []
@@ -56,17 +58,19 @@ def test_pii_scanner_logging(mock_vault, caplog):
     with caplog.at_level(logging.INFO):
         original_text = "My email is test@example.com"
         # Regex should catch email even if GLiNER is mocked to return nothing
-        anonymized = scanner.clean(original_text)
+        anonymized = asyncio.run(scanner.clean(original_text))
 
-        # Check if the log message was generated
-        assert "PII Clean: Original='My email is test@example.com'" in caplog.text
+        # Check if the log message was generated (content is redacted by default)
+        assert "PII Clean: Original='<redacted len=28 hmac=" in caplog.text
         assert "Anonymized=" in caplog.text
+        assert "test@example.com" not in caplog.text
         assert "<EMAIL_" in anonymized
 
 # Test Assistant Logging
 def test_assistant_escalation_logging(caplog):
-    # Mock OpenAI
-    with patch("app.core.assistant.OpenAI") as mock_openai:
+    # Mock OpenAI (AsyncOpenAI: alle Client-Calls sind Coroutinen)
+    with patch("app.core.assistant.AsyncOpenAI") as mock_openai:
+        mock_openai.return_value = AsyncMock()
         assistant = AIAssistant()
 
         # Mock OpenAI response for thread run retrieval
@@ -83,14 +87,15 @@ def test_assistant_escalation_logging(caplog):
         assistant.client.beta.threads.messages.list.return_value = mock_messages
 
         with caplog.at_level(logging.INFO):
-            response, escalated = assistant.ask_assistant("session_1", "Help me")
+            response, escalated = asyncio.run(assistant.ask_assistant("session_1", "Help me"))
 
             assert escalated is True
             assert "Escalation triggered by AI response" in caplog.text
 
 # Test Full History Retrieval
 def test_get_thread_history():
-    with patch("app.core.assistant.OpenAI") as mock_openai:
+    with patch("app.core.assistant.AsyncOpenAI") as mock_openai:
+        mock_openai.return_value = AsyncMock()
         assistant = AIAssistant()
         assistant._threads["session_1"] = "thread_123"
 
@@ -108,7 +113,7 @@ def test_get_thread_history():
 
         assistant.client.beta.threads.messages.list.return_value = mock_list
 
-        history = assistant.get_thread_history("session_1")
+        history = asyncio.run(assistant.get_thread_history("session_1"))
 
         assert len(history) == 2
         assert history[0] == "User: Hello"
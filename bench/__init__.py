@@ -0,0 +1,6 @@
+"""Offline-Benchmark- und Lasttest-Suite für das Secure PolarisDX AI-Chat Gateway.
+
+- `bench.fake_openai`: lokaler Ersatz der Assistants API (konfigurierbare Latenzen).
+- `bench.gateway`: startet das Gateway mit fakeredis und Stub-NER.
+- `bench.load`: Lasttreiber für `/chat/message` (req/s, TTFB- und Latenz-Perzentile).
+"""
@@ -0,0 +1,235 @@
+"""Lokaler Ersatz der OpenAI Assistants API für Benchmarks und Tests.
+
+Implementiert die vom Gateway genutzten Endpunkte (Threads, Messages,
+gestreamte Runs, Cancel) und streamt eine Antwort mit konfigurierbarer
+Time-to-first-token und Token-Rate als Server-Sent Events. Optional hängen
+Runs ohne weitere Events (Stall-Tests).
+
+Start: `python -m bench.fake_openai --port 8089 --ttft 0.3 --token-interval 0.02`
+"""
+import json
+import time
+import socket
+import asyncio
+import argparse
+import itertools
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterator, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+_ids = itertools.count(1)
+
+
+def _new_id(prefix: str) -> str:
+    return f"{prefix}_{next(_ids):08d}"
+
+
+@dataclass
+class FakeOpenAIConfig:
+    reply: str = "Vielen Dank für Ihre Anfrage. Die Lieferzeit beträgt in der Regel zwei bis drei Werktage."
+    ttft_seconds: float = 0.2  # Verzögerung bis zum ersten Token
+    token_interval_seconds: float = 0.01  # Abstand zwischen Tokens
+    request_latency_seconds: float = 0.0  # Latenz für Thread-/Message-Requests
+    prompt_tokens: int = 500
+    # Zusätzliche Prompt-Tokens je Nachricht im (ggf. gekürzten) Thread-Kontext.
+    tokens_per_message: int = 0
+    # Stall-Simulation: Runs hängen nach `stall_after_tokens` Tokens (0 = vor dem
+    # ersten Token, None = nie); betroffen sind die ersten `stall_runs` Runs.
+    stall_after_tokens: Optional[int] = None
+    stall_runs: int = 1
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _run_object(run_id: str, thread_id: str, status: str, usage=None) -> Dict:
+    return {
+        "id": run_id,
+        "object": "thread.run",
+        "created_at": int(time.time()),
+        "thread_id": thread_id,
+        "assistant_id": "asst_fake",
+        "status": status,
+        "instructions": "",
+        "model": "fake",
+        "tools": [],
+        "metadata": {},
+        "parallel_tool_calls": False,
+        "usage": usage,
+    }
+
+
+def _message_object(message_id: str, thread_id: str, role: str, text: str, run_id=None, status="completed") -> Dict:
+    content = [{"type": "text", "text": {"value": text, "annotations": []}}] if text else []
+    return {
+        "id": message_id,
+        "object": "thread.message",
+        "created_at": int(time.time()),
+        "thread_id": thread_id,
+        "role": role,
+        "content": content,
+        "status": status,
+        "assistant_id": "asst_fake" if role == "assistant" else None,
+        "run_id": run_id,
+        "attachments": [],
+        "metadata": {},
+    }
+
+
+def tokenize(text: str):
+    """Zerlegt den Antworttext in wortweise Tokens (inkl. Leerzeichen)."""
+    words = text.split(" ")
+    return [word + (" " if i < len(words) - 1 else "") for i, word in enumerate(words)]
+
+
+def create_app(config: FakeOpenAIConfig = None) -> FastAPI:
+    config = config or FakeOpenAIConfig()
+    app = FastAPI(title="Fake OpenAI Assistants API")
+    app.state.config = config
+    app.state.stats = {"threads": 0, "messages": 0, "runs": 0, "cancelled": 0, "stalled": 0}
+    app.state.cancelled = set()
+    app.state.runs = {}
+    app.state.thread_messages = {}
+
+    async def simulated_latency():
+        if config.request_latency_seconds:
+            await asyncio.sleep(config.request_latency_seconds)
+
+    @app.post("/v1/threads")
+    async def create_thread(request: Request):
+        await simulated_latency()
+        body = await request.json()
+        app.state.stats["threads"] += 1
+        thread_id = _new_id("thread")
+        app.state.thread_messages[thread_id] = len(body.get("messages") or [])
+        return {"id": thread_id, "object": "thread", "created_at": int(time.time()), "metadata": {}, "tool_resources": None}
+
+    @app.post("/v1/threads/{thread_id}/messages")
+    async def create_message(thread_id: str, request: Request):
+        await simulated_latency()
+        body = await request.json()
+        app.state.stats["messages"] += 1
+        app.state.thread_messages[thread_id] = app.state.thread_messages.get(thread_id, 0) + 1
+        content = body.get("content")
+        text = content if isinstance(content, str) else ""
+        return _message_object(_new_id("msg"), thread_id, body.get("role", "user"), text)
+
+    @app.post("/v1/threads/{thread_id}/runs/{run_id}/cancel")
+    async def cancel_run(thread_id: str, run_id: str):
+        app.state.stats["cancelled"] += 1
+        app.state.cancelled.add(run_id)
+        app.state.runs[run_id] = "cancelled"
+        return _run_object(run_id, thread_id, "cancelling")
+
+    @app.get("/v1/threads/{thread_id}/runs/{run_id}")
+    async def retrieve_run(thread_id: str, run_id: str):
+        return _run_object(run_id, thread_id, app.state.runs.get(run_id, "completed"))
+
+    async def stall(run_id: str):
+        # Hängt bis zum Cancel (wie ein Run, dessen Stream keine Events mehr liefert).
+        app.state.stats["stalled"] += 1
+        while run_id not in app.state.cancelled:
+            await asyncio.sleep(0.01)
+
+    @app.post("/v1/threads/{thread_id}/runs")
+    async def create_run(thread_id: str, request: Request):
+        app.state.stats["runs"] += 1
+        run_id = _new_id("run")
+        message_id = _new_id("msg")
+        app.state.runs[run_id] = "in_progress"
+        body = await request.json()
+        context_messages = app.state.thread_messages.get(thread_id, 0)
+        truncation = body.get("truncation_strategy") or {}
+        if truncation.get("type") == "last_messages":
+            context_messages = min(context_messages, truncation["last_messages"])
+        prompt_tokens = config.prompt_tokens + config.tokens_per_message * context_messages
+        stall_at = config.stall_after_tokens if app.state.stats["runs"] <= config.stall_runs else None
+
+        async def events():
+            yield _sse("thread.run.created", _run_object(run_id, thread_id, "queued"))
+            yield _sse("thread.run.in_progress", _run_object(run_id, thread_id, "in_progress"))
+            await asyncio.sleep(config.ttft_seconds)
+            yield _sse("thread.message.created", _message_object(message_id, thread_id, "assistant", "", run_id, "in_progress"))
+
+            tokens = tokenize(config.reply)
+            for index, token in enumerate(tokens):
+                if index == stall_at:
+                    await stall(run_id)
+                if run_id in app.state.cancelled:
+                    app.state.runs[run_id] = "cancelled"
+                    yield _sse("thread.run.cancelled", _run_object(run_id, thread_id, "cancelled"))
+                    yield "event: done\ndata: [DONE]\n\n"
+                    return
+                if index:
+                    await asyncio.sleep(config.token_interval_seconds)
+                delta = {"index": 0, "type": "text", "text": {"value": token, "annotations": []}}
+                yield _sse("thread.message.delta", {"id": message_id, "object": "thread.message.delta", "delta": {"content": [delta]}})
+
+            yield _sse("thread.message.completed", _message_object(message_id, thread_id, "assistant", config.reply, run_id))
+            usage = {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(tokens),
+                "total_tokens": prompt_tokens + len(tokens),
+            }
+            app.state.runs[run_id] = "completed"
+            app.state.thread_messages[thread_id] = app.state.thread_messages.get(thread_id, 0) + 1
+            yield _sse("thread.run.completed", _run_object(run_id, thread_id, "completed", usage))
+            yield "event: done\ndata: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+@contextmanager
+def serve_in_thread(config: FakeOpenAIConfig = None) -> Iterator[str]:
+    """Startet den Fake-Server in einem Hintergrund-Thread (für Tests); liefert die Basis-URL."""
+    import uvicorn
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    app = create_app(config)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}/v1"
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake OpenAI Assistants API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--ttft", type=float, default=FakeOpenAIConfig.ttft_seconds)
+    parser.add_argument("--token-interval", type=float, default=FakeOpenAIConfig.token_interval_seconds)
+    parser.add_argument("--request-latency", type=float, default=FakeOpenAIConfig.request_latency_seconds)
+    parser.add_argument("--stall-after-tokens", type=int, default=None, help="Runs hängen nach N Tokens (0 = vor dem ersten)")
+    parser.add_argument("--stall-runs", type=int, default=FakeOpenAIConfig.stall_runs, help="Anzahl hängender Runs")
+    args = parser.parse_args()
+
+    config = FakeOpenAIConfig(
+        ttft_seconds=args.ttft,
+        token_interval_seconds=args.token_interval,
+        request_latency_seconds=args.request_latency,
+        stall_after_tokens=args.stall_after_tokens,
+        stall_runs=args.stall_runs,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Startet das Gateway für Benchmarks ohne externe Dienste.
+
+- Redis: `fakeredis` (In-Process, Pub/Sub inklusive).
+- NER: Stub-Modell mit konfigurierbarer Latenz statt GLiNER (`--real-ner` lädt das echte Modell).
+- OpenAI: Fake-Assistants-API aus `bench.fake_openai` (über `OPENAI_BASE_URL`).
+- DB und Log-Datei: temporäres Verzeichnis.
+
+Start: `python -m bench.gateway --port 8090 --openai-url http://127.0.0.1:8089/v1`
+"""
+import os
+import sys
+import time
+import types
+import argparse
+import tempfile
+
+
+class StubNER:
+    """Ersetzt GLiNER: simuliert die Inferenzdauer und findet keine Entities."""
+
+    def __init__(self, latency_seconds: float = 0.0):
+        self.latency_seconds = latency_seconds
+
+    def predict_entities(self, text, labels, **kwargs):
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        return []
+
+    def batch_predict_entities(self, texts, labels, **kwargs):
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        return [[] for _ in texts]
+
+
+def install_stub_ner(latency_seconds: float) -> None:
+    """Registriert ein `gliner`-Ersatzmodul (spart auch den Import von torch)."""
+    module = types.ModuleType("gliner")
+
+    class GLiNER:
+        @staticmethod
+        def from_pretrained(*args, **kwargs):
+            return StubNER(latency_seconds)
+
+    module.GLiNER = GLiNER
+    sys.modules["gliner"] = module
+
+
+def install_fake_redis() -> None:
+    """Ersetzt redis.Redis durch fakeredis; Clients mit gleichem Host/Port teilen sich die Daten."""
+    import redis
+    import fakeredis
+
+    redis.Redis = fakeredis.FakeRedis
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Gateway mit lokalen Stand-ins für Benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--openai-url", default="http://127.0.0.1:8089/v1")
+    parser.add_argument("--ner-latency", type=float, default=0.02, help="Simulierte NER-Dauer pro Nachricht (Sekunden)")
+    parser.add_argument("--real-ner", action="store_true", help="Echtes GLiNER-Modell laden")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="gateway-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.setdefault("LOG_FILE", os.path.join(workdir, "gateway.log"))
+    os.environ["OPENAI_BASE_URL"] = args.openai_url
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+    os.environ["TEAMS_WEBHOOK_URL"] = ""
+
+    install_fake_redis()
+    if not args.real_ner:
+        install_stub_ner(args.ner_latency)
+
+    import uvicorn
+    from app.main import app
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
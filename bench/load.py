@@ -0,0 +1,238 @@
+"""Lasttreiber für `/chat/message`.
+
+Misst Requests/Sekunde sowie p50/p95/p99 für Time-to-first-byte (TTFB) und
+vollständige Antwortlatenz bei konfigurierbarer Parallelität. Ergebnisse
+werden als JSON (inkl. Commit und Konfiguration) geschrieben und können mit
+einer Baseline verglichen werden, um Regressionen zu erkennen.
+
+Beispiele:
+    # Fake-OpenAI und Gateway automatisch starten:
+    python -m bench.load --spawn --concurrency 20 --requests 500 --output bench_output.json
+
+    # Gegen ein laufendes Gateway, mit Regressions-Gate (Exit-Code 1):
+    python -m bench.load --url http://127.0.0.1:8090 --baseline baseline.json --max-regression 0.1
+"""
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import platform
+import subprocess
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import httpx
+
+# Kennzahlen, bei denen ein höherer Wert eine Verschlechterung ist.
+LATENCY_KEYS = [("ttft", "p50"), ("ttft", "p95"), ("ttft", "p99"), ("latency", "p50"), ("latency", "p95"), ("latency", "p99")]
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Perzentil mit linearer Interpolation (q in Prozent)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(ttfb: List[float], latency: List[float], errors: int, wall_seconds: float) -> Dict:
+    def stats(values):
+        return {
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+            "mean": sum(values) / len(values) if values else 0.0,
+        }
+
+    return {
+        "requests": len(latency),
+        "errors": errors,
+        "wall_seconds": wall_seconds,
+        "rps": len(latency) / wall_seconds if wall_seconds else 0.0,
+        "ttft": stats(ttfb),
+        "latency": stats(latency),
+    }
+
+
+async def run_load(
+    base_url: str,
+    concurrency: int = 10,
+    total_requests: int = 100,
+    message: str = "Wie lange dauert die Lieferung nach Hamburg?",
+    session_prefix: str = "bench",
+    timeout: float = 60.0,
+) -> Dict:
+    """Schickt `total_requests` Anfragen mit `concurrency` parallelen Clients."""
+    ttfb: List[float] = []
+    latency: List[float] = []
+    errors = 0
+    counter = iter(range(total_requests))
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        nonlocal errors
+        for index in counter:
+            payload = {"session_id": f"{session_prefix}-{index}", "message": message}
+            started = time.perf_counter()
+            first_byte: Optional[float] = None
+            try:
+                async with client.stream("POST", "/chat/message", json=payload) as response:
+                    async for chunk in response.aiter_bytes():
+                        if first_byte is None and chunk:
+                            first_byte = time.perf_counter() - started
+                    if response.status_code != 200:
+                        errors += 1
+                        continue
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latency.append(time.perf_counter() - started)
+            ttfb.append(first_byte if first_byte is not None else latency[-1])
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+
+    return summarize(ttfb, latency, errors, wall)
+
+
+def compare(result: Dict, baseline: Dict, max_regression: float) -> List[str]:
+    """Liefert eine Liste von Regressionen gegenüber der Baseline (relativ, z.B. 0.1 = 10%)."""
+    regressions = []
+    base_rps = baseline["results"]["rps"]
+    if base_rps and result["rps"] < base_rps * (1 - max_regression):
+        regressions.append(f"rps {result['rps']:.1f} < baseline {base_rps:.1f}")
+    for group, key in LATENCY_KEYS:
+        value, base = result[group][key], baseline["results"][group][key]
+        if base and value > base * (1 + max_regression):
+            regressions.append(f"{group}.{key} {value * 1000:.1f}ms > baseline {base * 1000:.1f}ms")
+    return regressions
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_ready(url: str, timeout: float = 120.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+
+@contextmanager
+def spawn_stack(args):
+    """Startet Fake-OpenAI und Gateway als eigene Prozesse (kein GIL-Wettbewerb mit dem Treiber)."""
+    openai_port, gateway_port = _free_port(), _free_port()
+    processes = [
+        subprocess.Popen([
+            sys.executable, "-m", "bench.fake_openai", "--port", str(openai_port),
+            "--ttft", str(args.ttft), "--token-interval", str(args.token_interval),
+        ]),
+    ]
+    try:
+        _wait_until_ready(f"http://127.0.0.1:{openai_port}/docs")
+        processes.append(subprocess.Popen([
+            sys.executable, "-m", "bench.gateway", "--port", str(gateway_port),
+            "--openai-url", f"http://127.0.0.1:{openai_port}/v1", "--ner-latency", str(args.ner_latency),
+        ]))
+        _wait_until_ready(f"http://127.0.0.1:{gateway_port}/metrics")
+        yield f"http://127.0.0.1:{gateway_port}"
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=30)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Lasttest für /chat/message")
+    parser.add_argument("--url", help="Basis-URL eines laufenden Gateways")
+    parser.add_argument("--spawn", action="store_true", help="Fake-OpenAI und Gateway lokal starten")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10, help="Anfragen vor der Messung (nicht gewertet)")
+    parser.add_argument("--message", default="Wie lange dauert die Lieferung nach Hamburg?")
+    parser.add_argument("--ttft", type=float, default=0.2, help="Fake-OpenAI: Zeit bis zum ersten Token (--spawn)")
+    parser.add_argument("--token-interval", type=float, default=0.01, help="Fake-OpenAI: Abstand zwischen Tokens (--spawn)")
+    parser.add_argument("--ner-latency", type=float, default=0.02, help="Stub-NER: Dauer pro Nachricht (--spawn)")
+    parser.add_argument("--output", help="Ergebnis als JSON schreiben")
+    parser.add_argument("--baseline", help="Baseline-JSON zum Vergleich")
+    parser.add_argument("--max-regression", type=float, default=0.10)
+    args = parser.parse_args()
+
+    if not args.url and not args.spawn:
+        parser.error("--url oder --spawn angeben")
+
+    config = {
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "message": args.message,
+        "spawned": args.spawn,
+        "ttft": args.ttft if args.spawn else None,
+        "token_interval": args.token_interval if args.spawn else None,
+        "ner_latency": args.ner_latency if args.spawn else None,
+    }
+
+    def measure(url: str) -> Dict:
+        if args.warmup:
+            asyncio.run(run_load(url, args.concurrency, args.warmup, args.message, session_prefix="warmup"))
+        return asyncio.run(run_load(url, args.concurrency, args.requests, args.message))
+
+    if args.spawn:
+        with spawn_stack(args) as url:
+            results = measure(url)
+    else:
+        results = measure(args.url)
+
+    report = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": config,
+        "results": results,
+    }
+    print(
+        f"{results['requests']} requests, {results['errors']} errors, {results['rps']:.1f} req/s | "
+        f"TTFB p50/p95/p99 {results['ttft']['p50'] * 1000:.0f}/{results['ttft']['p95'] * 1000:.0f}/{results['ttft']['p99'] * 1000:.0f} ms | "
+        f"latency p50/p95/p99 {results['latency']['p50'] * 1000:.0f}/{results['latency']['p95'] * 1000:.0f}/{results['latency']['p99'] * 1000:.0f} ms"
+    )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as handle:
+            baseline = json.load(handle)
+        if baseline.get("config") != config:
+            print("Warnung: Baseline wurde mit anderer Konfiguration erstellt.")
+        regressions = compare(results, baseline, args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
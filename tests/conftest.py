@@ -0,0 +1,45 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import fakeredis
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core import db_sqla
+from app.core.answer_cache import AnswerCache
+from app.core.db_sqla import Base
+from tests.helpers import FakeScanner
+
+
+@pytest.fixture
+def chat_db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'chat.db'}")
+    Base.metadata.create_all(bind=engine)
+    TestSession = sessionmaker(bind=engine)
+    with patch("app.routers.chat.SessionLocal", TestSession):
+        yield TestSession
+
+
+@pytest.fixture
+def services():
+    # Erst hier importieren: test_admin setzt ENABLE_ADMIN_BACKEND vor dem ersten Import der App.
+    from app.main import app
+
+    vault = MagicMock()
+    vault.get_status.return_value = "AI"
+    notifier = MagicMock()
+    notifier.notify_escalation = AsyncMock()
+    app.state.vault = vault
+    app.state.scanner = FakeScanner()
+    app.state.notifier = notifier
+    app.state.answer_cache = AnswerCache(fakeredis.FakeRedis(decode_responses=True), enabled=True, version="test")
+    return vault, notifier
+
+
+@pytest.fixture
+def hub(tmp_path):
+    """Datei-DB wie in Produktion angelegt (init_db, inkrementelles Auto-Vacuum)."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'hub.db'}", connect_args={"check_same_thread": False})
+    with patch.object(db_sqla, "engine", engine):
+        db_sqla.init_db()
+    return engine, sessionmaker(bind=engine)
@@ -0,0 +1,66 @@
+"""Gemeinsame Test-Doubles und Fabriken; Fixtures liegen in conftest.py."""
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import fakeredis
+
+from app.core.assistant import AIAssistant
+from app.core.ratelimit import RateLimiter
+from app.core.scanner import NERCache, PIIScanner
+from app.core.vault import PIIVault
+
+
+class FakeAssistant:
+    """Liefert eine feste Antwort als Token-Stream."""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = 0
+        self.threads = set()
+        self.get_thread_history = AsyncMock(return_value=[])
+
+    def has_thread(self, session_id):
+        return session_id in self.threads
+
+    async def seed_thread(self, session_id, prompt, reply):
+        self.threads.add(session_id)
+
+    async def ask_assistant_stream(self, session_id, prompt, run_info=None):
+        self.calls += 1
+        self.threads.add(session_id)
+        for token in self.reply.split(" "):
+            yield token + " "
+        if run_info is not None:
+            run_info["total_tokens"] = 42
+
+
+class FakeScanner:
+    async def clean(self, text):
+        return text
+
+    async def restore_stream(self, token_generator):
+        async for token in token_generator:
+            yield token
+
+
+def make_assistant(base_url):
+    with patch("app.core.assistant.settings.openai_api_key", "test"):
+        assistant = AIAssistant()
+    assistant.client = assistant.client.with_options(base_url=base_url)
+    return assistant
+
+
+def make_limiter(redis=None, **limits):
+    options = dict(session_per_minute=60, session_burst=3, ip_per_minute=600, ip_burst=100)
+    options.update(limits)
+    return RateLimiter(redis or fakeredis.FakeRedis(decode_responses=True), enabled=True, **options)
+
+
+def make_scanner(entities=None, **cache_options):
+    with patch("app.core.scanner.GLiNER") as gliner:
+        gliner.from_pretrained.return_value = MagicMock()
+        scanner = PIIScanner(
+            PIIVault(fakeredis.FakeRedis(decode_responses=True)),
+            ner_cache=NERCache(**cache_options) if cache_options else None,
+        )
+    scanner.model.predict_entities.return_value = entities or []
+    return scanner
@@ -71,3 +71,128 @@ def test_admin_disabled():
         with patch("app.routers.admin.ADMIN_ENABLED", False):
             response = client.get("/admin/sessions")
             assert response.status_code == 403
+
+
+@pytest.fixture
+def export_db(tmp_path):
+    """Echte SQLite-DB für den Export (Streaming nutzt eigene DB-Sessions)."""
+    import datetime
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.core.db_sqla import Base
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'export.db'}")
+    Base.metadata.create_all(bind=engine)
+    TestSession = sessionmaker(bind=engine)
+
+    db = TestSession()
+    db.add(ChatSession(id="sess_a", created_at=datetime.datetime(2024, 1, 1), notes="Notiz"))
+    db.add(ChatSession(id="sess_b", created_at=datetime.datetime(2024, 1, 2)))
+    db.add_all([
+        ChatMessage(session_id="sess_a", role="user", content="Hallo", timestamp=datetime.datetime(2024, 1, 1, 10)),
+        ChatMessage(session_id="sess_a", role="assistant", content="Hi, wie kann ich helfen?", timestamp=datetime.datetime(2024, 1, 1, 10, 1)),
+        ChatMessage(session_id="sess_b", role="user", content="Lieferzeit?", timestamp=datetime.datetime(2024, 1, 2, 9)),
+    ])
+    db.commit()
+    db.close()
+
+    with patch("app.routers.admin.SessionLocal", TestSession):
+        yield TestSession
+
+
+def test_admin_export_csv(export_db):
+    response = client.get("/admin/export")
+    assert response.status_code == 200
+    lines = response.text.strip().splitlines()
+    assert lines[0].startswith("session_id,")
+    assert len(lines) == 4
+    assert response.headers["X-Export-Watermark"] == "3"
+
+
+def test_admin_export_jsonl_incremental(export_db):
+    import json
+
+    response = client.get("/admin/export", params={"format": "jsonl", "after_id": 1})
+    assert response.status_code == 200
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["message_id"] for r in records] == [2, 3]
+    assert records[1]["session_id"] == "sess_b"
+    assert records[0]["session_notes"] == "Notiz"
+
+
+def test_admin_export_gzip_date_range(export_db):
+    import gzip
+    import json
+
+    response = client.get(
+        "/admin/export",
+        params={"format": "jsonl", "compress": "true", "since": "2024-01-02T00:00:00"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/gzip"
+    records = [json.loads(line) for line in gzip.decompress(response.content).decode("utf-8").splitlines()]
+    assert len(records) == 1
+    assert records[0]["content"] == "Lieferzeit?"
+
+
+def test_admin_search_ranked_snippets(tmp_path):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.core.db_sqla import Base
+    from app.core.search import init_search_index
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'search.db'}")
+    Base.metadata.create_all(bind=engine)
+    init_search_index(engine)
+    TestSession = sessionmaker(bind=engine)
+
+    db = TestSession()
+    db.add(ChatSession(id="sess_s"))
+    db.add_all([
+        ChatMessage(session_id="sess_s", role="user", content="Der Drucker zeigt Fehler E42 beim Start"),
+        ChatMessage(session_id="sess_s", role="assistant", content="Fehler E42 bedeutet: Fehler im Papiereinzug, Fehler prüfen"),
+        ChatMessage(session_id="sess_s", role="user", content="Wie lange dauert die Lieferung?"),
+    ])
+    db.commit()
+
+    def override_search_db():
+        yield db
+
+    app.dependency_overrides[get_db] = override_search_db
+    try:
+        response = client.get("/admin/search", params={"q": "fehler e42"})
+        assert response.status_code == 200
+        hits = response.json()
+        assert len(hits) == 2
+        assert "<mark>" in hits[0]["snippet"]
+        assert hits[0]["rank"] <= hits[1]["rank"]
+
+        # Nachrichtentext wird escaped, nur die Treffer-Markierung ist HTML.
+        db.add(ChatMessage(session_id="sess_s", role="user", content='<img src=x onerror="alert(1)"> Papierstau'))
+        db.commit()
+        snippet = client.get("/admin/search", params={"q": "papierstau"}).json()[0]["snippet"]
+        assert snippet == "&lt;img src=x onerror=&quot;alert(1)&quot;&gt; <mark>Papierstau</mark>"
+
+        # Inkrementelle Pflege: neue Nachricht ist sofort auffindbar.
+        db.add(ChatMessage(session_id="sess_s", role="user", content="Lieferung nach Hamburg?"))
+        db.commit()
+        response = client.get("/admin/search", params={"q": "liefer*", "limit": 1, "skip": 1})
+        assert len(response.json()) == 1
+    finally:
+        db.close()
+        app.dependency_overrides[get_db] = override_get_db
+
+
+def test_admin_hand_back_to_ai():
+    import fakeredis
+    from app.core.vault import PIIVault
+
+    app.state.vault = PIIVault(fakeredis.FakeRedis(decode_responses=True))
+    app.state.vault.set_status("sess_123", "HUMAN")
+
+    response = client.post("/admin/sessions/sess_123/status", json={"mode": "AI"})
+    assert response.status_code == 200
+    assert client.get("/admin/sessions/sess_123/status").json() == {"session_id": "sess_123", "mode": "AI"}
+
+    response = client.post("/admin/sessions/sess_123/status", json={"mode": "ROBOT"})
+    assert response.status_code == 422
@@ -0,0 +1,81 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.core.admission import NER_SHED, NERAdmission, NEROverloadedError
+
+
+def test_full_queue_is_shed_immediately():
+    admission = NERAdmission(workers=1, max_queue=1, deadline_seconds=10)
+    release = threading.Event()
+
+    async def scenario():
+        running = [asyncio.create_task(admission.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        before = NER_SHED.value(reason="queue_full")
+        with pytest.raises(NEROverloadedError) as exc:
+            await admission.run(lambda: "never")
+        release.set()
+        await asyncio.gather(*running)
+        return exc.value, NER_SHED.value(reason="queue_full") - before
+
+    error, shed = asyncio.run(scenario())
+    assert error.reason == "queue_full"
+    assert error.retry_after >= 1
+    assert shed == 1
+    assert admission.inflight == 0
+    admission.shutdown()
+
+
+def test_estimated_wait_beyond_deadline_is_shed():
+    admission = NERAdmission(workers=1, max_queue=10, deadline_seconds=0.5, initial_service_seconds=0.3)
+    release = threading.Event()
+
+    async def scenario():
+        first = asyncio.create_task(admission.run(release.wait))
+        await asyncio.sleep(0.05)
+        # Ein Job läuft: Wartezeit 0.3 + eigene Dauer 0.3 > Deadline 0.5
+        with pytest.raises(NEROverloadedError) as exc:
+            await admission.run(lambda: "never")
+        release.set()
+        await first
+        return exc.value
+
+    assert asyncio.run(scenario()).reason == "deadline"
+    admission.shutdown()
+
+
+def test_jobs_expired_in_queue_are_skipped():
+    admission = NERAdmission(workers=1, max_queue=10, deadline_seconds=0.1, initial_service_seconds=0.001)
+    calls = []
+
+    async def scenario():
+        slow = asyncio.create_task(admission.run(lambda: time.sleep(0.3)))
+        await asyncio.sleep(0.01)
+        with pytest.raises(NEROverloadedError):
+            await admission.run(lambda: calls.append("ran"))
+        await slow
+
+    asyncio.run(scenario())
+    assert calls == []
+    admission.shutdown()
+
+
+def test_admission_recovers_after_slow_burst():
+    admission = NERAdmission(workers=1, max_queue=10, deadline_seconds=0.5, initial_service_seconds=0.1)
+
+    async def scenario():
+        for _ in range(3):
+            await admission.run(lambda: time.sleep(0.6))
+        admitted = 0
+        for _ in range(5):
+            await admission.run(lambda: None)
+            admitted += 1
+        return admitted
+
+    # Idle-Executor nimmt trotz hoher Schätzung an; die Schätzung bleibt <= Deadline.
+    assert asyncio.run(scenario()) == 5
+    assert admission.avg_service_seconds <= 0.5
+    admission.shutdown()
@@ -0,0 +1,159 @@
+import asyncio
+import datetime
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.core.analytics import AnalyticsRollupJob, load_stats
+from app.core.db_sqla import ChatMessage, ChatSession, Escalation, StatsRollup, get_db
+from app.core.notifier import TeamsNotifier
+from app.routers.chat import notify_escalation_task
+from app.core.retention import RetentionJob, record_export_watermark
+
+# Älter als die Retention-Frist im Test, aber innerhalb des Stats-Fensters.
+DAY = (datetime.datetime.utcnow() - datetime.timedelta(days=60)).replace(hour=0, minute=0, second=0, microsecond=0)
+DAY_KEY = DAY.strftime("%Y-%m-%d")
+
+
+def add_conversation(session_factory, session_id, start, roles=("user", "assistant", "user", "assistant"), escalate=False):
+    db = session_factory()
+    if db.get(ChatSession, session_id) is None:
+        db.add(ChatSession(id=session_id, created_at=start))
+    for offset, role in enumerate(roles):
+        db.add(ChatMessage(session_id=session_id, role=role, content="Hallo", timestamp=start + datetime.timedelta(minutes=offset)))
+    if escalate:
+        db.add(Escalation(session_id=session_id, created_at=start + datetime.timedelta(minutes=len(roles))))
+    db.commit()
+    db.close()
+
+
+def rollup(session_factory, granularity, bucket, metric):
+    db = session_factory()
+    try:
+        row = db.get(StatsRollup, (granularity, bucket, metric))
+        return row.value if row is not None else 0
+    finally:
+        db.close()
+
+
+def test_rollup_counts_new_rows_once(hub):
+    _, session_factory = hub
+    add_conversation(session_factory, "s1", DAY.replace(hour=9), escalate=True)
+    add_conversation(session_factory, "s2", DAY.replace(hour=14), roles=("user", "assistant"))
+    job = AnalyticsRollupJob(session_factory=session_factory, batch_size=3)
+
+    # 6 Nachrichten, 2 Sessions, 1 Eskalation
+    assert job.run_sync()["processed"] == 9
+    assert job.run_sync()["processed"] == 0
+
+    # Fortsetzung derselben Session zählt nicht als neue Session.
+    add_conversation(session_factory, "s1", DAY.replace(hour=15), roles=("user",))
+    assert job.run_sync()["processed"] == 1
+
+    assert rollup(session_factory, "day", DAY_KEY, "messages_user") == 4
+    assert rollup(session_factory, "day", DAY_KEY, "messages_assistant") == 3
+    assert rollup(session_factory, "day", DAY_KEY, "sessions") == 2
+    assert rollup(session_factory, "hour", f"{DAY_KEY}T09:00", "escalations") == 1
+    assert rollup(session_factory, "total", "all", "messages_user") == 4
+
+
+def test_stats_survive_retention_and_answer_from_rollups(hub):
+    _, session_factory = hub
+    add_conversation(session_factory, "s1", DAY.replace(hour=9), escalate=True)
+    add_conversation(session_factory, "s2", DAY.replace(hour=9), roles=("user", "assistant"))
+    add_conversation(session_factory, "s3", DAY.replace(hour=14) + datetime.timedelta(days=1), roles=("user", "assistant"))
+    analytics = AnalyticsRollupJob(session_factory=session_factory)
+    engine, _ = hub
+    retention = RetentionJob(session_factory=session_factory, engine=engine, batch_pause=0, max_age_days=30, rollups=analytics)
+
+    # Die Retention verdichtet vor dem Löschen: alle Nachrichten sind schon gezählt.
+    assert retention.run_sync()["purged"]["messages"] == 8
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    client = TestClient(app)
+    with patch("app.routers.admin.ADMIN_ENABLED", True), patch.dict(app.dependency_overrides, {get_db: override_get_db}):
+        stats = client.get("/admin/stats", params={"days": 90}).json()
+
+    assert stats["totals"]["messages"] == 8
+    assert stats["totals"]["sessions"] == 3
+    assert stats["totals"]["escalation_rate"] == 0.333
+    assert stats["totals"]["avg_conversation_length"] == 2.667
+    assert stats["window"]["messages_by_role"] == {"user": 4, "assistant": 4}
+    assert [day["sessions"] for day in stats["daily"]] == [2, 1]
+    assert stats["busiest_hours_utc"] == [{"hour": 9, "messages": 6}, {"hour": 14, "messages": 2}]
+
+
+def test_session_is_not_recounted_after_retention_purges_its_history(hub):
+    engine, session_factory = hub
+    # Laufende Session (jünger als die Karenz für leere Sessions)
+    start = datetime.datetime.utcnow() - datetime.timedelta(minutes=10)
+    add_conversation(session_factory, "s1", start)
+    job = AnalyticsRollupJob(session_factory=session_factory)
+    job.run_sync()
+    record_export_watermark(4, session_factory)
+    RetentionJob(session_factory=session_factory, engine=engine, batch_pause=0, after_export=True).run_sync()
+
+    add_conversation(session_factory, "s1", start + datetime.timedelta(minutes=5), roles=("user",))
+    job.run_sync()
+
+    assert rollup(session_factory, "total", "all", "sessions") == 1
+    assert rollup(session_factory, "total", "all", "messages_user") == 3
+
+
+def test_escalations_count_without_teams_webhook(hub):
+    _, session_factory = hub
+    add_conversation(session_factory, "s1", DAY.replace(hour=9), roles=("user",))
+    notifier = TeamsNotifier(webhook_url="", session_factory=session_factory)
+
+    with patch("app.routers.chat.SessionLocal", session_factory):
+        asyncio.run(notify_escalation_task(notifier, "s1", "Hilfe"))
+    AnalyticsRollupJob(session_factory=session_factory).run_sync()
+
+    assert notifier.outbox.counts_sync() == {}
+    assert rollup(session_factory, "total", "all", "escalations") == 1
+
+
+def test_concurrent_workers_do_not_double_count(hub):
+    _, session_factory = hub
+    add_conversation(session_factory, "s1", DAY)
+    first = AnalyticsRollupJob(session_factory=session_factory)
+    second = AnalyticsRollupJob(session_factory=session_factory)
+    second.run_sync()
+    add_conversation(session_factory, "s2", DAY, roles=("user",))
+
+    # Der zweite Worker verschiebt den Watermark, während der erste noch zählt.
+    original = first._count_escalations
+
+    def racing(db, watermark, counts):
+        second.run_sync()
+        return original(db, watermark, counts)
+
+    with patch.object(first, "_count_escalations", racing):
+        assert first.rollup_batch() == 0
+
+    assert rollup(session_factory, "total", "all", "messages_user") == 3
+    assert rollup(session_factory, "total", "all", "sessions") == 2
+
+
+def test_load_stats_reads_bounded_window(hub):
+    _, session_factory = hub
+    for day in range(60):
+        add_conversation(session_factory, f"s{day}", DAY + datetime.timedelta(days=day), roles=("user",))
+    AnalyticsRollupJob(session_factory=session_factory).run_sync()
+
+    db = session_factory()
+    try:
+        stats = load_stats(db, days=7, now=DAY + datetime.timedelta(days=59))
+    finally:
+        db.close()
+    assert [day["date"] for day in stats["daily"]][0] == (DAY + datetime.timedelta(days=53)).strftime("%Y-%m-%d")
+    assert len(stats["daily"]) == 7
+    assert stats["window"]["messages"] == 7
+    assert stats["totals"]["messages"] == 60
@@ -0,0 +1,143 @@
+import json
+import datetime
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from app.main import app
+from app.core import anonymizer, db_sqla
+from app.core.anonymizer import AnonymizationJob, anonymize_texts
+from app.core.db_sqla import Base, ChatMessage, ChatSession, JobState
+
+MESSAGES = [
+    "Ich bin Anna Schmidt aus Berlin",
+    "Mail an anna@example.com",
+    "",
+    "Ruf mich an: 0171 1234567",
+    "Danke!",
+]
+
+
+class FakeModel:
+    """Findet Personen aus einer festen Liste, merkt sich die Batches."""
+
+    def __init__(self, names=("Anna Schmidt",)):
+        self.names = names
+        self.batches = []
+
+    def batch_predict_entities(self, texts, labels, threshold=0.5):
+        self.batches.append(list(texts))
+        results = []
+        for text_ in texts:
+            entities = []
+            for name in self.names:
+                start = text_.find(name)
+                if start != -1:
+                    entities.append({"start": start, "end": start + len(name), "label": "person", "score": 0.9})
+            results.append(entities)
+        return results
+
+
+@pytest.fixture
+def hub_db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'hub.db'}")
+    Base.metadata.create_all(bind=engine)
+    TestSession = sessionmaker(bind=engine)
+    db = TestSession()
+    db.add(ChatSession(id="sess_a", created_at=datetime.datetime(2024, 1, 1), notes="Rückruf an Frau Schmidt"))
+    db.add_all([ChatMessage(session_id="sess_a", role="user", content=content) for content in MESSAGES])
+    db.commit()
+    db.close()
+    return TestSession
+
+
+def anonymized_column(session_factory):
+    db = session_factory()
+    try:
+        return [row.anonymized_content for row in db.query(ChatMessage).order_by(ChatMessage.id)]
+    finally:
+        db.close()
+
+
+def test_anonymize_texts_regex_and_batched_ner():
+    model = FakeModel()
+    result = anonymize_texts(MESSAGES, model, batch_size=2)
+
+    assert result == ["Ich bin <PERSON> aus Berlin", "Mail an <EMAIL>", "", "Ruf mich an: <PHONE>", "Danke!"]
+    # Leere Texte gehen nicht ans Modell; Batches nach Länge sortiert.
+    assert [len(batch) for batch in model.batches] == [2, 2]
+    assert "" not in sum(model.batches, [])
+    assert model.batches[0][0] == "Danke!"
+
+
+def test_job_resumes_from_checkpoint_and_feeds_anonymized_export(hub_db):
+    job = AnonymizationJob(workers=0, chunk_size=2, session_factory=hub_db)
+    model = FakeModel()
+    with patch("app.core.anonymizer._load_model", return_value=model):
+        # Nach dem ersten Chunk anhalten.
+        write = job._write
+
+        def write_and_stop(results):
+            write(results)
+            job.stop()
+
+        with patch.object(job, "_write", write_and_stop):
+            assert job.run()["state"] == "stopped"
+        assert anonymized_column(hub_db) == ["Ich bin <PERSON> aus Berlin", "Mail an <EMAIL>", None, None, None]
+
+        resumed = AnonymizationJob(workers=0, chunk_size=2, session_factory=hub_db)
+        progress = resumed.run()
+
+    assert progress["state"] == "finished"
+    assert progress["processed"] == 5 and progress["total"] == 3
+    assert progress["last_id"] == 5
+    assert anonymized_column(hub_db)[3] == "Ruf mich an: <PHONE>"
+    db = hub_db()
+    assert json.loads(db.get(JobState, "anonymize:column").value)["last_id"] == 5
+    db.close()
+
+    with patch("app.routers.admin.ADMIN_ENABLED", True), patch("app.routers.admin.SessionLocal", hub_db):
+        response = TestClient(app).get("/admin/export", params={"format": "jsonl", "anonymized": "true"})
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert len(records) == 5
+    assert records[0]["content"] == "Ich bin <PERSON> aus Berlin"
+    assert records[0]["session_notes"] is None
+    assert "anna@example.com" not in response.text
+
+
+def test_process_pool_file_target_truncates_unfinished_output(hub_db, tmp_path):
+    output = tmp_path / "anonymized.jsonl"
+    job = AnonymizationJob(target="file", output_path=str(output), workers=2, chunk_size=2, use_ner=False, session_factory=hub_db)
+    assert job.run()["processed"] == 5
+    first_run = output.read_text(encoding="utf-8")
+    assert [json.loads(line)["message_id"] for line in first_run.splitlines()] == [1, 2, 3, 4, 5]
+    assert "<EMAIL>" in first_run and "<PHONE>" in first_run
+
+    # Reste eines abgebrochenen Laufs hinter dem Checkpoint werden verworfen.
+    with output.open("a", encoding="utf-8") as handle:
+        handle.write('{"message_id": 99, "content": "halb')
+    db = hub_db()
+    db.add(ChatMessage(session_id="sess_a", role="assistant", content="Gern, Herr Meier"))
+    db.commit()
+    db.close()
+
+    progress = AnonymizationJob(target="file", output_path=str(output), workers=0, use_ner=False, session_factory=hub_db).run()
+    assert progress["processed"] == 6
+    lines = output.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["message_id"] for line in lines] == [1, 2, 3, 4, 5, 6]
+
+
+def test_init_db_adds_anonymized_column_to_existing_table(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE chat_messages (id INTEGER PRIMARY KEY, session_id VARCHAR, role VARCHAR(50), content TEXT, timestamp DATETIME)"))
+
+    with patch.object(db_sqla, "engine", engine):
+        db_sqla.init_db()
+
+    columns = {column["name"] for column in inspect(engine).get_columns("chat_messages")}
+    assert "anonymized_content" in columns
+    assert "job_state" in inspect(engine).get_table_names()
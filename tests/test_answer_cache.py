@@ -0,0 +1,52 @@
+import asyncio
+
+import fakeredis
+
+from app.core.answer_cache import AnswerCache
+
+
+def make_cache(**kwargs):
+    kwargs.setdefault("version", "v1")
+    return AnswerCache(fakeredis.FakeRedis(decode_responses=True), enabled=True, **kwargs)
+
+
+def test_answer_cache_skips_placeholders_and_escalations():
+    cache = make_cache()
+    assert not cache.put("Ich bin <PERSON_1a2b3c4d>, wo ist mein Paket?", "Hallo!", 1.0)
+    assert not cache.put("Wo ist mein Paket?", "Hallo <PERSON_1a2b3c4d>!", 1.0)
+    assert not cache.put("Kündigung", "ESKALATION_NOETIG", 1.0)
+    assert cache.get("Wo ist mein Paket?") is None
+
+
+def test_answer_cache_lru_eviction():
+    cache = make_cache(max_entries=2)
+    cache.put("Frage A", "Antwort A", 1.0)
+    cache.put("Frage B", "Antwort B", 1.0)
+    cache.get("Frage A")  # A ist jetzt zuletzt benutzt
+    cache.put("Frage C", "Antwort C", 1.0)
+
+    assert cache.get("Frage B") is None
+    assert cache.get("Frage A").answer == "Antwort A"
+    assert cache.get("Frage C").answer == "Antwort C"
+    assert cache.metrics["evictions"] == 1
+
+
+def test_answer_cache_version_and_invalidation():
+    redis_conn = fakeredis.FakeRedis(decode_responses=True)
+    cache_v1 = AnswerCache(redis_conn, enabled=True, version="v1")
+    cache_v1.put("Öffnungszeiten?", "Mo-Fr 8-18 Uhr", 0.5, total_tokens=100)
+
+    cache_v2 = AnswerCache(redis_conn, enabled=True, version="v2")
+    assert cache_v2.get("Öffnungszeiten?") is None
+
+    assert cache_v1.get("  öffnungszeiten ").answer == "Mo-Fr 8-18 Uhr"
+    assert cache_v1.invalidate() == 1
+    assert cache_v1.get("Öffnungszeiten?") is None
+    assert cache_v1.hit_rate() == 0.5
+
+
+def test_answer_cache_replay_preserves_text():
+    async def collect():
+        return "".join([chunk async for chunk in AnswerCache.replay("Mo-Fr  8-18 Uhr.\nDanke!")])
+
+    assert asyncio.run(collect()) == "Mo-Fr  8-18 Uhr.\nDanke!"
@@ -0,0 +1,127 @@
+import asyncio
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.core.db_sqla import ChatMessage
+from tests.helpers import FakeScanner, make_scanner
+
+
+class BatchScanner(FakeScanner):
+    def __init__(self):
+        self.batches = []
+
+    async def clean_batch(self, texts):
+        self.batches.append(list(texts))
+        return [f"anon:{text}" for text in texts]
+
+    def restore(self, text):
+        return text.replace("anon:", "")
+
+
+class ScriptedAssistant:
+    """Antwortet je Prompt; zählt parallele Runs (gesamt und je Session)."""
+
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+        self.active_sessions = set()
+        self.overlapping_session = False
+
+    async def ask_assistant_stream(self, session_id, prompt, run_info=None):
+        if session_id in self.active_sessions:
+            self.overlapping_session = True
+        self.active_sessions.add(session_id)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(0.01)
+            if "kaputt" in prompt:
+                raise RuntimeError("run failed")
+            reply = "Das weiss ich nicht ESKALATION_NOETIG" if "Mensch" in prompt else f"Antwort auf {prompt}"
+            for token in reply.split(" "):
+                yield token + " "
+        finally:
+            self.active -= 1
+            self.active_sessions.discard(session_id)
+
+
+def test_clean_batch_runs_one_ner_call_per_block_and_uses_cache():
+    scanner = make_scanner()
+    scanner.model.batch_predict_entities.side_effect = lambda texts, labels: [
+        [{"start": 6, "end": 10, "label": "person", "score": 0.9}] if text.startswith("Hallo") else [] for text in texts
+    ]
+    texts = ["Hallo Anna, bitte um Rückruf", "Danke", "", "Mail an anna@example.com"]
+
+    cleaned = asyncio.run(scanner.clean_batch(texts))
+    again = asyncio.run(scanner.clean_batch(texts[:2]))
+
+    # Ein Aufruf für alle drei nicht-leeren Texte, kürzeste zuerst; danach aus dem Cache.
+    assert scanner.model.batch_predict_entities.call_count == 1
+    batch_texts = scanner.model.batch_predict_entities.call_args.args[0]
+    assert batch_texts[0] == "Danke" and len(batch_texts) == 3
+    scanner.model.predict_entities.assert_not_called()
+    assert cleaned[0].startswith("Hallo <PERSON_") and cleaned[2] == ""
+    assert "<EMAIL_" in cleaned[3]
+    assert [scanner.restore(text) for text in cleaned] == texts
+    assert again[0] != cleaned[0] and scanner.restore(again[0]) == texts[0]
+
+
+def test_batch_endpoint_reports_per_item_status(chat_db, services):
+    vault, notifier = services
+    vault.get_statuses.side_effect = lambda session_ids: {s: "HUMAN" if s == "s_human" else "AI" for s in session_ids}
+    on_loop = []
+
+    def set_status(session_id, mode):
+        try:
+            on_loop.append(asyncio.get_running_loop() is not None)
+        except RuntimeError:
+            on_loop.append(False)
+
+    vault.set_status.side_effect = set_status
+    app.state.scanner = BatchScanner()
+    app.state.assistant = ScriptedAssistant()
+    items = [
+        {"session_id": "s1", "message": "Frage eins"},
+        {"session_id": "s2", "message": "das ist kaputt"},
+        {"session_id": "s1", "message": "Frage zwei"},
+        {"session_id": "s_human", "message": "Hallo?"},
+        {"session_id": "s3", "message": "Ich will einen Mensch"},
+        {"session_id": "s3", "message": "Noch da?"},
+        {"session_id": "s4", "message": "Frage vier"},
+    ]
+
+    with patch("app.routers.batch.SessionLocal", chat_db), patch("app.routers.batch.settings.batch_enabled", True), \
+            patch("app.routers.batch.settings.batch_concurrency", 2):
+        response = TestClient(app).post("/chat/batch", json={"items": items})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [r["status"] for r in body["results"]] == ["ok", "error", "ok", "human_mode", "escalated", "human_mode", "ok"]
+    assert body["results"][0]["response"] == "Antwort auf Frage eins"
+    assert body["results"][1]["error"] == "run failed"
+    assert body["counts"] == {"ok": 3, "error": 1, "human_mode": 2, "escalated": 1}
+
+    # Eine gebündelte PII-Filterung, begrenzte Parallelität, je Session nacheinander.
+    assert app.state.scanner.batches == [["Frage eins", "das ist kaputt", "Frage zwei", "Ich will einen Mensch", "Noch da?", "Frage vier"]]
+    assert app.state.assistant.max_active == 2
+    assert not app.state.assistant.overlapping_session
+    vault.set_status.assert_called_once_with("s3", "HUMAN")
+    # Redis-Schreibzugriff im Executor, nicht auf dem Event-Loop-Thread.
+    assert on_loop == [False]
+    notifier.notify_escalation.assert_awaited_once()
+
+    db = chat_db()
+    assert db.query(ChatMessage).filter(ChatMessage.role == "user").count() == 7
+    assert db.query(ChatMessage).filter(ChatMessage.role == "assistant").count() == 4
+    db.close()
+
+
+def test_batch_endpoint_limits(services):
+    client = TestClient(app)
+    assert client.post("/chat/batch", json={"items": []}).status_code == 403
+
+    with patch("app.routers.batch.settings.batch_enabled", True), patch("app.routers.batch.settings.batch_max_items", 2):
+        items = [{"session_id": "s", "message": "x"}] * 3
+        assert client.post("/chat/batch", json={"items": items}).status_code == 413
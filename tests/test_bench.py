@@ -0,0 +1,39 @@
+import asyncio
+
+from bench.fake_openai import FakeOpenAIConfig, serve_in_thread
+from bench.load import compare, percentile, summarize
+from tests.helpers import make_assistant
+
+
+def test_assistant_streams_from_fake_server():
+    config = FakeOpenAIConfig(reply="Hallo <PERSON_1a2b3c4d>, gerne!", ttft_seconds=0.01, token_interval_seconds=0)
+
+    async def scenario(base_url):
+        assistant = make_assistant(base_url)
+        run_info = {}
+        tokens = [token async for token in assistant.ask_assistant_stream("sess_b", "Hallo", run_info=run_info)]
+        return tokens, run_info, assistant
+
+    with serve_in_thread(config) as base_url:
+        tokens, run_info, assistant = asyncio.run(scenario(base_url))
+
+    assert "".join(tokens) == config.reply
+    assert len(tokens) == 3
+    assert run_info["run_id"].startswith("run_")
+    assert run_info["prompt_tokens"] == config.prompt_tokens
+    assert assistant.has_thread("sess_b")
+
+
+def test_percentiles_and_regression_gate():
+    values = [0.1 * i for i in range(1, 101)]
+    assert abs(percentile(values, 50) - 5.05) < 1e-9
+    assert abs(percentile(values, 99) - 9.901) < 1e-9
+
+    baseline = {"results": summarize([0.1] * 10, [0.5] * 10, 0, 1.0)}
+    same = summarize([0.1] * 10, [0.5] * 10, 0, 1.0)
+    slower = summarize([0.2] * 10, [0.5] * 10, 0, 2.0)
+
+    assert compare(same, baseline, 0.1) == []
+    regressions = compare(slower, baseline, 0.1)
+    assert any(r.startswith("rps") for r in regressions)
+    assert any(r.startswith("ttft.p95") for r in regressions)
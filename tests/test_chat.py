@@ -0,0 +1,112 @@
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+
+from app.main import app
+from app.core.admission import NEROverloadedError
+from app.core.db_sqla import ChatMessage
+from tests.helpers import FakeAssistant, FakeScanner
+
+
+def test_chat_escalation_uses_local_history(chat_db, services):
+    vault, notifier = services
+    app.state.assistant = FakeAssistant("Das weiss ich nicht ESKALATION_NOETIG")
+
+    client = TestClient(app)
+    response = client.post("/chat/message", json={"session_id": "sess_esc", "message": "Ich brauche Hilfe"})
+
+    assert response.status_code == 200
+    assert "ESKALATION_NOETIG" not in response.text
+    assert "Eskalation ausgelöst" in response.text
+    vault.set_status.assert_called_once_with("sess_esc", "HUMAN")
+
+    # Verlauf kommt aus der lokalen DB, nicht aus der OpenAI Thread-API.
+    app.state.assistant.get_thread_history.assert_not_called()
+    notifier.notify_escalation.assert_awaited_once()
+    history = notifier.notify_escalation.await_args.kwargs["chat_history"]
+    assert history[0] == "User: Ich brauche Hilfe"
+    assert history[1].startswith("Assistant: Das weiss ich nicht")
+
+
+def test_chat_human_mode_short_circuit(chat_db, services):
+    vault, notifier = services
+    vault.get_status.return_value = "HUMAN"
+    app.state.assistant = FakeAssistant("unused")
+
+    client = TestClient(app)
+    response = client.post("/chat/message", json={"session_id": "sess_h", "message": "Hallo?"})
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "HUMAN_MODE"
+
+    db = chat_db()
+    assert db.query(ChatMessage).filter(ChatMessage.session_id == "sess_h").count() == 1
+    db.close()
+
+
+def test_chat_answer_cache_replays_first_turn(chat_db, services):
+    assistant = FakeAssistant("Die Lieferzeit beträgt 2-3 Werktage.")
+    app.state.assistant = assistant
+    client = TestClient(app)
+
+    first = client.post("/chat/message", json={"session_id": "sess_c1", "message": "Wie lange dauert die Lieferung?"})
+    second = client.post("/chat/message", json={"session_id": "sess_c2", "message": "wie lange dauert die  Lieferung"})
+
+    assert first.text == second.text
+    assert assistant.calls == 1
+    # Cache-Treffer wird im Thread nachgetragen, Folgefragen gehen an den Assistant.
+    assert assistant.has_thread("sess_c2")
+    metrics = app.state.answer_cache.metrics
+    assert metrics["hits"] == 1
+    assert metrics["saved_tokens"] == 42
+
+    client.post("/chat/message", json={"session_id": "sess_c2", "message": "Wie lange dauert die Lieferung?"})
+    assert assistant.calls == 2
+
+
+def test_metrics_endpoint_records_stages_without_content(chat_db, services):
+    app.state.assistant = FakeAssistant("Gerne helfe ich Ihnen.")
+    client = TestClient(app)
+    client.post("/chat/message", json={"session_id": "sess_m", "message": "Geheime Frage von Anna"})
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    body = response.text
+    assert 'chat_stage_duration_seconds_count{stage="db_save_user"}' in body
+    assert 'chat_stage_duration_seconds_count{stage="db_save_bot"}' in body
+    assert "chat_ttfb_seconds_count" in body
+    assert "chat_inflight_streams 0" in body
+    assert "Anna" not in body and "sess_m" not in body
+
+
+class OverloadedScanner(FakeScanner):
+    async def clean(self, text):
+        exc = NEROverloadedError("queue_full", retry_after=3)
+        exc.regex_only_text = "Bitte rufen Sie <PHONE_1234abcd> an"
+        raise exc
+
+
+def test_chat_ner_overload_returns_503_with_retry_after(chat_db, services):
+    app.state.scanner = OverloadedScanner()
+    app.state.assistant = FakeAssistant("unused")
+
+    response = TestClient(app).post("/chat/message", json={"session_id": "sess_o", "message": "Hallo"})
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "3"
+    assert app.state.assistant.calls == 0
+
+
+def test_chat_ner_overload_degrades_to_escalation(chat_db, services):
+    vault, notifier = services
+    app.state.scanner = OverloadedScanner()
+    app.state.assistant = FakeAssistant("unused")
+
+    with patch("app.routers.chat.settings.ner_overload_mode", "degrade"):
+        response = TestClient(app).post("/chat/message", json={"session_id": "sess_d", "message": "Bitte rufen Sie 0170 1234567 an"})
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "ESCALATION_NEEDED"
+    # Ohne vollständige Anonymisierung geht nichts an den Assistant.
+    assert app.state.assistant.calls == 0
+    vault.set_status.assert_called_once_with("sess_d", "HUMAN")
+    notifier.notify_escalation.assert_awaited_once()
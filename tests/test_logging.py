@@ -0,0 +1,107 @@
+import sys
+import json
+import queue
+import hashlib
+import logging
+from unittest.mock import patch
+
+from app.core import logging_setup
+from app.core.logging_setup import JsonFormatter, SamplingFilter, _RecordQueueHandler, parse_sample_rates, redact
+
+
+def make_record(name, level=logging.INFO, msg="hello %s", args=("world",), **extra):
+    record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_redact_hides_content_but_keeps_correlation():
+    first = redact("Peter Müller, peter@example.com")
+    assert "Peter" not in first and "example" not in first
+    assert first.startswith("<redacted len=31 hmac=")
+    assert redact("Peter Müller, peter@example.com") == first
+
+    with patch("app.core.logging_setup.settings.log_redact_content", False):
+        assert redact("Hallo") == "Hallo"
+
+
+def test_redact_is_keyed():
+    # Ohne den Schlüssel lässt sich ein kurzer Inhalt nicht über einen einfachen Hash zuordnen.
+    with patch("app.core.logging_setup.settings.log_redact_secret", "schluessel-a"):
+        first = redact("Anna")
+    with patch("app.core.logging_setup.settings.log_redact_secret", "schluessel-b"):
+        second = redact("Anna")
+    assert first != second
+    assert hashlib.sha256(b"Anna").hexdigest()[:12] not in first
+
+
+def test_setup_logging_is_idempotent_and_stoppable(tmp_path):
+    root = logging.getLogger()
+    previous_handlers, previous_level = list(root.handlers), root.level
+    with patch("app.core.logging_setup.settings.log_file", str(tmp_path / "app.log")):
+        listener = logging_setup.setup_logging()
+        try:
+            assert logging_setup.setup_logging() is listener
+            assert sum(isinstance(h, _RecordQueueHandler) for h in logging.getLogger().handlers) == 1
+        finally:
+            logging_setup.shutdown_logging()
+    assert listener._thread is None
+    assert not any(isinstance(h, _RecordQueueHandler) for h in logging.getLogger().handlers)
+    logging.getLogger("app.test").warning("nach dem Shutdown")
+    assert "nach dem Shutdown" in (tmp_path / "app.log").read_text(encoding="utf-8")
+
+    for handler in root.handlers:
+        handler.close()
+    root.handlers, root.level = previous_handlers, previous_level
+
+
+def test_json_formatter_includes_extras():
+    line = JsonFormatter().format(make_record("app.core.scanner", trace_id="abc123"))
+    entry = json.loads(line)
+    assert entry["message"] == "hello world"
+    assert entry["logger"] == "app.core.scanner"
+    assert entry["level"] == "INFO"
+    assert entry["trace_id"] == "abc123"
+
+
+def test_sampling_filter_drops_info_but_never_warnings():
+    sampler = SamplingFilter(parse_sample_rates("httpx=0, app.core=1.0"))
+    assert not sampler.filter(make_record("httpx"))
+    assert not sampler.filter(make_record("httpx._client"))
+    assert sampler.filter(make_record("httpx", level=logging.WARNING))
+    assert sampler.filter(make_record("app.core.scanner"))
+    assert sampler.filter(make_record("uvicorn.access"))
+
+
+def test_queue_handler_keeps_message_unformatted():
+    log_queue = queue.SimpleQueue()
+    handler = _RecordQueueHandler(log_queue)
+    try:
+        raise ValueError("kaputt")
+    except ValueError:
+        record = logging.LogRecord("app.core.lifecycle", logging.ERROR, __file__, 1, "drain %s", ("failed",), sys.exc_info())
+    handler.handle(record)
+
+    queued = log_queue.get_nowait()
+    assert queued.getMessage() == "drain failed"
+    entry = json.loads(JsonFormatter().format(queued))
+    assert entry["message"] == "drain failed"
+    assert "ValueError: kaputt" in entry["exc_info"]
+    assert "ValueError: kaputt" in logging.Formatter("%(message)s").format(queued)
+
+
+def test_failed_message_save_logs_no_content(tmp_path, caplog):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.routers.chat import save_user_message_sync
+
+    from app.core.db_sqla import ChatSession
+
+    # Nur die Session-Tabelle: der Insert der Nachricht scheitert mit OperationalError.
+    engine = create_engine(f"sqlite:///{tmp_path / 'partial.db'}")
+    ChatSession.__table__.create(bind=engine)
+    with patch("app.routers.chat.SessionLocal", sessionmaker(bind=engine)), caplog.at_level(logging.ERROR):
+        save_user_message_sync("sess_log", "Max Mustermann, IBAN DE89370400440532013000")
+
+    assert "OperationalError" in caplog.text
+    assert "Mustermann" not in caplog.text and "sess_log" in caplog.text
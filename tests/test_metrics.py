@@ -0,0 +1,60 @@
+import threading
+
+import pytest
+
+from app.core.metrics import Counter, Gauge, Histogram, Registry, DictCollector, QueueDepthExecutor, ValueCollector, _Metric
+
+
+def test_prometheus_text_format():
+    registry = Registry()
+    requests = registry.register(Counter("demo_requests_total", "Demo.", ["stage"]))
+    inflight = registry.register(Gauge("demo_inflight", "Demo."))
+    latency = registry.register(Histogram("demo_seconds", "Demo.", buckets=(0.1, 1.0)))
+    registry.register(DictCollector("demo_cache_total", "Demo.", "event", lambda: {"hits": 3, "saved_tokens": 9}, keys=("hits",)))
+    registry.register(ValueCollector("demo_saved_tokens_total", "Demo.", lambda: 9))
+
+    requests.inc(stage="pii_ner")
+    requests.inc(2, stage="pii_ner")
+    inflight.inc()
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5)
+
+    output = registry.render()
+    assert "# TYPE demo_requests_total counter" in output
+    assert 'demo_requests_total{stage="pii_ner"} 3' in output
+    assert "demo_inflight 1" in output
+    assert 'demo_seconds_bucket{le="0.1"} 1' in output
+    assert 'demo_seconds_bucket{le="1.0"} 2' in output
+    assert 'demo_seconds_bucket{le="+Inf"} 3' in output
+    assert "demo_seconds_count 3" in output
+    assert 'demo_cache_total{event="hits"} 3' in output
+    assert "saved_tokens" not in output.split("demo_saved_tokens_total")[0]
+    assert "demo_saved_tokens_total 9" in output
+
+
+def test_labels_are_validated():
+    counter = Counter("demo_errors_total", "Demo.", ["stage"])
+    with pytest.raises(ValueError):
+        counter.inc(message="Hallo Anna")
+
+
+def test_metric_base_is_abstract():
+    with pytest.raises(TypeError):
+        _Metric("demo", "Demo.")
+
+
+def test_executor_counts_queued_jobs():
+    executor = QueueDepthExecutor(max_workers=1)
+    started, release = threading.Event(), threading.Event()
+    running = executor.submit(lambda: started.set() or release.wait())
+    started.wait(1)
+    queued = [executor.submit(lambda: None) for _ in range(3)]
+    assert executor.queue_depth() == 3
+
+    queued[0].cancel()
+    assert executor.queue_depth() == 2
+    release.set()
+    executor.shutdown(wait=True)
+    assert running.result() is True
+    assert executor.queue_depth() == 0
@@ -0,0 +1,138 @@
+import json
+import asyncio
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.db_sqla import Base, OutboxEntry
+from app.core.notifier import TeamsNotifier
+
+
+class WebhookStub:
+    """Lokaler Ersatz für den Teams-Webhook: antwortet mit vorgegebenen Statuscodes.
+
+    `peak_in_flight` hält fest, wie viele Zustellungen maximal gleichzeitig liefen.
+    """
+
+    def __init__(self, statuses, delay=0.0):
+        self.statuses = list(statuses)
+        self.received = []
+        self.delay = delay
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                with stub.lock:
+                    stub.in_flight += 1
+                    stub.peak_in_flight = max(stub.peak_in_flight, stub.in_flight)
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                stub.received.append(json.loads(body))
+                time.sleep(stub.delay)
+                status = stub.statuses.pop(0) if stub.statuses else 200
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                with stub.lock:
+                    stub.in_flight -= 1
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/webhook"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def outbox_db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'outbox.db'}")
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+
+def make_notifier(url, session_factory, **options):
+    options.setdefault("backoff_base", 0)
+    options.setdefault("rate_per_second", 0)
+    return TeamsNotifier(webhook_url=url, session_factory=session_factory, **options)
+
+
+def test_outbox_retries_until_delivered(outbox_db):
+    async def scenario(url):
+        notifier = make_notifier(url, outbox_db)
+        await notifier.notify_escalation("sess_1", ["User: Hilfe"])
+        for _ in range(3):
+            await notifier.outbox.dispatch_due()
+        await notifier.stop()
+        return notifier
+
+    with WebhookStub([500, 503, 200]) as stub:
+        notifier = asyncio.run(scenario(stub.url))
+
+    assert len(stub.received) == 3
+    assert "Session ID: sess_1" in json.dumps(stub.received[-1])
+    assert notifier.outbox.counts_sync() == {"DELIVERED": 1}
+    assert notifier.outbox.metrics["delivered"] == 1
+    db = outbox_db()
+    # Der Verlauf bleibt nach der Zustellung nicht in der Outbox liegen.
+    assert [entry.payload for entry in db.query(OutboxEntry)] == ["{}"]
+    db.close()
+    assert notifier.outbox.metrics["failed_attempts"] == 2
+
+
+def test_outbox_dead_letter_and_requeue(outbox_db):
+    async def scenario(url):
+        notifier = make_notifier(url, outbox_db, max_attempts=2)
+        await notifier.notify_escalation("sess_2", ["User: Hilfe"])
+        for _ in range(3):
+            await notifier.outbox.dispatch_due()
+        return notifier
+
+    with WebhookStub([500, 500, 200]) as stub:
+        notifier = asyncio.run(scenario(stub.url))
+        assert notifier.outbox.counts_sync() == {"DEAD": 1}
+        assert notifier.outbox.metrics["dead_lettered"] == 1
+
+        dead = notifier.outbox.dead_letters_sync()
+        assert dead[0].session_id == "sess_2"
+        assert "500" in dead[0].last_error
+
+        assert notifier.outbox.requeue_sync(dead[0].id)
+        asyncio.run(notifier.outbox.dispatch_due())
+
+    assert notifier.outbox.counts_sync() == {"DELIVERED": 1}
+
+
+def test_outbox_background_dispatcher_bounded_concurrency(outbox_db):
+    async def scenario(url):
+        notifier = make_notifier(url, outbox_db, max_concurrency=2, rate_per_second=50)
+        notifier.start()
+        for i in range(5):
+            await notifier.notify_escalation(f"sess_{i}", ["User: Hilfe"])
+        for _ in range(100):
+            if notifier.outbox.metrics["delivered"] == 5:
+                break
+            await asyncio.sleep(0.05)
+        await notifier.stop()
+        return notifier
+
+    with WebhookStub([], delay=0.1) as stub:
+        notifier = asyncio.run(scenario(stub.url))
+
+    assert len(stub.received) == 5
+    assert notifier.outbox.counts_sync() == {"DELIVERED": 5}
+    assert 1 < stub.peak_in_flight <= 2
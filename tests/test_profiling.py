@@ -0,0 +1,85 @@
+import importlib.util
+import threading
+import time
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import profiling
+from app.routers import admin
+
+
+def busy_loop(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sample_stacks_returns_folded_stacks_of_other_threads():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,), name="busy-worker")
+    worker.start()
+    try:
+        samples = profiling.sample_stacks(0.2, interval=0.005)
+    finally:
+        stop.set()
+        worker.join()
+
+    busy = [stack for stack in samples if stack.startswith("busy-worker;")]
+    assert busy and any("busy_loop (" in stack for stack in busy)
+    assert not any("sample_stacks" in stack for stack in samples)
+
+    lines = profiling.render_folded(samples).splitlines()
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) >= 1
+
+
+def test_tracemalloc_diff_reports_growth_during_window():
+    retained = []
+
+    def allocate():
+        time.sleep(0.05)
+        retained.extend(bytearray(1024) for _ in range(500))
+
+    thread = threading.Thread(target=allocate)
+    thread.start()
+    report = profiling.tracemalloc_diff(0.3, top=5)
+    thread.join()
+
+    assert report.startswith("# tracemalloc diff")
+    assert "test_profiling.py" in report
+
+
+def load_admin_router(**env):
+    # Eigene Modulinstanz, damit das Import-Flag ausgewertet wird.
+    with patch.dict("os.environ", env):
+        spec = importlib.util.spec_from_file_location("admin_with_profiling", "app/routers/admin.py")
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    return module
+
+
+def test_profiling_routes_are_not_registered_by_default():
+    assert not admin.PROFILING_ENABLED
+    assert not any(route.path.startswith("/admin/profile") for route in admin.router.routes)
+
+    module = load_admin_router(ENABLE_ADMIN_BACKEND="true", ENABLE_PROFILING="false")
+    assert not any(route.path.startswith("/admin/profile") for route in module.router.routes)
+
+
+def test_profile_endpoints_when_enabled():
+    module = load_admin_router(ENABLE_ADMIN_BACKEND="true", ENABLE_PROFILING="true")
+    profiled = FastAPI()
+    profiled.include_router(module.router)
+    client = TestClient(profiled)
+
+    cpu = client.get("/admin/profile/cpu", params={"seconds": 0.1, "interval_ms": 5})
+    assert cpu.status_code == 200
+    assert cpu.headers["content-disposition"] == "attachment; filename=profile.folded"
+    assert cpu.text.strip()
+
+    memory = client.get("/admin/profile/memory", params={"seconds": 0.1})
+    assert memory.status_code == 200
+    assert memory.text.startswith("# tracemalloc diff")
+
+    assert client.get("/admin/profile/cpu", params={"seconds": 600}).status_code == 422
@@ -0,0 +1,100 @@
+import time
+from unittest.mock import MagicMock, patch
+
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.core.db_sqla import ChatMessage
+from app.core.ratelimit import RATE_LIMIT_ERRORS, RATE_LIMITED, client_ip
+from tests.helpers import FakeAssistant, make_limiter
+
+
+def test_session_bucket_allows_burst_then_limits():
+    limiter = make_limiter()
+    limited_before = RATE_LIMITED.value(scope="session")
+
+    assert all(limiter.check("sess_a", "10.0.0.1").allowed for _ in range(3))
+    decision = limiter.check("sess_a", "10.0.0.1")
+
+    assert not decision.allowed
+    assert decision.scope == "session"
+    assert decision.retry_after == 1
+    # Andere Sessions derselben IP sind nicht betroffen.
+    assert limiter.check("sess_b", "10.0.0.1").allowed
+    assert RATE_LIMITED.value(scope="session") - limited_before == 1
+
+
+def test_bucket_refills_over_time():
+    limiter = make_limiter(session_per_minute=6000, session_burst=1)
+
+    assert limiter.check("sess_a", "10.0.0.1").allowed
+    assert not limiter.check("sess_a", "10.0.0.1").allowed
+    time.sleep(0.05)
+    assert limiter.check("sess_a", "10.0.0.1").allowed
+
+
+def test_ip_bucket_catches_rotating_sessions_and_is_shared_across_workers():
+    server = fakeredis.FakeServer()
+    # Zwei Worker mit eigenem Client auf denselben Redis.
+    workers = [make_limiter(fakeredis.FakeRedis(server=server, decode_responses=True), ip_burst=4) for _ in range(2)]
+
+    results = [workers[i % 2].check(f"sess_{i}", "10.0.0.9") for i in range(6)]
+
+    assert [r.allowed for r in results] == [True] * 4 + [False] * 2
+    assert results[-1].scope == "ip"
+    assert workers[0].check("sess_x", "10.0.0.10").allowed
+
+
+def test_rejected_request_does_not_consume_other_bucket():
+    redis = fakeredis.FakeRedis(decode_responses=True)
+    limiter = make_limiter(redis, session_burst=2, ip_burst=1)
+
+    assert limiter.check("sess_a", "10.0.0.1").allowed
+    assert limiter.check("sess_a", "10.0.0.1").scope == "ip"
+    # Die Session hat nur für die erlaubte Anfrage bezahlt.
+    assert float(redis.hget("ratelimit:session:sess_a", "tokens")) == pytest.approx(1, abs=0.01)
+
+
+def test_redis_failure_fails_open():
+    redis = MagicMock()
+    redis.register_script.return_value.side_effect = ConnectionError("redis down")
+    limiter = make_limiter(redis)
+    errors_before = RATE_LIMIT_ERRORS.value()
+
+    assert limiter.check("sess_a", "10.0.0.1").allowed
+    assert RATE_LIMIT_ERRORS.value() - errors_before == 1
+
+
+def test_chat_returns_429_with_retry_after(chat_db, services):
+    app.state.assistant = FakeAssistant("Gerne helfe ich Ihnen.")
+    app.state.rate_limiter = make_limiter(session_burst=1)
+    try:
+        client = TestClient(app)
+        first = client.post("/chat/message", json={"session_id": "sess_rl", "message": "Hallo"})
+        second = client.post("/chat/message", json={"session_id": "sess_rl", "message": "Hallo"})
+    finally:
+        del app.state.rate_limiter
+
+    assert first.status_code == 200
+    assert second.status_code == 429
+    assert second.headers["Retry-After"] == "1"
+    assert app.state.assistant.calls == 1
+    # Abgewiesene Anfragen erreichen weder DB noch NER.
+    db = chat_db()
+    assert db.query(ChatMessage).filter(ChatMessage.role == "user").count() == 1
+    db.close()
+
+
+def test_client_ip_ignores_spoofed_forwarded_entries():
+    def request(forwarded):
+        return MagicMock(headers={"x-forwarded-for": forwarded}, client=MagicMock(host="10.0.0.1"))
+
+    with patch("app.core.ratelimit.settings.rate_limit_trust_forwarded_for", True):
+        # Der Client setzt den linken Eintrag selbst; der Proxy hängt die echte IP an.
+        assert client_ip(request("1.2.3.4, 203.0.113.7")) == "203.0.113.7"
+        assert client_ip(request("5.6.7.8, 203.0.113.7")) == "203.0.113.7"
+        with patch("app.core.ratelimit.settings.rate_limit_trusted_proxy_hops", 2):
+            assert client_ip(request("1.2.3.4, 203.0.113.7, 10.0.0.2")) == "203.0.113.7"
+    assert client_ip(request("1.2.3.4")) == "10.0.0.1"
@@ -0,0 +1,184 @@
+import os
+import datetime
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.main import app
+from app.core import db_sqla
+from app.core.db_sqla import ChatMessage, ChatSession, Escalation, OutboxEntry
+from app.core.retention import RETENTION_PURGED, RetentionJob, record_export_watermark
+from app.core.search import search_messages
+
+NOW = datetime.datetime.utcnow()
+
+
+def add_session(session_factory, session_id, age_days, messages=3, content="Hallo"):
+    stamp = NOW - datetime.timedelta(days=age_days)
+    db = session_factory()
+    db.add(ChatSession(id=session_id, created_at=stamp))
+    db.add_all([ChatMessage(session_id=session_id, role="user", content=content, timestamp=stamp) for _ in range(messages)])
+    db.commit()
+    db.close()
+
+
+def remaining(session_factory):
+    db = session_factory()
+    try:
+        sessions = {s.id: len(s.messages) for s in db.query(ChatSession)}
+        return sessions, db.query(ChatMessage).count()
+    finally:
+        db.close()
+
+
+def make_job(hub, **policies):
+    engine, session_factory = hub
+    return RetentionJob(session_factory=session_factory, engine=engine, batch_size=2, batch_pause=0, **policies)
+
+
+def test_age_policy_deletes_sessions_with_messages_in_batches(hub):
+    _, session_factory = hub
+    add_session(session_factory, "old_a", age_days=40, messages=5)
+    add_session(session_factory, "old_b", age_days=35)
+    add_session(session_factory, "recent", age_days=1)
+    purged_before = RETENTION_PURGED.value(table="chat_messages")
+
+    result = make_job(hub, max_age_days=30).run_sync()
+
+    assert result["purged"] == {"messages": 8, "sessions": 2, "notifications": 0, "escalations": 0}
+    assert remaining(session_factory) == ({"recent": 3}, 3)
+    assert RETENTION_PURGED.value(table="chat_messages") - purged_before == 8
+
+
+def test_purged_sessions_take_their_notifications_and_escalations(hub):
+    _, session_factory = hub
+    add_session(session_factory, "old", age_days=40)
+    add_session(session_factory, "exported", age_days=0)
+    add_session(session_factory, "recent", age_days=1)
+    db = session_factory()
+    stamp = NOW - datetime.timedelta(days=1)
+    for session_id, status in [("old", "DELIVERED"), ("old", "DEAD"), ("old", "PENDING"), ("exported", "DELIVERED"), ("recent", "DELIVERED")]:
+        db.add(OutboxEntry(session_id=session_id, payload='{"text": "Verlauf"}', status=status, created_at=stamp))
+    # Ältere Benachrichtigung einer noch aktiven Session fällt unter die Altersgrenze.
+    db.add(OutboxEntry(session_id="recent", payload="{}", status="DELIVERED", created_at=NOW - datetime.timedelta(days=40)))
+    db.add_all([Escalation(session_id="old"), Escalation(session_id="recent")])
+    db.commit()
+    db.close()
+    record_export_watermark(6, session_factory)
+
+    with patch("app.core.retention.EMPTY_SESSION_GRACE", datetime.timedelta(0)):
+        result = make_job(hub, max_age_days=30, after_export=True).run_sync()
+
+    assert result["purged"]["notifications"] == 4
+    assert result["purged"]["escalations"] == 1
+    db = session_factory()
+    left = sorted((e.session_id, e.status) for e in db.query(OutboxEntry))
+    escalated = [e.session_id for e in db.query(Escalation)]
+    db.close()
+    # Ausstehende Zustellungen bleiben, bis sie zugestellt oder zu alt sind.
+    assert left == [("old", "PENDING"), ("recent", "DELIVERED")]
+    assert escalated == ["recent"]
+
+
+def test_session_overflow_keeps_newest_messages(hub):
+    _, session_factory = hub
+    add_session(session_factory, "long", age_days=0, messages=7)
+    add_session(session_factory, "short", age_days=0, messages=2)
+
+    make_job(hub, max_messages_per_session=3).run_sync()
+
+    db = session_factory()
+    kept = [m.id for m in db.query(ChatMessage).filter(ChatMessage.session_id == "long").order_by(ChatMessage.id)]
+    db.close()
+    assert kept == [5, 6, 7]
+    assert remaining(session_factory)[0] == {"long": 3, "short": 2}
+
+
+def test_after_export_purges_only_exported_messages(hub):
+    _, session_factory = hub
+    add_session(session_factory, "sess_a", age_days=0)
+
+    client = TestClient(app)
+    with patch("app.routers.admin.ADMIN_ENABLED", True), patch("app.routers.admin.SessionLocal", session_factory):
+        # Gefilterte Exporte zählen nicht als vollständig.
+        client.get("/admin/export", params={"since": "2000-01-01T00:00:00"})
+        assert make_job(hub, after_export=True).run_sync()["purged"]["messages"] == 0
+
+        assert client.get("/admin/export").headers["X-Export-Watermark"] == "3"
+    add_session(session_factory, "sess_b", age_days=0, messages=2)
+
+    make_job(hub, after_export=True).run_sync()
+
+    assert remaining(session_factory)[1] == 2
+
+
+def test_purged_ids_are_not_reused(hub):
+    _, session_factory = hub
+    add_session(session_factory, "sess_a", age_days=0)
+    with patch("app.routers.admin.ADMIN_ENABLED", True), patch("app.routers.admin.SessionLocal", session_factory):
+        assert TestClient(app).get("/admin/export").headers["X-Export-Watermark"] == "3"
+    make_job(hub, after_export=True).run_sync()
+    assert remaining(session_factory)[1] == 0
+
+    # Neue Nachricht nach vollständiger Löschung: ID oberhalb der Watermark, bleibt stehen.
+    add_session(session_factory, "sess_b", age_days=0, messages=1)
+    make_job(hub, after_export=True).run_sync()
+
+    db = session_factory()
+    assert [m.id for m in db.query(ChatMessage)] == [4]
+    db.close()
+
+
+def test_init_db_migrates_messages_table_to_autoincrement(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        # Schema vor AUTOINCREMENT (wie von create_all() ohne sqlite_autoincrement angelegt)
+        conn.exec_driver_sql("CREATE TABLE chat_sessions (id VARCHAR NOT NULL PRIMARY KEY, created_at DATETIME NOT NULL, notes TEXT)")
+        conn.exec_driver_sql(
+            "CREATE TABLE chat_messages (id INTEGER NOT NULL PRIMARY KEY, session_id VARCHAR NOT NULL REFERENCES chat_sessions(id), "
+            "role VARCHAR(50) NOT NULL, content TEXT NOT NULL, timestamp DATETIME NOT NULL)"
+        )
+        conn.exec_driver_sql("INSERT INTO chat_sessions (id, created_at) VALUES ('alt', '2024-01-01 00:00:00')")
+        conn.exec_driver_sql(
+            "INSERT INTO chat_messages (id, session_id, role, content, timestamp) VALUES (1, 'alt', 'user', 'Rechnung offen', '2024-01-01 00:00:00')"
+        )
+        conn.exec_driver_sql("CREATE TABLE job_state (name VARCHAR PRIMARY KEY, value TEXT, updated_at DATETIME)")
+        conn.exec_driver_sql("""INSERT INTO job_state (name, value) VALUES ('export', '{"watermark": 7}')""")
+        # Keine IDs: Byte-Offset, Zähler und Vacuum-Statistik dürfen die Sequenz nicht setzen.
+        conn.exec_driver_sql("""INSERT INTO job_state (name, value) VALUES ('anonymize:file:/tmp/a.jsonl', '{"last_id": 5, "offset": 734003200, "processed": 900}')""")
+        conn.exec_driver_sql("""INSERT INTO job_state (name, value) VALUES ('retention', '{"vacuumed_pages": 4096}')""")
+
+    with patch.object(db_sqla, "engine", engine):
+        db_sqla.init_db()
+        db_sqla.init_db()
+
+    session_factory = sessionmaker(bind=engine)
+    add_session(session_factory, "neu", age_days=0, messages=1, content="Rechnung bezahlt")
+    db = session_factory()
+    assert [(m.id, m.content) for m in db.query(ChatMessage).order_by(ChatMessage.id)] == [(1, "Rechnung offen"), (8, "Rechnung bezahlt")]
+    assert len(search_messages(db, "Rechnung")) == 2
+    db.close()
+
+
+def test_incremental_vacuum_shrinks_file(hub):
+    engine, session_factory = hub
+    path = engine.url.database
+    add_session(session_factory, "big", age_days=90, messages=400, content="x" * 2000)
+    size_before = os.path.getsize(path)
+
+    job = make_job(hub, max_age_days=30)
+    job.purge_expired_sessions()
+    with engine.connect() as conn:
+        free_pages = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+    assert free_pages > 100
+
+    # Ein PRAGMA-Aufruf gibt den ganzen Schritt frei, nicht nur eine Seite.
+    job.vacuum_pages = free_pages
+    with patch("app.core.retention.time.sleep") as pauses:
+        assert job.incremental_vacuum() == free_pages
+    assert pauses.call_count == 1
+    assert os.path.getsize(path) < size_before / 4
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA freelist_count").scalar() == 0
@@ -0,0 +1,56 @@
+import asyncio
+from unittest.mock import MagicMock, patch
+
+from app.core.scanner import NERCache
+from tests.helpers import make_scanner
+
+
+def test_ner_cache_reuses_spans_but_creates_new_placeholders():
+    scanner = make_scanner([{"start": 6, "end": 10, "label": "person", "score": 0.9, "text": "Anna"}])
+
+    first = asyncio.run(scanner.clean("Hallo Anna"))
+    second = asyncio.run(scanner.clean("Hallo Anna"))
+
+    assert scanner.model.predict_entities.call_count == 1
+    assert first.startswith("Hallo <PERSON_") and second.startswith("Hallo <PERSON_")
+    # Neue Platzhalter pro Aufruf, beide im Vault auflösbar.
+    assert first != second
+    assert scanner.restore(second) == "Hallo Anna"
+    assert scanner.ner_cache.metrics == {"hits": 1, "misses": 1, "evictions": 0}
+
+
+def test_ner_cache_keys_are_hashes_and_skip_long_texts():
+    scanner = make_scanner(max_entries=10, ttl_seconds=60, max_text_length=20)
+
+    asyncio.run(scanner.clean("danke"))
+    asyncio.run(scanner.clean("Das ist eine deutlich zu lange Nachricht für den Cache"))
+    asyncio.run(scanner.clean("Das ist eine deutlich zu lange Nachricht für den Cache"))
+
+    assert scanner.model.predict_entities.call_count == 3
+    assert len(scanner.ner_cache) == 1
+    assert "danke" not in "".join(scanner.ner_cache._entries)
+
+
+def test_ner_cache_lru_and_ttl():
+    cache = NERCache(max_entries=2, ttl_seconds=60, max_text_length=100)
+    cache.put("a", [])
+    cache.put("b", [])
+    cache.get("a")
+    cache.put("c", [])
+    assert cache.get("b") is None
+    assert cache.get("a") == []
+    assert cache.metrics["evictions"] == 1
+
+    expired = NERCache(max_entries=2, ttl_seconds=0, max_text_length=100)
+    expired.put("a", [])
+    assert expired.get("a") is None
+
+
+def test_regex_phase_does_not_treat_placeholder_digits_as_phone_number():
+    scanner = make_scanner()
+    text = "Mail an anna@example.com, Tel. 030 12345678"
+
+    with patch("app.core.vault.uuid4", return_value=MagicMock(hex="12345678")):
+        cleaned = asyncio.run(scanner.clean(text))
+
+    assert cleaned == "Mail an <EMAIL_12345678>, Tel. <PHONE_12345678>"
@@ -0,0 +1,162 @@
+import time
+import signal
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import fakeredis
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.main import app
+from app.core.answer_cache import AnswerCache
+from app.core.db_sqla import Base, ChatMessage
+from app.core.lifecycle import ShutdownCoordinator, shutdown_executor
+from app.core.vault import PIIVault
+from bench.fake_openai import FakeOpenAIConfig, serve_in_thread
+from tests.helpers import FakeScanner, make_assistant
+
+SLOW_REPLY = " ".join(f"Wort{i}" for i in range(200))
+
+
+def test_drain_waits_for_active_streams():
+    async def scenario():
+        cancel = AsyncMock()
+        lifecycle = ShutdownCoordinator(cancel_streams=cancel, drain_seconds=2)
+        lifecycle.stream_started()
+        drain = asyncio.create_task(lifecycle.drain())
+        await asyncio.sleep(0.05)
+        assert not lifecycle.accepting
+        lifecycle.stream_finished()
+        return await drain, cancel
+
+    drained, cancel = asyncio.run(scenario())
+    assert drained is True
+    cancel.assert_not_awaited()
+
+
+def test_drain_cancels_streams_after_deadline():
+    async def scenario():
+        lifecycle = ShutdownCoordinator(drain_seconds=0.05, cancel_grace_seconds=1)
+
+        async def cancel_streams():
+            lifecycle.stream_finished()
+            return 1
+
+        lifecycle.cancel_streams = cancel_streams
+        lifecycle.stream_started()
+        return await lifecycle.drain(), lifecycle.active_streams
+
+    assert asyncio.run(scenario()) == (False, 0)
+
+
+def test_abandoned_stream_cancels_openai_run():
+    config = FakeOpenAIConfig(reply=SLOW_REPLY, ttft_seconds=0, token_interval_seconds=0.02)
+
+    async def scenario(base_url):
+        assistant = make_assistant(base_url)
+        assistant._cancel_run = AsyncMock(side_effect=assistant._cancel_run)
+        stream = assistant.ask_assistant_stream("sess_a", "Hallo")
+        await stream.__anext__()
+        await stream.__anext__()
+        await stream.aclose()
+        return assistant
+
+    with serve_in_thread(config) as base_url:
+        assistant = asyncio.run(scenario(base_url))
+
+    assert assistant.active_runs == 0
+    thread_id, run_id = assistant._cancel_run.await_args.args
+    assert run_id.startswith("run_")
+
+
+def test_shutdown_drain_cancels_runs_and_persists_partial_answer(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'chat.db'}")
+    Base.metadata.create_all(bind=engine)
+    TestSession = sessionmaker(bind=engine)
+    config = FakeOpenAIConfig(reply=SLOW_REPLY, ttft_seconds=0, token_interval_seconds=0.02)
+
+    async def scenario(base_url):
+        assistant = make_assistant(base_url)
+        lifecycle = ShutdownCoordinator(cancel_streams=assistant.cancel_active_runs, drain_seconds=0.3, cancel_grace_seconds=5)
+        redis = fakeredis.FakeRedis(decode_responses=True)
+        app.state.vault = PIIVault(redis)
+        app.state.scanner = FakeScanner()
+        app.state.assistant = assistant
+        app.state.notifier = MagicMock(notify_escalation=AsyncMock())
+        app.state.answer_cache = AnswerCache(redis, enabled=False, version="test")
+        app.state.lifecycle = lifecycle
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://gateway", timeout=30) as client:
+            stream = asyncio.create_task(client.post("/chat/message", json={"session_id": "sess_s", "message": "Hallo"}))
+            while lifecycle.active_streams == 0:
+                await asyncio.sleep(0.01)
+            drain = asyncio.create_task(lifecycle.drain())
+            await asyncio.sleep(0.05)
+            rejected = await client.post("/chat/message", json={"session_id": "sess_new", "message": "Hallo"})
+            response = await stream
+            drained = await drain
+        return response, rejected, drained, assistant
+
+    try:
+        with patch("app.routers.chat.SessionLocal", TestSession), serve_in_thread(config) as base_url:
+            response, rejected, drained, assistant = asyncio.run(scenario(base_url))
+    finally:
+        del app.state.lifecycle
+
+    assert rejected.status_code == 503
+    assert rejected.headers["retry-after"]
+    assert drained is False
+    assert "wegen einer Wartung unterbrochen" in response.text
+    assert assistant.active_runs == 0
+
+    db = TestSession()
+    bot = db.query(ChatMessage).filter(ChatMessage.session_id == "sess_s", ChatMessage.role == "assistant").one()
+    db.close()
+    assert bot.content.startswith("Wort0 Wort1")
+    assert len(bot.content) < len(SLOW_REPLY)
+
+
+def test_shutdown_executor_does_not_block_event_loop():
+    executor = ThreadPoolExecutor(max_workers=1)
+    executor.submit(time.sleep, 0.3)
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(ticker())
+        timed_out = await shutdown_executor(executor, timeout=0.05)
+        finished = await shutdown_executor(executor, timeout=2)
+        task.cancel()
+        return timed_out, finished, ticks
+
+    timed_out, finished, ticks = asyncio.run(scenario())
+    assert (timed_out, finished) == (False, True)
+    assert ticks > 5
+
+
+def test_signal_handler_falls_back_to_default_for_c_handlers():
+    installed, restored = {}, []
+
+    async def scenario():
+        coordinator = ShutdownCoordinator()
+        with patch("app.core.lifecycle.signal.getsignal", return_value=None), \
+                patch("app.core.lifecycle.signal.signal", side_effect=lambda sig, handler: installed.setdefault(sig, handler)), \
+                patch("app.core.lifecycle.signal.raise_signal"):
+            coordinator.install_signal_handlers()
+            with patch("app.core.lifecycle.signal.signal", side_effect=lambda sig, handler: restored.append((sig, handler))):
+                installed[signal.SIGTERM](signal.SIGTERM, None)
+        await asyncio.sleep(0)
+        return coordinator
+
+    coordinator = asyncio.run(scenario())
+    assert restored == [(signal.SIGTERM, signal.SIG_DFL)]
+    assert not coordinator.accepting
@@ -0,0 +1,97 @@
+import asyncio
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.core.assistant import OPENAI_STALLS, OPENAI_STALL_RETRIES
+from app.routers.chat import STALL_FALLBACK_MESSAGE
+from bench.fake_openai import FakeOpenAIConfig, serve_in_thread
+from tests.helpers import make_assistant
+
+REPLY = "Die Lieferzeit beträgt zwei bis drei Werktage."
+
+
+def make_stall_assistant(base_url):
+    assistant = make_assistant(base_url)
+    assistant.ttft_timeout_seconds = 0.3
+    assistant.token_timeout_seconds = 0.3
+    return assistant
+
+
+def collect(base_url, session_id="sess_stall"):
+    async def scenario():
+        assistant = make_stall_assistant(base_url)
+        run_info = {}
+        tokens = [token async for token in assistant.ask_assistant_stream(session_id, "Lieferzeit?", run_info=run_info)]
+        return "".join(tokens), run_info, assistant
+
+    return asyncio.run(scenario())
+
+
+def test_ttft_stall_cancels_run_and_retries_once():
+    config = FakeOpenAIConfig(reply=REPLY, ttft_seconds=0, token_interval_seconds=0, stall_after_tokens=0, stall_runs=1)
+    stalls_before = OPENAI_STALLS.value(phase="ttft")
+    retries_before = OPENAI_STALL_RETRIES.value()
+
+    with serve_in_thread(config) as base_url:
+        text, run_info, assistant = collect(base_url)
+
+    assert text == REPLY
+    assert run_info["stalled"] is None
+    assert run_info["total_tokens"] > 0
+    assert OPENAI_STALLS.value(phase="ttft") - stalls_before == 1
+    assert OPENAI_STALL_RETRIES.value() - retries_before == 1
+    assert assistant.active_runs == 0
+
+
+def test_inter_token_stall_keeps_partial_answer_without_retry():
+    config = FakeOpenAIConfig(reply=REPLY, ttft_seconds=0, token_interval_seconds=0, stall_after_tokens=3, stall_runs=1)
+    retries_before = OPENAI_STALL_RETRIES.value()
+
+    with serve_in_thread(config) as base_url:
+        text, run_info, _ = collect(base_url)
+
+    # Der Client hat schon Tokens erhalten: kein zweiter Run (keine doppelte Antwort).
+    assert text == "Die Lieferzeit beträgt "
+    assert run_info["stalled"] == "inter_token"
+    assert OPENAI_STALL_RETRIES.value() == retries_before
+
+
+def test_ttft_timeout_follows_percentile_within_bounds():
+    with serve_in_thread(FakeOpenAIConfig()) as base_url:
+        assistant = make_stall_assistant(base_url)
+    assistant.ttft_timeout_seconds = 10
+    assistant.ttft_min_timeout_seconds = 1
+    assert assistant.ttft_timeout() == 10
+
+    assistant.ttft_percentile = 90
+    assistant._ttft_samples.extend([0.5] * 15 + [2.0, 2.5, 3.0, 4.0, 30.0])
+    assert assistant.ttft_timeout() == 4.0
+    assistant._ttft_samples.extend([0.1] * 100)
+    assert assistant.ttft_timeout() == 1
+
+
+def test_chat_ends_with_fallback_after_repeated_stalls(chat_db, services):
+    vault, notifier = services
+    config = FakeOpenAIConfig(reply=REPLY, ttft_seconds=0, token_interval_seconds=0, stall_after_tokens=0, stall_runs=4)
+
+    with serve_in_thread(config) as base_url:
+        app.state.assistant = make_stall_assistant(base_url)
+        client = TestClient(app)
+        response = client.post("/chat/message", json={"session_id": "sess_fb", "message": "Lieferzeit?"})
+
+        assert response.status_code == 200
+        assert response.text == STALL_FALLBACK_MESSAGE
+        vault.set_status.assert_not_called()
+        # Keine Antwort im Cache: die nächste Anfrage fragt OpenAI erneut.
+        assert app.state.answer_cache.get("Lieferzeit?") is None
+
+        # Neuer Client pro Request: TestClient startet jeweils einen eigenen Event-Loop.
+        app.state.assistant = make_stall_assistant(base_url)
+        with patch("app.routers.chat.settings.openai_stall_action", "escalate"):
+            escalated = client.post("/chat/message", json={"session_id": "sess_fb2", "message": "Lieferzeit?"})
+
+    assert "Eskalation ausgelöst" in escalated.text
+    vault.set_status.assert_called_once_with("sess_fb2", "HUMAN")
+    notifier.notify_escalation.assert_awaited_once()
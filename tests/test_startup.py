@@ -0,0 +1,38 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# Kumulierte Importzeit von app.main (ohne gliner/torch/openai ~0.8s).
+IMPORT_BUDGET_SECONDS = 2.5
+HEAVY_MODULES = ("gliner", "torch", "openai")
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def import_app(code: str):
+    # Nicht erreichbarer Redis-Host: der Import darf keine Verbindung aufbauen.
+    env = {**os.environ, "REDIS_HOST": "unreachable.invalid"}
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True, timeout=120,
+    )
+
+
+def cumulative_seconds(importtime_output: str, module: str) -> float:
+    for line in importtime_output.splitlines():
+        if line.startswith("import time:") and line.rsplit("|", 1)[1].strip() == module:
+            return int(line.split("|")[1]) / 1e6
+    raise AssertionError(f"{module} not found in importtime output")
+
+
+def test_app_import_is_side_effect_free_and_within_budget():
+    result = import_app(f"import sys, app.main; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+
+    assert result.returncode == 0, result.stderr[-2000:]
+    assert result.stdout.strip() == "", f"heavy modules imported eagerly: {result.stdout.strip()}"
+    assert cumulative_seconds(result.stderr, "app.main") < IMPORT_BUDGET_SECONDS
+
+
+def test_core_modules_import_without_redis():
+    result = import_app("import app.core.vault, app.core.scanner, app.core.assistant, app.core.database")
+    assert result.returncode == 0, result.stderr[-2000:]
@@ -0,0 +1,124 @@
+import time
+import asyncio
+from unittest.mock import patch
+
+from app.core.assistant import OPENAI_PROMPT_TOKENS, THREAD_ROLLOVERS, SessionThreads
+from bench.fake_openai import FakeOpenAIConfig, serve_in_thread
+from tests.helpers import make_assistant
+
+PROMPTS = [f"Frage {i}: Wie ist der Stand meiner Bestellung <ORDER_{i}>?" for i in range(8)]
+
+
+def fake_config():
+    return FakeOpenAIConfig(reply="Gerne, ich prüfe das.", ttft_seconds=0, token_interval_seconds=0, prompt_tokens=100, tokens_per_message=50)
+
+
+def converse(base_url, policy, session_id="sess_ctx", **options):
+    """Führt mehrere Turns in einer Session; liefert Prompt-Tokens je Run."""
+    async def scenario():
+        assistant = make_assistant(base_url)
+        assistant.context_policy = policy
+        for name, value in options.items():
+            setattr(assistant, name, value)
+        prompt_tokens, threads = [], []
+        for prompt in PROMPTS:
+            run_info = {}
+            async for _ in assistant.ask_assistant_stream(session_id, prompt, run_info=run_info):
+                pass
+            prompt_tokens.append(run_info["prompt_tokens"])
+            threads.append(assistant._threads[session_id])
+        return prompt_tokens, threads, assistant
+
+    return asyncio.run(scenario())
+
+
+def test_without_policy_prompt_tokens_grow_every_turn():
+    with serve_in_thread(fake_config()) as base_url:
+        prompt_tokens, threads, _ = converse(base_url, "none")
+
+    assert prompt_tokens == [100 + 50 * (2 * i + 1) for i in range(len(PROMPTS))]
+    assert len(set(threads)) == 1
+
+
+def test_truncate_policy_caps_prompt_tokens():
+    count_before = OPENAI_PROMPT_TOKENS.count(policy="truncate")
+
+    with serve_in_thread(fake_config()) as base_url:
+        prompt_tokens, threads, _ = converse(base_url, "truncate", truncate_last_messages=4)
+
+    assert prompt_tokens[:2] == [150, 250]
+    # Ab dem dritten Turn bleibt der Kontext (und damit die Latenz) flach.
+    assert set(prompt_tokens[2:]) == {300}
+    assert len(set(threads)) == 1
+    assert OPENAI_PROMPT_TOKENS.count(policy="truncate") - count_before == len(PROMPTS)
+
+
+def test_rollover_starts_new_thread_with_summary():
+    rollovers_before = THREAD_ROLLOVERS.value()
+
+    with serve_in_thread(fake_config()) as base_url:
+        prompt_tokens, threads, assistant = converse(
+            base_url, "rollover", rollover_max_messages=6, rollover_max_prompt_tokens=0, summary_turns=2
+        )
+
+    # Nach drei Turns (6 Nachrichten) neuer Thread: Zusammenfassung + neue Frage.
+    assert prompt_tokens[:4] == [150, 250, 350, 200]
+    assert max(prompt_tokens) <= 400
+    assert len(set(threads)) == 3
+    assert THREAD_ROLLOVERS.value() - rollovers_before == 2
+    assert assistant.has_thread("sess_ctx")
+
+    summary = assistant.build_summary("sess_ctx")
+    assert summary.count("- Nutzer:") == 2
+    assert PROMPTS[-1] in summary and PROMPTS[0] not in summary
+
+
+def test_rollover_on_prompt_token_budget():
+    with serve_in_thread(fake_config()) as base_url:
+        prompt_tokens, threads, _ = converse(
+            base_url, "rollover", rollover_max_messages=0, rollover_max_prompt_tokens=400
+        )
+
+    # Nach dem Rollover zählt das Budget neu: kein erneuter Rollover in jedem Turn.
+    assert prompt_tokens == [150, 250, 350, 450, 200, 300, 400, 200]
+    assert len(set(threads)) == 3
+
+
+def test_rollover_resets_usage_of_the_session():
+    with serve_in_thread(fake_config()) as base_url:
+        async def scenario():
+            assistant = make_assistant(base_url)
+            assistant.context_policy = "rollover"
+            async for _ in assistant.ask_assistant_stream("sess_reset", PROMPTS[0], run_info={}):
+                pass
+            old_thread = assistant._threads["sess_reset"]
+            new_thread = await assistant._rollover_thread("sess_reset")
+            return old_thread, new_thread, assistant._usage("sess_reset")
+
+        old_thread, new_thread, usage = asyncio.run(scenario())
+
+    assert new_thread != old_thread
+    assert usage["messages"] == 1
+    assert usage["prompt_tokens"] == 0
+    assert list(usage["turns"]) == []
+
+
+def test_session_threads_are_bounded_and_usage_follows_the_thread():
+    threads = SessionThreads(max_sessions=2, ttl_seconds=60)
+    threads["a"] = "thread_a"
+    threads.set_usage("a", {"messages": 4})
+    threads["b"] = "thread_b"
+    threads.get("a")
+    threads["c"] = "thread_c"
+
+    # LRU: "b" war am längsten unbenutzt.
+    assert "b" not in threads and len(threads) == 2
+    assert threads.usage("a") == {"messages": 4}
+    # Neuer Thread (Rollover) verwirft die Nutzung des alten.
+    threads["a"] = "thread_a2"
+    assert threads.usage("a") is None
+
+    with patch("app.core.assistant.time.monotonic", return_value=time.monotonic() + 61):
+        assert threads.get("a") is None
+        threads["d"] = "thread_d"
+        assert len(threads) == 1
@@ -0,0 +1,165 @@
+import asyncio
+import json
+import logging
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.main import app
+from app.core import tracing
+from app.core.answer_cache import AnswerCache
+from app.core.db_sqla import Base
+from app.core.scanner import PIIScanner
+from app.core.vault import PIIVault
+from bench.fake_openai import FakeOpenAIConfig, serve_in_thread
+from tests.helpers import make_assistant
+
+
+class CollectingExporter(tracing.SpanExporter):
+    def __init__(self):
+        super().__init__()
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+    def write(self, payload):
+        pass
+
+    def by_name(self, name):
+        return [span for span in self.spans if span.name == name]
+
+
+class StreamingAssistant:
+    def has_thread(self, session_id):
+        return False
+
+    async def ask_assistant_stream(self, session_id, prompt, run_info=None):
+        for token in ["Gerne, ", prompt]:
+            yield token
+
+
+@pytest.fixture
+def exporter():
+    collecting = CollectingExporter()
+    tracing.configure(tracing.Tracer(collecting, sample_rate=1.0))
+    yield collecting
+    tracing.configure(tracing.Tracer())
+
+
+@pytest.fixture
+def traced_app(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'chat.db'}")
+    Base.metadata.create_all(bind=engine)
+    redis = fakeredis.FakeRedis(decode_responses=True)
+    with patch("app.core.scanner.GLiNER") as gliner:
+        gliner.from_pretrained.return_value = MagicMock()
+        scanner = PIIScanner(PIIVault(redis))
+    scanner.model.predict_entities.return_value = []
+    notifier = MagicMock()
+    notifier.notify_escalation = AsyncMock()
+    app.state.vault = scanner.vault
+    app.state.scanner = scanner
+    app.state.assistant = StreamingAssistant()
+    app.state.notifier = notifier
+    app.state.answer_cache = AnswerCache(redis, enabled=False, version="test")
+    with patch("app.routers.chat.SessionLocal", sessionmaker(bind=engine)):
+        yield TestClient(app)
+
+
+def test_chat_request_produces_one_trace_across_stages(exporter, traced_app):
+    incoming = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+    response = traced_app.post(
+        "/chat/message",
+        json={"session_id": "sess_t", "message": "Mail an max@example.com"},
+        headers={"traceparent": incoming},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["x-request-id"] == "0af7651916cd43dd8448eb211c80319c"
+    assert {span.trace_id for span in exporter.spans} == {"0af7651916cd43dd8448eb211c80319c"}
+
+    root = exporter.by_name("POST /chat/message")[0]
+    assert root.parent_span_id == "b7ad6b7169203331"
+    assert root.attributes["chat.session_id"] == "sess_t"
+    assert root.attributes["http.status_code"] == 200
+
+    clean = exporter.by_name("pii.clean")[0]
+    assert clean.parent_span_id == root.span_id
+    assert clean.attributes["placeholders"] == 1
+    assert exporter.by_name("pii.regex")[0].parent_span_id == clean.span_id
+    assert exporter.by_name("pii.ner")[0].parent_span_id == clean.span_id
+    for name in ("vault.get_status", "db.save_user_message", "db.save_bot_message"):
+        assert exporter.by_name(name)[0].parent_span_id == root.span_id
+
+
+def test_unsampled_request_keeps_correlation_id_without_spans(traced_app):
+    collecting = CollectingExporter()
+    tracing.configure(tracing.Tracer(collecting, sample_rate=0.0))
+    try:
+        response = traced_app.post("/chat/message", json={"session_id": "sess_u", "message": "Hallo"})
+    finally:
+        tracing.configure(tracing.Tracer())
+
+    assert len(response.headers["x-request-id"]) == 32
+    assert collecting.spans == []
+
+
+def test_log_records_carry_trace_id():
+    root = tracing.Tracer().start_trace("test")
+    record = logging.LogRecord("app", logging.INFO, __file__, 1, "msg", (), None)
+    with tracing.get_tracer().activate(root):
+        tracing.TraceContextFilter().filter(record)
+    assert record.trace_id == root.trace_id
+
+
+def test_assistant_run_span_records_openai_run_id(exporter):
+    config = FakeOpenAIConfig(reply="Hallo!", ttft_seconds=0.01, token_interval_seconds=0)
+
+    async def scenario(base_url):
+        assistant = make_assistant(base_url)
+        root = tracing.get_tracer().start_trace("test")
+        with tracing.get_tracer().activate(root):
+            run_info = {}
+            _ = [token async for token in assistant.ask_assistant_stream("sess_r", "Hallo", run_info=run_info)]
+        root.end()
+        return run_info
+
+    with serve_in_thread(config) as base_url:
+        run_info = asyncio.run(scenario(base_url))
+
+    run = exporter.by_name("assistant.run")[0]
+    assert run.attributes["openai.run_id"] == run_info["run_id"]
+    assert run.attributes["openai.total_tokens"] > 0
+    assert exporter.by_name("assistant.thread_create") and exporter.by_name("assistant.message_create")
+
+
+def test_file_exporter_writes_otlp_json(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    exporter = tracing.FileSpanExporter(str(path), flush_interval=60)
+    exporter.start()
+    tracer = tracing.Tracer(exporter, sample_rate=1.0)
+    root = tracer.start_trace("root")
+    with tracer.activate(root), tracer.span("child", items=3):
+        pass
+    root.end()
+    exporter.shutdown()
+
+    payload = json.loads(path.read_text().splitlines()[0])
+    spans = payload["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    child, parent = spans
+    assert child["parentSpanId"] == parent["spanId"]
+    assert child["attributes"] == [{"key": "items", "value": {"intValue": "3"}}]
+    assert int(child["endTimeUnixNano"]) >= int(child["startTimeUnixNano"])
+
+
+def test_span_exporter_requires_write():
+    class Incomplete(tracing.SpanExporter):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
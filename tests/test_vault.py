@@ -0,0 +1,71 @@
+import time
+
+import fakeredis
+import pytest
+
+from app.core.vault import PIIVault, STATUS_PREFIX
+
+
+@pytest.fixture
+def redis_server():
+    return fakeredis.FakeServer()
+
+
+def make_vault(server, **kwargs):
+    return PIIVault(fakeredis.FakeRedis(server=server, decode_responses=True), **kwargs)
+
+
+def test_status_cache_avoids_redis_roundtrip(redis_server):
+    vault = make_vault(redis_server, status_cache_ttl=60)
+    vault.set_status("sess_1", "HUMAN")
+
+    # Direkte Änderung in Redis (ohne Pub/Sub) wird bis zum TTL nicht gesehen.
+    vault.redis.set(f"{STATUS_PREFIX}sess_1", "AI")
+    assert vault.get_status("sess_1") == "HUMAN"
+
+
+def test_status_change_invalidates_other_workers(redis_server):
+    worker_a = make_vault(redis_server, status_cache_ttl=60)
+    worker_b = make_vault(redis_server, status_cache_ttl=60)
+    worker_b.start_status_listener()
+    try:
+        assert worker_b.get_status("sess_2") == "AI"
+
+        worker_a.set_status("sess_2", "HUMAN")
+        for _ in range(50):
+            if worker_b.get_status("sess_2") == "HUMAN":
+                break
+            time.sleep(0.05)
+        assert worker_b.get_status("sess_2") == "HUMAN"
+
+        # Rückgabe an die KI läuft über denselben Kanal.
+        worker_a.set_status("sess_2", "AI")
+        for _ in range(50):
+            if worker_b.get_status("sess_2") == "AI":
+                break
+            time.sleep(0.05)
+        assert worker_b.get_status("sess_2") == "AI"
+    finally:
+        worker_b.stop_status_listener()
+
+
+def test_status_cache_disabled(redis_server):
+    vault = make_vault(redis_server, status_cache_ttl=0)
+    vault.set_status("sess_3", "HUMAN")
+    vault.redis.set(f"{STATUS_PREFIX}sess_3", "AI")
+    assert vault.get_status("sess_3") == "AI"
+
+
+def test_get_statuses_reads_misses_with_one_mget(redis_server):
+    vault = make_vault(redis_server, status_cache_ttl=60)
+    vault.set_status("sess_cached", "HUMAN")
+    make_vault(redis_server).set_status("sess_remote", "HUMAN")
+
+    calls = []
+    mget = vault.redis.mget
+    vault.redis.mget = lambda keys: calls.append(keys) or mget(keys)
+    modes = vault.get_statuses(["sess_cached", "sess_remote", "sess_new", "sess_remote"])
+
+    assert modes == {"sess_cached": "HUMAN", "sess_remote": "HUMAN", "sess_new": "AI"}
+    assert calls == [[f"{STATUS_PREFIX}sess_remote", f"{STATUS_PREFIX}sess_new"]]
+    assert vault.get_status("sess_new") == "AI"
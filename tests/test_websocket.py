@@ -0,0 +1,190 @@
+import time
+from unittest.mock import MagicMock, patch
+
+import fakeredis
+import pytest
+from fastapi import WebSocketDisconnect
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.core.config import settings
+from app.core.db_sqla import ChatMessage, get_db
+from app.core.events import SessionEventBus
+from app.core.vault import PIIVault
+from tests.helpers import FakeAssistant, make_limiter
+
+REPLY = "Gerne helfe ich Ihnen weiter."
+
+
+@pytest.fixture
+def pubsub(services):
+    """Echter Vault und Event-Bus auf einem gemeinsamen (Fake-)Redis, wie zwei Worker."""
+    server = fakeredis.FakeServer()
+    app.state.vault = PIIVault(fakeredis.FakeRedis(server=server, decode_responses=True))
+    app.state.events = SessionEventBus(fakeredis.FakeRedis(server=server, decode_responses=True))
+    app.state.events.start_listener()
+    yield app.state.vault
+    app.state.events.stop_listener()
+    del app.state.events
+
+
+def receive_turn(ws):
+    """Sammelt Events bis zum Ende des Turns; liefert (Text, done-Status, übrige Events)."""
+    tokens, others = [], []
+    while True:
+        event = ws.receive_json()
+        if event["type"] == "token":
+            tokens.append(event["text"])
+        elif event["type"] == "done":
+            return "".join(tokens), event["status"], others
+        else:
+            others.append(event)
+
+
+def test_websocket_streams_multiple_turns_on_one_connection(chat_db, services):
+    app.state.assistant = FakeAssistant(REPLY)
+    client = TestClient(app)
+
+    with client.websocket_connect("/chat/ws/sess_ws") as ws:
+        assert ws.receive_json() == {"type": "status", "mode": "AI"}
+        ws.send_json({"message": "Hallo"})
+        first = receive_turn(ws)
+        ws.send_json({"message": "Und noch etwas"})
+        second = receive_turn(ws)
+        ws.send_json({"text": "falsches Format"})
+        error = ws.receive_json()
+
+    assert first[:2] == second[:2] == (REPLY + " ", "AI")
+    assert error["type"] == "error" and error["code"] == 400
+    db = chat_db()
+    assert [m.role for m in db.query(ChatMessage).order_by(ChatMessage.id)] == ["user", "assistant", "user", "assistant"]
+    db.close()
+
+
+def test_human_mode_pushes_operator_messages_and_status(chat_db, pubsub):
+    app.state.assistant = FakeAssistant("unused")
+    pubsub.set_status("sess_human", "HUMAN")
+
+    def override_get_db():
+        db = chat_db()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    client = TestClient(app)
+    with client.websocket_connect("/chat/ws/sess_human") as ws, patch("app.routers.admin.ADMIN_ENABLED", True), \
+            patch.dict(app.dependency_overrides, {get_db: override_get_db}):
+        assert ws.receive_json() == {"type": "status", "mode": "HUMAN"}
+        ws.send_json({"message": "Ist jemand da?"})
+        assert receive_turn(ws)[1] == "HUMAN_MODE"
+
+        reply = client.post("/admin/sessions/sess_human/reply", json={"message": "Ja, ich helfe Ihnen."})
+        assert reply.status_code == 200
+        pushed = ws.receive_json()
+        client.post("/admin/sessions/sess_human/status", json={"mode": "AI"})
+        status_event = ws.receive_json()
+
+    assert pushed == {"type": "operator_message", "text": "Ja, ich helfe Ihnen.", "message_id": reply.json()["id"]}
+    assert status_event == {"type": "status", "mode": "AI"}
+    assert app.state.assistant.calls == 0
+
+
+def test_escalation_over_websocket_pushes_human_status(chat_db, services, pubsub):
+    _, notifier = services
+    app.state.assistant = FakeAssistant("Das weiss ich nicht ESKALATION_NOETIG")
+    client = TestClient(app)
+
+    with client.websocket_connect("/chat/ws/sess_esc") as ws:
+        ws.receive_json()
+        ws.send_json({"message": "Kompliziert"})
+        text, done, others = receive_turn(ws)
+        if not others:
+            others.append(ws.receive_json())
+        # Teams-Benachrichtigung läuft nach dem done-Event; erst danach trennen.
+        for _ in range(100):
+            if notifier.notify_escalation.await_count:
+                break
+            time.sleep(0.01)
+
+    assert "Eskalation ausgelöst" in text
+    assert done == "ESCALATION_NEEDED"
+    assert others == [{"type": "status", "mode": "HUMAN"}]
+    notifier.notify_escalation.assert_awaited_once()
+
+
+def test_websocket_rate_limit_sends_error_event(chat_db, services):
+    app.state.assistant = FakeAssistant(REPLY)
+    app.state.rate_limiter = make_limiter(session_burst=1)
+    try:
+        with TestClient(app).websocket_connect("/chat/ws/sess_rl_ws") as ws:
+            ws.receive_json()
+            ws.send_json({"message": "Eins"})
+            receive_turn(ws)
+            ws.send_json({"message": "Zwei"})
+            error = ws.receive_json()
+    finally:
+        del app.state.rate_limiter
+
+    assert error == {"type": "error", "code": 429, "detail": "Too many requests, please slow down.", "retry_after": 1}
+    assert app.state.assistant.calls == 1
+
+
+class FailingAssistant(FakeAssistant):
+    async def ask_assistant_stream(self, session_id, prompt, run_info=None):
+        self.calls += 1
+        yield "Teil "
+        raise RuntimeError("OpenAI down")
+
+
+def test_websocket_errors_keep_connection_open(chat_db, services):
+    app.state.assistant = FailingAssistant(REPLY)
+
+    with TestClient(app).websocket_connect("/chat/ws/sess_err") as ws:
+        ws.receive_json()
+        ws.send_text("kein JSON")
+        bad_frame = ws.receive_json()
+        ws.send_json({"message": "Hallo"})
+        events = [ws.receive_json(), ws.receive_json()]
+        app.state.assistant = FakeAssistant(REPLY)
+        ws.send_json({"message": "Nochmal"})
+        retry = receive_turn(ws)
+
+    assert bad_frame["type"] == "error" and bad_frame["code"] == 400
+    assert events[0] == {"type": "token", "text": "Teil "}
+    assert events[1]["type"] == "error" and events[1]["code"] == 500
+    assert retry[:2] == (REPLY + " ", "AI")
+
+
+def test_websocket_rate_limit_uses_forwarded_client_ip(chat_db, services):
+    app.state.assistant = FakeAssistant(REPLY)
+    limiter = app.state.rate_limiter = MagicMock()
+    limiter.check.return_value = MagicMock(allowed=True)
+    try:
+        with patch("app.core.ratelimit.settings.rate_limit_trust_forwarded_for", True), \
+                TestClient(app).websocket_connect("/chat/ws/sess_ip", headers={"X-Forwarded-For": "198.51.100.9, 203.0.113.7"}) as ws:
+            ws.receive_json()
+            ws.send_json({"message": "Hallo"})
+            receive_turn(ws)
+    finally:
+        del app.state.rate_limiter
+
+    limiter.check.assert_called_once_with("sess_ip", "203.0.113.7")
+
+
+def test_websocket_closes_with_service_restart_during_shutdown(chat_db, services):
+    app.state.assistant = FakeAssistant(REPLY)
+    app.state.lifecycle = MagicMock(accepting=False)
+    try:
+        with TestClient(app).websocket_connect("/chat/ws/sess_drain") as ws:
+            ws.receive_json()
+            ws.send_json({"message": "Hallo"})
+            error = ws.receive_json()
+            with pytest.raises(WebSocketDisconnect) as closed:
+                ws.receive_json()
+    finally:
+        del app.state.lifecycle
+
+    assert error["code"] == 503 and error["retry_after"] == settings.shutdown_retry_after_seconds
+    assert closed.value.code == 1012
+    assert app.state.assistant.calls == 0